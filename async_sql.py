@@ -0,0 +1,132 @@
+#############################################
+# async_sql.py
+#
+# asyncio counterparts of the WindSQL / TornadoSQL / HailSQL query methods,
+# for async backends that must not block the event loop on SQLite:
+#
+#   queries = AsyncStormQueries(db)
+#   count = await queries.wind.count_wind_gusts(58, "2000-01-01", "2024-12-31")
+#   yearly = await queries.gather({
+#       "wind": queries.wind.yearly_breakdown(),
+#       "tornado": queries.tornado.yearly_breakdown(),
+#       "hail": queries.hail.yearly_breakdown(),
+#   })
+#############################################
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from wind_sql import WindSQL
+from tornado_sql import TornadoSQL
+from hail_sql import HailSQL
+
+
+class AsyncQueries:
+    """
+    Wraps one hazard query object so each of its public methods returns a coroutine.
+
+    Calls run on the shared executor of an AsyncStormQueries. Cancelling the
+    awaiting task also interrupts the SQLite statement that is running for it.
+    """
+
+    def __init__(self, sql_obj, runner):
+        self._sql = sql_obj
+        self._runner = runner
+
+    def __getattr__(self, name):
+        attr = getattr(self._sql, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            return await self._runner.run(attr, *args, **kwargs)
+
+        return call
+
+
+class AsyncStormQueries:
+    """
+    Async access to the wind, tornado and hail queries of one StormDatabase.
+
+    Work runs on a bounded thread pool sized to the database's read connection
+    pool (one worker without a pool, since a single connection serializes
+    queries anyway), so at most that many queries are in flight at once.
+    """
+
+    def __init__(self, db, max_workers=None):
+        """
+        Args:
+            db (StormDatabase): Database to query. Create it with pool_size > 0 for
+                real concurrency.
+            max_workers (int, optional): Executor size. Defaults to the read pool
+                size, or 1 without a pool.
+        """
+        self.db = db
+        if max_workers is None:
+            max_workers = db.pool.size if db.pool is not None else 1
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="storm-query")
+        db.enable_cancellation()
+
+        self.wind = AsyncQueries(WindSQL(db), self)
+        self.tornado = AsyncQueries(TornadoSQL(db), self)
+        self.hail = AsyncQueries(HailSQL(db), self)
+
+    def _call(self, cancel, func, args, kwargs):
+        if cancel.is_set():  # cancelled while still queued
+            raise asyncio.CancelledError()
+        with self.db.cancellable(cancel):
+            return func(*args, **kwargs)
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Run a blocking query function on the executor.
+
+        Raises:
+            asyncio.CancelledError: If the awaiting task is cancelled; the running
+                SQLite statement is interrupted rather than left to finish.
+        """
+        cancel = threading.Event()
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, self._call, cancel, func, args, kwargs)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            cancel.set()
+            raise
+
+    async def gather(self, calls):
+        """
+        Await several query coroutines concurrently.
+
+        Args:
+            calls (dict or list): Coroutines from this object's wind/tornado/hail
+                wrappers, keyed by name (dict) or positional (list).
+
+        Returns:
+            dict or list: Results in the same shape as calls.
+
+        Raises:
+            Exception: The first failure; the remaining calls are cancelled.
+        """
+        keys = list(calls) if isinstance(calls, dict) else None
+        coros = [calls[k] for k in keys] if keys is not None else list(calls)
+        tasks = [asyncio.ensure_future(coro) for coro in coros]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        return dict(zip(keys, results)) if keys is not None else results
+
+    def close(self):
+        """
+        Shut down the executor (the database itself stays open).
+        """
+        self._executor.shutdown(wait=True)
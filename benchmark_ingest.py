@@ -0,0 +1,87 @@
+#############################################
+# benchmark_ingest.py
+#
+# Times StormDatabase.load_many with 1..N parser processes to show where
+# ingest stops scaling with cores and the single SQLite writer becomes the
+# bottleneck (writer_busy close to 100%).
+#
+#   python benchmark_ingest.py --table wind --files 72 --rows-per-file 20000
+#############################################
+
+import argparse
+import csv
+import itertools
+import os
+import tempfile
+
+from storm_database import StormDatabase
+
+SAMPLE_CSVS = {
+    "wind": "wind_historical_data.csv",
+    "tornado": "tor_historical_data.csv",
+    "hail": "hail_historical_data.csv",
+}
+
+
+def write_year_files(table_name, out_dir, num_files, rows_per_file):
+    """
+    Write num_files CSVs of rows_per_file rows each by cycling the sample CSV,
+    standing in for one StormEvents file per year.
+    """
+    with open(SAMPLE_CSVS[table_name], "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        sample_rows = list(reader)
+
+    paths = []
+    rows = itertools.cycle(sample_rows)
+    for i in range(num_files):
+        path = os.path.join(out_dir, f"{table_name}_{i:03d}.csv")
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(itertools.islice(rows, rows_per_file))
+        paths.append(path)
+    return paths
+
+
+def worker_counts(max_workers):
+    counts = [1]
+    while counts[-1] * 2 <= max_workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != max_workers:
+        counts.append(max_workers)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel CSV ingest.")
+    parser.add_argument("--table", choices=sorted(SAMPLE_CSVS), default="wind")
+    parser.add_argument("--files", type=int, default=72)
+    parser.add_argument("--rows-per-file", type=int, default=20000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_year_files(args.table, tmp, args.files, args.rows_per_file)
+        print(f"{args.files} files x {args.rows_per_file} rows into '{args.table}'")
+        print(f"{'workers':>7} {'seconds':>8} {'rows/sec':>10} {'speedup':>8} {'writer busy':>12}")
+
+        baseline = None
+        for workers in worker_counts(args.max_workers):
+            db_path = os.path.join(tmp, f"bench_{workers}.db")
+            db = StormDatabase(db_path, recreate=True)
+            db.create_table(args.table)
+            stats = db.load_many(paths, args.table, workers=workers)
+            db.close()
+            os.remove(db_path)
+
+            baseline = baseline or stats["seconds"]
+            print(
+                f"{workers:>7} {stats['seconds']:>8.2f} {stats['rows_per_sec']:>10,.0f} "
+                f"{baseline / stats['seconds']:>7.2f}x {stats['writer_busy']:>11.0%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
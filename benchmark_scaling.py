@@ -0,0 +1,267 @@
+#############################################
+# benchmark_scaling.py
+#
+# Scaling benchmark: for each hazard and size, writes a synthetic CSV
+# (synthetic_data.py), times load_csv_into_table into a fresh database and
+# then every public method of WindSQL / TornadoSQL / HailSQL (methods taking
+# approximate= are timed both ways), and writes throughput, latency
+# percentiles and peak RSS to JSON. Each size runs in a process of its own,
+# so its peak RSS isn't inflated by the sizes before it.
+#
+#   python benchmark_scaling.py --sizes 10000 100000 1000000 --out bench.json
+#   python benchmark_scaling.py --sizes 10000 --compare bench.json   # exit 1 on regressions
+#
+# 10^7 rows needs roughly 8 GB of free space per hazard for the CSV and
+# database; --work-dir puts them somewhere other than the temp directory.
+#############################################
+
+import argparse
+import inspect
+import json
+import math
+import multiprocessing
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from storm_database import StormDatabase, TABLE_DEFINITIONS
+from check_query_plans import PARAM_SAMPLES, QUERY_CLASSES
+from synthetic_data import SyntheticWorld, write_synthetic_csv
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def peak_rss_bytes():
+    """
+    Peak resident set size of this process so far, or None without the
+    resource module.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # kilobytes on Linux
+
+
+def nearest_rank(ordered, percent):
+    return ordered[max(1, math.ceil(percent / 100 * len(ordered))) - 1]
+
+
+def latency_summary(seconds):
+    """
+    Latency percentiles (ms) and throughput of a list of call durations.
+    """
+    ordered = sorted(seconds)
+    return {
+        "calls": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+        "p50_ms": nearest_rank(ordered, 50) * 1000,
+        "p90_ms": nearest_rank(ordered, 90) * 1000,
+        "p99_ms": nearest_rank(ordered, 99) * 1000,
+        "max_ms": ordered[-1] * 1000,
+        "calls_per_sec": len(ordered) / sum(ordered) if sum(ordered) > 0 else float("inf"),
+    }
+
+
+def method_calls(instance):
+    """
+    Yield (label, bound method, kwargs) for every public method of a query
+    object, with PARAM_SAMPLES for its required parameters, plus a
+    '<label>[approximate]' entry for methods that take approximate=.
+
+    Raises:
+        KeyError: If a required parameter has no sample value.
+    """
+    for name, method in inspect.getmembers(instance, inspect.ismethod):
+        if name.startswith("_"):
+            continue
+        label = f"{type(instance).__name__}.{name}"
+        params = inspect.signature(method).parameters
+        kwargs = {}
+        for param in params.values():
+            if param.default is inspect.Parameter.empty:
+                if param.name not in PARAM_SAMPLES:
+                    raise KeyError(f"{label}: no sample value for parameter '{param.name}'")
+                kwargs[param.name] = PARAM_SAMPLES[param.name]
+        yield label, method, kwargs
+        if "approximate" in params:
+            yield f"{label}[approximate]", method, dict(kwargs, approximate=True)
+
+
+def result_size(result):
+    """
+    Number of rows (or items) in a query result, draining streamed results.
+    """
+    if inspect.isgenerator(result):
+        return sum(1 for _ in result)
+    if isinstance(result, (list, tuple, dict)):
+        return len(result)
+    return 1
+
+
+def database_bytes(db_path):
+    return sum(os.path.getsize(path) for path in (db_path, f"{db_path}-wal")
+               if os.path.exists(path))
+
+
+def run_size(table_name, csv_path, db_path, repeat):
+    """
+    Load csv_path into a new database at db_path and time every query method
+    of the hazard repeat times, each after db.clear_caches(), so the latencies
+    are for uncached answers. Runs in a fresh process (see main).
+
+    Returns:
+        dict: 'ingest' (load_csv_into_table's stats plus 'db_bytes'),
+            'peak_rss_ingest_bytes', 'methods' (label -> latency_summary plus
+            'cached_ms', one more call without clearing caches, and
+            'result_size') and 'peak_rss_bytes'.
+    """
+    db = StormDatabase(db_path, recreate=True)
+    db.create_table(table_name)
+    stats = db.load_csv_into_table(csv_path, table_name)
+    run = {
+        "ingest": {
+            "rows": stats["rows"],
+            "seconds": stats["seconds"],
+            "rows_per_sec": stats["rows_per_sec"],
+            "writer_busy": stats["writer_busy"],
+            "db_bytes": database_bytes(db_path),
+        },
+        "peak_rss_ingest_bytes": peak_rss_bytes(),
+        "methods": {},
+    }
+
+    query_class = next(cls for cls in QUERY_CLASSES if cls(db).table == table_name)
+    for label, method, kwargs in method_calls(query_class(db)):
+        timings = []
+        for _ in range(repeat):
+            db.clear_caches()
+            started = time.perf_counter()
+            size = result_size(method(**kwargs))
+            timings.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        result_size(method(**kwargs))
+        run["methods"][label] = dict(latency_summary(timings),
+                                     cached_ms=(time.perf_counter() - started) * 1000,
+                                     result_size=size)
+
+    run["peak_rss_bytes"] = peak_rss_bytes()
+    db.close()
+    return run
+
+
+def compare_reports(baseline, report, tolerance, min_ms):
+    """
+    Compare a benchmark report with an earlier one.
+
+    Returns:
+        list: A line for each ingest time, method p50 latency or peak RSS of a
+            (table, rows) run present in both that grew by more than tolerance
+            times (and, for times, by more than min_ms).
+    """
+    earlier = {(run["table"], run["rows"]): run for run in baseline["runs"]}
+    regressions = []
+    for run in report["runs"]:
+        old = earlier.get((run["table"], run["rows"]))
+        if old is None:
+            continue
+        times = [("ingest", old["ingest"]["seconds"] * 1000, run["ingest"]["seconds"] * 1000)]
+        times += [(label, old["methods"][label]["p50_ms"], stats["p50_ms"])
+                  for label, stats in run["methods"].items() if label in old["methods"]]
+        prefix = f"{run['table']} {run['rows']:,} rows"
+        for what, before, after in times:
+            if after > before * tolerance and after - before > min_ms:
+                regressions.append(f"{prefix}: {what} {before:.2f} ms -> {after:.2f} ms "
+                                   f"({after / before:.2f}x)")
+        before, after = old.get("peak_rss_bytes"), run.get("peak_rss_bytes")
+        if before and after and after > before * tolerance:
+            regressions.append(f"{prefix}: peak RSS {before / 2**20:.0f} MiB -> {after / 2**20:.0f} MiB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ingest and queries on synthetic data.")
+    parser.add_argument("--tables", nargs="+", choices=sorted(TABLE_DEFINITIONS),
+                        default=list(TABLE_DEFINITIONS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=5, help="timed calls per method")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir",
+                        help="where the CSVs and databases go, created if missing (default: temp dir)")
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--compare", help="earlier --out file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=1.5,
+                        help="slowdown factor reported as a regression")
+    parser.add_argument("--min-ms", type=float, default=1.0,
+                        help="ignore slowdowns smaller than this many ms")
+    args = parser.parse_args()
+
+    world = SyntheticWorld(args.seed)
+    # spawn, not fork: each run's peak RSS starts from a fresh interpreter
+    context = multiprocessing.get_context("spawn")
+    runs = []
+    if args.work_dir:
+        os.makedirs(args.work_dir, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=args.work_dir) as tmp:
+        for table_name in args.tables:
+            for rows in args.sizes:
+                csv_path = os.path.join(tmp, f"{table_name}_{rows}.csv")
+                db_path = os.path.join(tmp, f"{table_name}_{rows}.db")
+                started = time.perf_counter()
+                csv_bytes = write_synthetic_csv(table_name, csv_path, rows, args.seed, world=world)
+                generate_seconds = time.perf_counter() - started
+
+                with context.Pool(1) as pool:
+                    run = pool.apply(run_size, (table_name, csv_path, db_path, args.repeat))
+                for path in (csv_path, db_path, f"{db_path}-wal", f"{db_path}-shm"):
+                    if os.path.exists(path):
+                        os.remove(path)
+                runs.append(dict(table=table_name, rows=rows, csv_bytes=csv_bytes,
+                                 generate_seconds=generate_seconds, **run))
+
+                ingest = run["ingest"]
+                rss = run["peak_rss_bytes"]
+                print(f"\n{table_name} x {rows:,}: ingest {ingest['seconds']:.2f} s "
+                      f"({ingest['rows_per_sec']:,.0f} rows/s), "
+                      f"db {ingest['db_bytes'] / 2**20:,.1f} MiB, "
+                      f"peak RSS {'n/a' if rss is None else f'{rss / 2**20:,.0f} MiB'}")
+                print(f"{'method':<58} {'p50 ms':>9} {'p90 ms':>9} {'max ms':>9} {'cached':>8}")
+                for label, stats in run["methods"].items():
+                    print(f"{label:<58} {stats['p50_ms']:>9.2f} {stats['p90_ms']:>9.2f} "
+                          f"{stats['max_ms']:>9.2f} {stats['cached_ms']:>8.2f}")
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "runs": runs,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nwrote {args.out}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare_reports(json.load(f), report, args.tolerance, args.min_ms)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.compare}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+#############################################
+# check_columnar_parity.py
+#
+# Parity check for the NumPy backend: calls every public method of WindSQL,
+# TornadoSQL and HailSQL and of their columnar_engine counterparts with the
+# same arguments, and exits non-zero if any result differs. Also prints how
+# long each engine took per method.
+#
+#   python check_columnar_parity.py            # builds a temporary DB from the CSVs
+#   python check_columnar_parity.py storms.db  # checks an existing DB
+#############################################
+
+import inspect
+import math
+import os
+import sys
+import tempfile
+import time
+
+from storm_database import StormDatabase, DEFAULT_CSV_SOURCES, resolve_columns
+from wind_sql import WindSQL
+from tornado_sql import TornadoSQL
+from hail_sql import HailSQL
+from columnar_engine import ColumnarStore, ColumnarWindSQL, ColumnarTornadoSQL, ColumnarHailSQL
+
+ENGINE_PAIRS = [
+    (WindSQL, ColumnarWindSQL),
+    (TornadoSQL, ColumnarTornadoSQL),
+    (HailSQL, ColumnarHailSQL),
+]
+
+# Argument values per parameter name. Call i uses case i (mod the list length)
+# of each parameter, so every method runs with as many argument sets as its
+# longest list. A required parameter missing from here is a failure. The
+# thresholds just off a stored value (50.00000001, 1.000000001, ...) would round
+# onto it if magnitudes were float32; they sit at even positions, where
+# approximate is False.
+PARAM_CASES = {
+    "min_knots": [None, 50.0, 65.0, 0.0, 50.00000001, 200.0, 50.5],
+    "min_size": [None, 1.0, 1.75, 0.88, 1.000000001, 5.0, 1.755],
+    "min_rating_str": [None, "EF1", "EF3", "EFU", "F5"],
+    "gust_knots": [0.0, 50.0, 65.0, 999.0, 50.00000001],
+    "gust_values": [[50.0, 65.0, 80.0], [], [50.00000001, 49.99999999], [0, 58, 1000]],
+    "size_inches": [0.0, 0.88, 1.75, 9.0, 1.000000001],
+    "size_values": [[1.0, 1.75, 2.75], [], [1.000000001, 1.74999999], [0.75, 0.88, 4.5]],
+    "length_miles": [0.0, 1.0, 5.0, 500.0, 0.1000000001],
+    "length_values": [[1.0, 5.0, 20.0], [], [0.1000000001, 0.4999999999], [0.1, 0.5, 100.0]],
+    "thresholds": [[50.0, 58.0, 65.0, 75.0, 90.0], [50.00000001, 49.99999999], [], [58, 58, 40.0]],
+    "percents": [[50, 90, 99], [], [0, 100, 12.5], [101]],
+    "approximate": [False, True],
+    "sizes": [[1.0, 1.75, 2.75], [1.000000001, 1.74999999], [], [0.88, 0.75]],
+    "min_rating_strs": [["EF0", "EF1", "EF2", "EF3", "EF4", "EF5"], [], ["EFU", "F2", "ef1"]],
+    "rating_str": ["EF1", "EF0", "F3", "EFU"],
+    "start_date": ["1990-01-01", "1950-01-01", "2010-06-01", "2030-01-01"],
+    "end_date": ["2020-12-31", "2025-12-31", "2010-06-30", "2031-01-01"],
+    "limit": [5, 1, 25, 0, 100000],
+    "start_time": ["1200", "0000", "2200", "1530"],
+    "end_time": ["1800", "2359", "0200", "1530"],
+    "start_year": [None, 1990, None, 2030],
+    "end_year": [None, 2020, 2000, None],
+    "county": [None, "__top__", "NO SUCH COUNTY", ""],
+    "columns": [None, ["DATE", "CountyName", "DAMAGE_PROPERTY_NUM", "TOR_LENGTH"], None,
+                ["[MAGNITUDE (Knots)]", "DAMAGE_PROPERTY_NUM", "HAIL SIZE (INCHES)"]],
+    "include_narratives": [False, True, True, False, False],
+    "query": ["roof", '"mobile home"', "no_such_word", '"unterminated'],
+    "lat": [25.77, 26.7, 0.0],
+    "lon": [-80.19, -80.05, 0.0],
+    "radius_km": [25.0, 5.0, 100.0, 0.0],
+    "min_lat": [25.5, 24.0, 30.0],
+    "min_lon": [-80.5, -83.0, -80.0],
+    "max_lat": [26.0, 28.0, 31.0],
+    "max_lon": [-80.0, -79.0, -79.0],
+    "polygon": [[(25.6, -80.5), (25.6, -80.1), (26.0, -80.1), (26.0, -80.5)],
+                [(26.0, -81.0), (27.0, -80.0), (25.0, -80.0)], [(1.0, 1.0), (2.0, 2.0)]],
+    "points": [[(25.77, -80.19), (26.12, -80.14), (26.71, -80.05)], [], [(0.0, 0.0)]],
+    "buffer_km": [0.0, 2.0, 10.0],
+}
+
+# Top-N methods: ties in the ORDER BY column may come back in either order, so
+# these compare the ordering column exactly and the rows as a multiset
+# (excluding rows tied at the cut-off, which either engine may pick).
+TOP_N_COLUMNS = {
+    "get_top_property_damage": "DAMAGE_PROPERTY_NUM",
+    "top_property_damage": "DAMAGE_PROPERTY_NUM",
+    "top_tornado_length": "TOR_LENGTH",
+}
+
+
+def same_value(a, b):
+    if isinstance(a, float) and isinstance(b, float):
+        return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-12)
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        return len(a) == len(b) and all(same_value(x, y) for x, y in zip(a, b))
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(same_value(a[k], b[k]) for k in a)
+    return type(a) is type(b) and a == b
+
+
+def same_top_rows(expected, actual, names, column):
+    index = names.index(column)
+    if not same_value([row[index] for row in expected], [row[index] for row in actual]):
+        return False
+    if not expected:
+        return True
+    cutoff = expected[-1][index]
+    above = lambda rows: sorted((row for row in rows if row[index] != cutoff), key=repr)
+    return same_value(above(expected), above(actual))
+
+
+def call_cases(method, counties):
+    """
+    Yield keyword-argument dicts for method built from PARAM_CASES.
+
+    Raises:
+        KeyError: If a required parameter has no cases.
+    """
+    params = list(inspect.signature(method).parameters.values())
+    for param in params:
+        if param.default is inspect.Parameter.empty and param.name not in PARAM_CASES:
+            raise KeyError(param.name)
+    known = [p for p in params if p.name in PARAM_CASES]
+    rounds = max((len(PARAM_CASES[p.name]) for p in known), default=1)
+    for i in range(rounds):
+        kwargs = {}
+        for p in known:
+            cases = PARAM_CASES[p.name]
+            value = cases[i % len(cases)]
+            kwargs[p.name] = counties if value == "__top__" else value
+        yield kwargs
+
+
+def timed(method, kwargs):
+    started = time.perf_counter()
+    try:
+        result = method(**kwargs)
+        if inspect.isgenerator(result):
+            result = list(result)
+    except Exception as exc:  # both engines must fail the same way
+        result = ("raised", type(exc).__name__)
+    return result, time.perf_counter() - started
+
+
+def check_database(db):
+    """
+    Compare every query method of both engines on db.
+
+    Returns:
+        list: Human-readable failure messages (empty if all results match).
+    """
+    failures = []
+    store = ColumnarStore(db)
+    print(f"{'method':<50} {'calls':>5} {'sqlite ms':>10} {'numpy ms':>9}")
+    for sql_class, columnar_class in ENGINE_PAIRS:
+        sql_obj = sql_class(db)
+        columnar_obj = columnar_class(db, store)
+        store.table(sql_obj.table)  # load up front so timings are per-query
+        top_county = db.value_counts(sql_obj.table, "CountyName", limit=1)
+        top_county = top_county[0][0] if top_county else None
+
+        for name, method in inspect.getmembers(sql_obj, inspect.ismethod):
+            if name.startswith("_"):
+                continue
+            label = f"{sql_class.__name__}.{name}"
+            try:
+                cases = list(call_cases(method, top_county))
+            except KeyError as exc:
+                failures.append(f"{label}: no cases for parameter '{exc.args[0]}'")
+                continue
+
+            sql_time = columnar_time = 0.0
+            for kwargs in cases:
+                db.clear_caches()
+                expected, elapsed = timed(method, kwargs)
+                sql_time += elapsed
+                actual, elapsed = timed(getattr(columnar_obj, name), kwargs)
+                columnar_time += elapsed
+
+                if name in TOP_N_COLUMNS and isinstance(expected, list):
+                    names = resolve_columns(sql_obj.table, kwargs.get("columns"),
+                                            kwargs.get("include_narratives", False))
+                    ok = isinstance(actual, list) and same_top_rows(
+                        expected, actual, names, TOP_N_COLUMNS[name])
+                else:
+                    ok = same_value(expected, actual)
+                if not ok:
+                    failures.append(f"{label}({kwargs}):\n    sqlite   {expected!r:.300}"
+                                    f"\n    columnar {actual!r:.300}")
+            print(f"{label:<50} {len(cases):>5} {sql_time * 1000:>10.2f} {columnar_time * 1000:>9.2f}")
+    return failures
+
+
+def main(argv):
+    if len(argv) > 1:
+        db = StormDatabase(argv[1], recreate=False, read_only=True)
+        failures = check_database(db)
+        db.close()
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = StormDatabase.open_or_build(os.path.join(tmp, "parity.db"), DEFAULT_CSV_SOURCES)
+            failures = check_database(db)
+            db.close()
+
+    for failure in failures:
+        print(f"MISMATCH: {failure}")
+    if failures:
+        return 1
+    print("Columnar results match SQLite.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,101 @@
+#############################################
+# check_pool_reads.py
+#
+# Concurrency check for the read connection pool: starts a long
+# load_csv_into_table on a WAL database opened with pool_size > 0, then
+# runs cached and uncached queries from another thread and exits non-zero
+# unless they all finish while the load is still running (i.e. pooled
+# readers never wait on the writer's lock).
+#
+#   python check_pool_reads.py              # wind CSV repeated 20 times
+#   python check_pool_reads.py --repeat 150
+#############################################
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from storm_database import StormDatabase
+from wind_sql import WindSQL
+
+SOURCE_CSV = "wind_historical_data.csv"
+
+
+def write_repeated_csv(path, repeat):
+    with open(SOURCE_CSV, "r", encoding="utf-8") as f:
+        header = f.readline()
+        body = f.read()
+    if not body.endswith("\n"):
+        body += "\n"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(header)
+        for _ in range(repeat):
+            f.write(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that pooled reads don't wait on a load.")
+    parser.add_argument("--repeat", type=int, default=20, help="copies of the wind CSV to load")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        big_csv = os.path.join(tmp, "wind_repeated.csv")
+        write_repeated_csv(big_csv, args.repeat)
+        db = StormDatabase(os.path.join(tmp, "pool.db"), recreate=True, pool_size=2)
+        db.create_table("wind")
+        db.load_csv_into_table(SOURCE_CSV, "wind")
+        wind = WindSQL(db)
+        before = wind.count_wind_gusts(50.0, "1990-01-01", "2020-12-31")
+
+        load_done = threading.Event()
+        errors = []
+
+        def load():
+            try:
+                db.load_csv_into_table(big_csv, "wind")
+            except Exception as exc:
+                errors.append(f"load failed: {exc!r}")
+            finally:
+                load_done.set()
+
+        loader = threading.Thread(target=load)
+        loader.start()
+        while not db.conn.in_transaction and not load_done.is_set():
+            time.sleep(0.01)
+
+        reads = [
+            ("cached count", lambda: wind.count_wind_gusts(50.0, "1990-01-01", "2020-12-31")),
+            ("uncached count", lambda: wind.count_wind_gusts(61.0, "1990-01-01", "2020-12-31")),
+            ("yearly breakdown", lambda: wind.yearly_breakdown()),
+        ]
+        for label, read in reads:
+            started = time.perf_counter()
+            result = read()
+            elapsed = time.perf_counter() - started
+            finished_first = not load_done.is_set()
+            print(f"{label:<20} {elapsed * 1000:>9.1f} ms  "
+                  f"{'during load' if finished_first else 'AFTER load'}")
+            if not finished_first:
+                errors.append(f"{label} only finished after the load ({elapsed:.1f}s)")
+            if label == "cached count" and result != before:
+                errors.append(f"cached count changed mid-load: {before} -> {result}")
+
+        loader.join()
+        after = wind.count_wind_gusts(50.0, "1990-01-01", "2020-12-31")
+        if after == before:
+            errors.append("cached count wasn't invalidated by the load")
+        db.close()
+
+    for error in errors:
+        print(f"FAIL: {error}")
+    if errors:
+        return 1
+    print("Pooled reads ran while the load held the writer.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+#############################################
+# check_query_plans.py
+#
+# Query-plan regression check: calls every public method of WindSQL,
+# TornadoSQL and HailSQL, runs EXPLAIN QUERY PLAN on each SQL statement it
+# issues, and exits non-zero if any statement falls back to a full SCAN of a
+# hazard table (a plan step "SCAN <table>" that doesn't use an index).
+#
+#   python check_query_plans.py            # builds a temporary DB from the CSVs
+#   python check_query_plans.py storms.db  # checks an existing DB
+#############################################
+
+import inspect
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+
+from storm_database import (StormDatabase, TABLE_DEFINITIONS, DEFAULT_CSV_SOURCES,
+                            events_table, narratives_table)
+from wind_sql import WindSQL
+from tornado_sql import TornadoSQL
+from hail_sql import HailSQL
+
+QUERY_CLASSES = [WindSQL, TornadoSQL, HailSQL]
+
+# Sample argument for each required parameter name used by the query methods.
+# A method with a parameter missing from here is reported as a failure, so new
+# query methods can't silently skip the check.
+PARAM_SAMPLES = {
+    "min_knots": 50.0,
+    "min_size": 1.0,
+    "gust_knots": 65.0,
+    "gust_values": [50.0, 65.0, 80.0],
+    "size_inches": 1.75,
+    "size_values": [1.0, 1.75, 2.75],
+    "length_miles": 5.0,
+    "length_values": [1.0, 5.0, 20.0],
+    "thresholds": [50.0, 58.0, 65.0, 75.0, 90.0],
+    "percents": [50, 90, 99],
+    "sizes": [1.0, 1.75, 2.75],
+    "min_rating_strs": ["EF0", "EF1", "EF2", "EF3", "EF4", "EF5"],
+    "rating_str": "EF1",
+    "min_rating_str": "EF1",
+    "start_date": "1990-01-01",
+    "end_date": "2020-12-31",
+    "limit": 5,
+    "start_time": "1200",
+    "end_time": "1800",
+    "query": "roof",
+    "lat": 25.77,
+    "lon": -80.19,
+    "radius_km": 25.0,
+    "min_lat": 25.5,
+    "min_lon": -80.5,
+    "max_lat": 26.0,
+    "max_lon": -80.0,
+    "polygon": [(25.6, -80.5), (25.6, -80.1), (26.0, -80.1), (26.0, -80.5)],
+    "points": [(25.77, -80.19), (26.12, -80.14), (26.71, -80.05)],
+}
+
+SCAN_PATTERN = re.compile(r"^SCAN (\w+)")
+SUBQUERY_PATTERN = re.compile(r"^(?:CO-ROUTINE|MATERIALIZE) (\w+)")
+
+# The hazard names are views; plans name the tables underneath them, including
+# the partition tables (<table>_events_1990, ...) behind <table>_events.
+HAZARD_TABLES = {name for table_name in TABLE_DEFINITIONS
+                 for name in (table_name, events_table(table_name), narratives_table(table_name))}
+PARTITION_PREFIXES = tuple(f"{events_table(table_name)}_" for table_name in TABLE_DEFINITIONS)
+
+# Partitions ANALYZE found to hold fewer rows than this may be scanned: for a
+# handful of rows a scan is the cheapest plan, not a missing index.
+SMALL_PARTITION_ROWS = 10
+
+
+class StatementRecorder:
+    """
+    Records every SELECT the database connection runs, via sqlite3's trace
+    callback, so statements issued inside StormDatabase helpers are seen too.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.statements = []
+
+    def __enter__(self):
+        self.statements.clear()
+        self.db.clear_caches()
+        self.db.conn.set_trace_callback(self._trace)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.db.conn.set_trace_callback(None)
+
+    def _trace(self, statement):
+        sql = statement.strip()
+        if sql.upper().startswith(("SELECT", "WITH")) and "sqlite_master" not in sql:
+            self.statements.append(sql)
+
+
+def small_partitions(db):
+    """
+    Names of the partition tables that sqlite_stat1 says hold fewer than
+    SMALL_PARTITION_ROWS rows.
+    """
+    try:
+        stats = db.execute_query("SELECT tbl, stat FROM sqlite_stat1", use_cache=False)
+    except sqlite3.OperationalError:  # never analyzed
+        return set()
+    return {table for table, stat in stats
+            if table.startswith(PARTITION_PREFIXES) and int(stat.split()[0]) < SMALL_PARTITION_ROWS}
+
+
+def full_scans(plan, exempt=()):
+    """
+    Return the plan steps that scan a hazard table without using an index.
+    Scans of a subquery's output (a partition UNION ALL run as a co-routine)
+    are skipped; the plan steps inside the subquery are checked instead.
+    Scans of the tables in exempt are skipped too.
+    """
+    subqueries = {match.group(1) for match in map(SUBQUERY_PATTERN.match, plan) if match}
+    scans = []
+    for detail in plan:
+        match = SCAN_PATTERN.match(detail)
+        if not match or match.group(1) in subqueries or "INDEX" in detail:
+            continue
+        name = match.group(1)
+        if name in exempt:
+            continue
+        if name in HAZARD_TABLES or name.startswith(PARTITION_PREFIXES):
+            scans.append(detail)
+    return scans
+
+
+def check_database(db):
+    """
+    Check every query method against db.
+
+    Returns:
+        list: Human-readable failure messages (empty if every plan is indexed).
+    """
+    failures = []
+    recorder = StatementRecorder(db)
+    exempt = small_partitions(db)
+    for query_class in QUERY_CLASSES:
+        instance = query_class(db)
+        for name, method in inspect.getmembers(instance, inspect.ismethod):
+            if name.startswith("_"):
+                continue
+            label = f"{query_class.__name__}.{name}"
+
+            kwargs = {}
+            for param in inspect.signature(method).parameters.values():
+                if param.default is not inspect.Parameter.empty:
+                    continue
+                if param.name not in PARAM_SAMPLES:
+                    failures.append(f"{label}: no sample value for parameter '{param.name}'")
+                    break
+                kwargs[param.name] = PARAM_SAMPLES[param.name]
+            else:
+                with recorder:
+                    result = method(**kwargs)
+                    if inspect.isgenerator(result):  # streaming methods run lazily
+                        list(result)
+                for sql in recorder.statements:
+                    for detail in full_scans(db.explain_query_plan(sql), exempt):
+                        failures.append(f"{label}: {detail}\n    {' '.join(sql.split())}")
+                print(f"checked {label} ({len(recorder.statements)} statements)")
+    return failures
+
+
+def main(argv):
+    if len(argv) > 1:
+        db = StormDatabase(argv[1], recreate=False, read_only=True)
+        failures = check_database(db)
+        db.close()
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = StormDatabase.open_or_build(os.path.join(tmp, "plans.db"), DEFAULT_CSV_SOURCES)
+            failures = check_database(db)
+            db.close()
+
+    for failure in failures:
+        print(f"FULL SCAN: {failure}")
+    if failures:
+        return 1
+    print("All query plans use an index.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
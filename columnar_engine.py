@@ -0,0 +1,496 @@
+#############################################
+# columnar_engine.py
+#
+# In-memory NumPy backend for the hazard queries. Each table is read from
+# the StormDatabase once into one array per column, and the query methods
+# are answered with vectorized masks instead of SQL:
+#
+#   store = ColumnarStore(db)
+#   wind = ColumnarWindSQL(db, store)
+#   wind.count_wind_gusts(58, "2000-01-01", "2024-12-31")
+#
+# The classes subclass WindSQL / TornadoSQL / HailSQL, so they take the same
+# arguments and return the same shapes, and any method not reimplemented
+# here still runs on SQLite. A table is reloaded when its version changes.
+# approximate=True answers come from the ingest-time sketches either way, so
+# those calls are passed on to the SQLite class too.
+# `python check_columnar_parity.py` compares every method with SQLite.
+#############################################
+
+import threading
+
+import numpy as np
+
+from storm_database import (
+    TABLE_DEFINITIONS, ROLLUP_MISSING_BUCKET, EPOCH_ORDINAL,
+    bucket_threshold, hhmm_to_minute, iso_to_day_number, parse_ef_rating, table_columns, stored_columns,
+    events_table, narrative_columns, resolve_columns, to_number,
+)
+from wind_sql import WindSQL
+from tornado_sql import TornadoSQL
+from hail_sql import HailSQL
+
+# Day-number columns, rebuilt from their datetime64 date column rather than stored.
+DAY_NUMBER_COLUMNS = {"DATE_NUM": "DATE", "END_DATE_NUM": "END_DATE"}
+
+
+def encode_strings(values):
+    """
+    Dictionary-encode a sequence of strings.
+
+    Returns:
+        tuple: (codes, categories) where codes is an int32 array indexing into
+            the object array categories, and -1 marks None.
+    """
+    index = {}
+    codes = np.fromiter(
+        (-1 if value is None else index.setdefault(value, len(index)) for value in values),
+        dtype=np.int32, count=len(values)
+    )
+    categories = np.empty(len(index), dtype=object)
+    categories[:] = list(index)
+    return codes, categories
+
+
+def lookup_categories(values):
+    """
+    Object array of a lookup table's values indexed by code, so the codes
+    stored in SQLite can be used as encode_strings codes. Unused codes are None.
+    """
+    categories = np.empty(max(values, default=-1) + 1, dtype=object)
+    for code, value in values.items():
+        categories[code] = value
+    return categories
+
+
+def rollup_buckets(values, scale):
+    """
+    The storm_rollup magnitude bucket of each value (see rollup_rows), with
+    ROLLUP_MISSING_BUCKET for NULL or non-numeric cells.
+    """
+    magnitudes = np.array([to_number(v) for v in values], dtype=np.float64)  # None -> NaN
+    missing = np.isnan(magnitudes)
+    buckets = np.floor(np.where(missing, 0.0, magnitudes) * scale + 1e-9)
+    return np.where(missing, ROLLUP_MISSING_BUCKET, buckets).astype(np.int32)
+
+
+class ColumnarTable:
+    """
+    One hazard table held as NumPy arrays, one per column.
+
+    Dates are datetime64[D] (NaT when missing), numbers float64 like SQLite's
+    REAL, so thresholds compare exactly as in SQL (NaN for NULL), and text is
+    dictionary-encoded as int32 codes into an array of distinct strings (-1
+    for NULL). Columns SQLite already stores as lookup codes keep those
+    codes. Text cells in a numeric column (blank CSV cells are stored as '')
+    become +inf, since SQLite sorts text above every number, and their text
+    is kept for rebuilding rows.
+    """
+
+    def __init__(self, table_name, rows, version=0, lookups=None):
+        """
+        Args:
+            table_name (str): 'wind', 'tornado', or 'hail'.
+            rows (list): The rows of the table's events table, as returned by
+                SELECT * (so no narratives; see StormDatabase.attach_narratives).
+            version (int): Table version the rows were read at.
+            lookups (dict, optional): Maps each dictionary-encoded column to its
+                lookup table as {code: value} (see StormDatabase.lookup_values).
+                Required if rows hold any codes.
+        """
+        self.name = table_name
+        self.version = version
+        self.num_rows = len(rows)
+        self.columns = {}  # name -> array (codes for text columns)
+        self.kinds = {}  # name -> 'date', 'day', 'text', 'REAL' or 'INTEGER'
+        self.categories = {}  # text column name -> array of distinct strings
+        self.text_cells = {}  # numeric column name -> {row index: text stored there}
+        self._sorted = {}
+
+        columns = table_columns(table_name)
+        table_def = TABLE_DEFINITIONS[table_name]
+        date_names = {columns[i][0] for i in table_def["date_columns"]}
+        spec = table_def["rollup"]
+        self.magnitude_name = columns[spec["magnitude"]][0]
+        stored = stored_columns(table_name)
+        values_by_column = list(zip(*rows)) if rows else [()] * len(stored)
+
+        for (name, col_type), values in zip(stored, values_by_column):
+            if name in DAY_NUMBER_COLUMNS:
+                self.kinds[name] = "day"
+            elif name in date_names:
+                self.kinds[name] = "date"
+                self.columns[name] = np.array(values, dtype="datetime64[D]")
+            elif name in table_def["lookups"]:
+                self.kinds[name] = "text"
+                self.columns[name] = np.array([-1 if v is None else v for v in values],
+                                              dtype=np.int32)
+                self.categories[name] = lookup_categories(lookups[name])
+            elif col_type == "TEXT":
+                self.kinds[name] = "text"
+                self.columns[name], self.categories[name] = encode_strings(values)
+            else:
+                if name == self.magnitude_name:
+                    self.mag_bucket = rollup_buckets(values, spec["bucket_scale"])
+                text_cells = {i: v for i, v in enumerate(values)
+                              if v is not None and not isinstance(v, (int, float))}
+                if text_cells:
+                    self.text_cells[name] = text_cells
+                array = np.array([np.nan if v is None else np.inf if i in text_cells else v
+                                  for i, v in enumerate(values)], dtype=np.float64)
+                self.kinds[name] = col_type
+                self.columns[name] = array
+
+        # Per-row values shared by the breakdown and time-of-day queries.
+        # Missing dates are year/month 0 and missing times minute -1.
+        dates = self.columns["DATE"]
+        missing = np.isnat(dates)
+        self.year = np.where(
+            missing, 0, dates.astype("datetime64[Y]").astype(np.int64) + 1970
+        ).astype(np.int16)
+        self.month = np.where(
+            missing, 0, dates.astype("datetime64[M]").astype(np.int64) % 12 + 1
+        ).astype(np.int8)
+        minutes = self.numeric("BEGIN_MINUTE")
+        self.begin_minute = np.where(np.isnan(minutes), -1, minutes).astype(np.int16)
+
+    def numeric(self, name):
+        """
+        A numeric column as a float array with NaN for NULL and +inf for text.
+        """
+        return self.columns[name]
+
+    def sorted_values(self, name):
+        """
+        A numeric column's numbers (no NULL or text cells) in ascending order,
+        computed once.
+        """
+        values = self._sorted.get(name)
+        if values is None:
+            values = self.numeric(name)
+            values = self._sorted[name] = np.sort(values[np.isfinite(values)])
+        return values
+
+    def text_equals(self, name, value):
+        """
+        Boolean mask of rows whose text column equals value. '' also matches
+        NULL, as it does in storm_rollup.
+        """
+        codes = self.columns[name]
+        matches = np.flatnonzero(self.categories[name] == value)
+        mask = codes == matches[0] if len(matches) else np.zeros(self.num_rows, dtype=bool)
+        if value == "":
+            mask |= codes == -1
+        return mask
+
+    def date_mask(self, start_date, end_date):
+        """
+        Boolean mask of rows dated start_date..end_date (YYYY-MM-DD, inclusive).
+
+        Raises:
+            ValueError: If either date isn't a valid YYYY-MM-DD date.
+        """
+        start = np.datetime64(iso_to_day_number(start_date), "D")
+        end = np.datetime64(iso_to_day_number(end_date), "D")
+        dates = self.columns["DATE"]
+        return (dates >= start) & (dates <= end)
+
+    def _column_values(self, name, indices):
+        kind = self.kinds[name]
+        if kind == "day":
+            return [None if d is None else d.toordinal() - EPOCH_ORDINAL
+                    for d in self.columns[DAY_NUMBER_COLUMNS[name]][indices].tolist()]
+        values = self.columns[name][indices]
+        if kind == "date":
+            return [None if d is None else d.isoformat() for d in values.tolist()]
+        if kind == "text":
+            categories = self.categories[name]
+            return [None if code < 0 else categories[code] for code in values.tolist()]
+        values = values.tolist()
+        if kind == "INTEGER":
+            values = [None if v != v else int(v) if v.is_integer() else v for v in values]
+        else:
+            values = [None if v != v else v for v in values]
+        text_cells = self.text_cells.get(name)
+        if text_cells:
+            values = [text_cells.get(i, v) for i, v in zip(np.asarray(indices).tolist(), values)]
+        return values
+
+    def rows(self, indices, names):
+        """
+        Rebuild rows of the named stored columns for the given row indices.
+        """
+        columns = [self._column_values(name, indices) for name in names]
+        return list(zip(*columns))
+
+
+class ColumnarStore:
+    """
+    Loads hazard tables from a StormDatabase into ColumnarTables on first use,
+    and reloads a table when its version changes (e.g. after a CSV load).
+    One store can be shared by the wind, tornado and hail query objects.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def table(self, table_name):
+        version = self.db.table_version(table_name)
+        with self._lock:
+            data = self._tables.get(table_name)
+            if data is None or data.version != version:
+                rows = self.db.execute_query(f"SELECT * FROM {events_table(table_name)}",
+                                             use_cache=False)
+                # read after the rows: lookups only grow, so every code is covered
+                lookups = {name: self.db.lookup_values(lookup)
+                           for name, lookup in TABLE_DEFINITIONS[table_name]["lookups"].items()}
+                data = self._tables[table_name] = ColumnarTable(table_name, rows, version, lookups)
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
+
+
+class ColumnarQueries:
+    """
+    Vectorized implementations shared by the columnar hazard classes. Mixed in
+    ahead of WindSQL / TornadoSQL / HailSQL, which supply self.table and the
+    SQLite fallback for everything not overridden.
+    """
+
+    def __init__(self, db, store=None):
+        """
+        Args:
+            db (StormDatabase): Database the columns are loaded from.
+            store (ColumnarStore, optional): Store to share with other query
+                objects. Defaults to a new one.
+        """
+        super().__init__(db)
+        self.store = store if store is not None else ColumnarStore(db)
+
+    def _data(self):
+        return self.store.table(self.table)
+
+    def _count_at_least(self, column, minimum, start_date, end_date):
+        data = self._data()
+        values = data.numeric(column)
+        # comparing with NULL is never true in SQL, nor with NaN here
+        minimum = np.nan if minimum is None else minimum
+        mask = data.date_mask(start_date, end_date) & (values >= minimum)
+        return int(np.count_nonzero(mask))
+
+    def _threshold_counts(self, column, thresholds, start_date, end_date):
+        # Same result as StormDatabase.threshold_counts: one sort, one searchsorted
+        levels = sorted(set(thresholds))
+        if not levels:
+            return {}
+        data = self._data()
+        values = data.numeric(column)[data.date_mask(start_date, end_date)]
+        values = np.sort(values[~np.isnan(values)])
+        positions = np.searchsorted(values, np.asarray(levels, dtype=values.dtype), side="left")
+        return {level: int(len(values) - p) for level, p in zip(levels, positions)}
+
+    def _top_rows(self, column, limit, mask=None, columns=None, include_narratives=False):
+        # ORDER BY column DESC LIMIT n, with NULLs last as in SQLite
+        names = resolve_columns(self.table, columns, include_narratives)
+        data = self._data()
+        candidates = np.arange(data.num_rows) if mask is None else np.flatnonzero(mask)
+        limit = int(limit)
+        limit = len(candidates) if limit < 0 else min(limit, len(candidates))
+        if limit == 0:
+            return []
+        values = data.numeric(column)[candidates]
+        # Text cells (+inf) sort above every number, ordered by their text
+        text_cells = data.text_cells.get(column, {})
+        text_rows = sorted(np.flatnonzero(np.isposinf(values)).tolist(),
+                           key=lambda i: text_cells[int(candidates[i])], reverse=True)[:limit]
+        numbers = np.flatnonzero(~np.isposinf(values))
+        keys = np.nan_to_num(values[numbers].astype(np.float64), nan=-np.inf)
+        rest = limit - len(text_rows)
+        if rest < len(numbers):
+            top = np.argpartition(-keys, rest - 1)[:rest] if rest else np.arange(0)
+        else:
+            top = np.arange(len(numbers))
+        top = np.concatenate([np.array(text_rows, dtype=np.intp),
+                              numbers[top[np.argsort(-keys[top], kind="stable")]]])
+        narrative_names = narrative_columns(self.table)
+        stored_names = ["EVENT_ID"] + [name for name in names if name not in narrative_names]
+        return self.db.attach_narratives(self.table, names,
+                                         data.rows(candidates[top], stored_names))
+
+    def _percentile_ranks(self, column, values):
+        data = self._data()
+        if data.num_rows == 0:
+            return [0.0 for _ in values]
+        sorted_values = data.sorted_values(column)
+        positions = np.searchsorted(
+            sorted_values, np.asarray(list(values), dtype=sorted_values.dtype), side="left"
+        )
+        return [int(p) / data.num_rows * 100 for p in positions]
+
+    def _breakdown(self, period, county=None, min_magnitude=None):
+        # Same result as StormDatabase.rollup_breakdown, via np.bincount
+        data = self._data()
+        if period == "month":
+            labels, label_format = data.month, "%02d"
+        elif period == "year":
+            labels, label_format = data.year, "%04d"
+        else:
+            raise ValueError(f"period must be 'month' or 'year', not {period!r}")
+
+        mask = np.ones(data.num_rows, dtype=bool)
+        if county is not None:
+            mask &= data.text_equals("CountyName", county)
+        if min_magnitude is not None:
+            bucket = bucket_threshold(self.table, min_magnitude)
+            if bucket is not None:
+                mask &= data.mag_bucket >= bucket
+            else:
+                # Between buckets: compare the magnitudes, leaving out text cells
+                values = data.numeric(data.magnitude_name)
+                mask &= np.isfinite(values) & (values >= min_magnitude)
+
+        counts = np.bincount(labels[mask].astype(np.int64), minlength=1)
+        return [(None if p == 0 else label_format % p, int(c))
+                for p, c in enumerate(counts.tolist()) if c]
+
+    def _percent_in_time_window(self, start_time, end_time, start_year=None, end_year=None):
+        # Same result as StormDatabase.percent_in_time_window
+        start_minute, end_minute = hhmm_to_minute(start_time), hhmm_to_minute(end_time)
+        data = self._data()
+        in_years = np.ones(data.num_rows, dtype=bool)
+        if start_year is not None:
+            in_years &= data.year >= start_year
+        if end_year is not None:
+            in_years &= data.year <= end_year
+        total = np.count_nonzero(in_years)
+        if total == 0:
+            return 0.0
+
+        minute = data.begin_minute
+        if start_minute <= end_minute:
+            in_window = (minute >= start_minute) & (minute <= end_minute)
+        else:  # wraps past midnight
+            in_window = (minute >= start_minute) | ((minute >= 0) & (minute <= end_minute))
+        return (np.count_nonzero(in_window & in_years) / total) * 100
+
+
+class ColumnarWindSQL(ColumnarQueries, WindSQL):
+    """
+    WindSQL answered from in-memory NumPy columns.
+    """
+
+    def count_wind_gusts(self, min_knots, start_date, end_date, approximate=False):
+        if approximate:
+            return super().count_wind_gusts(min_knots, start_date, end_date, approximate)
+        return self._count_at_least("[MAGNITUDE (Knots)]", min_knots, start_date, end_date)
+
+    def count_wind_gusts_multi(self, thresholds, start_date, end_date):
+        return self._threshold_counts("[MAGNITUDE (Knots)]", thresholds, start_date, end_date)
+
+    def get_top_property_damage(self, start_date, end_date, limit=5, columns=None,
+                                include_narratives=False):
+        mask = self._data().date_mask(start_date, end_date)
+        return self._top_rows("DAMAGE_PROPERTY_NUM", limit, mask, columns, include_narratives)
+
+    def get_percentile_ranks(self, gust_values, approximate=False):
+        if approximate:
+            return super().get_percentile_ranks(gust_values, approximate)
+        return self._percentile_ranks("[MAGNITUDE (Knots)]", gust_values)
+
+    def monthly_breakdown(self, county=None, min_knots=None):
+        return self._breakdown("month", county, min_knots)
+
+    def yearly_breakdown(self, county=None, min_knots=None):
+        return self._breakdown("year", county, min_knots)
+
+    def percent_of_events_in_time_range(self, start_time, end_time, start_year=None, end_year=None):
+        return self._percent_in_time_window(start_time, end_time, start_year, end_year)
+
+
+class ColumnarTornadoSQL(ColumnarQueries, TornadoSQL):
+    """
+    TornadoSQL answered from in-memory NumPy columns.
+    """
+
+    def count_ef_tornadoes_exact(self, rating_str, start_date, end_date, approximate=False):
+        if approximate:
+            return super().count_ef_tornadoes_exact(rating_str, start_date, end_date, approximate)
+        target = parse_ef_rating(rating_str)
+        data = self._data()
+        mask = data.date_mask(start_date, end_date) & (data.numeric("EF_NUM") == target)
+        return int(np.count_nonzero(mask))
+
+    def count_ef_tornadoes_at_least(self, min_rating_str, start_date, end_date,
+                                    approximate=False):
+        if approximate:
+            return super().count_ef_tornadoes_at_least(min_rating_str, start_date, end_date,
+                                                       approximate)
+        return self._count_at_least("EF_NUM", parse_ef_rating(min_rating_str),
+                                    start_date, end_date)
+
+    def count_ef_tornadoes_at_least_multi(self, min_rating_strs, start_date, end_date):
+        numeric = {rating: parse_ef_rating(rating) for rating in min_rating_strs}
+        counts = self._threshold_counts("EF_NUM", numeric.values(), start_date, end_date)
+        return {rating: counts[value] for rating, value in numeric.items()}
+
+    def monthly_breakdown(self, county=None, min_rating_str=None):
+        min_rating = None if min_rating_str is None else parse_ef_rating(min_rating_str)
+        return self._breakdown("month", county, min_rating)
+
+    def yearly_breakdown(self, county=None, min_rating_str=None):
+        min_rating = None if min_rating_str is None else parse_ef_rating(min_rating_str)
+        return self._breakdown("year", county, min_rating)
+
+    def top_property_damage(self, start_date, end_date, limit=5, columns=None,
+                            include_narratives=False):
+        mask = self._data().date_mask(start_date, end_date)
+        return self._top_rows("DAMAGE_PROPERTY_NUM", limit, mask, columns, include_narratives)
+
+    def top_tornado_length(self, limit=5, columns=None, include_narratives=False):
+        return self._top_rows("TOR_LENGTH", limit, None, columns, include_narratives)
+
+    def get_length_percentile_ranks(self, length_values, approximate=False):
+        if approximate:
+            return super().get_length_percentile_ranks(length_values, approximate)
+        return self._percentile_ranks("TOR_LENGTH", length_values)
+
+    def percent_of_tornadoes_between_times(self, start_time, end_time,
+                                           start_year=None, end_year=None):
+        return self._percent_in_time_window(start_time, end_time, start_year, end_year)
+
+
+class ColumnarHailSQL(ColumnarQueries, HailSQL):
+    """
+    HailSQL answered from in-memory NumPy columns.
+    """
+
+    def count_hail_above_size(self, min_size, start_date, end_date, approximate=False):
+        if approximate:
+            return super().count_hail_above_size(min_size, start_date, end_date, approximate)
+        return self._count_at_least("[HAIL SIZE (INCHES)]", min_size, start_date, end_date)
+
+    def count_hail_above_sizes(self, sizes, start_date, end_date):
+        return self._threshold_counts("[HAIL SIZE (INCHES)]", sizes, start_date, end_date)
+
+    def get_percentile_ranks(self, size_values, approximate=False):
+        if approximate:
+            return super().get_percentile_ranks(size_values, approximate)
+        return self._percentile_ranks("[HAIL SIZE (INCHES)]", size_values)
+
+    def monthly_breakdown(self, county=None, min_size=None):
+        return self._breakdown("month", county, min_size)
+
+    def yearly_breakdown(self, county=None, min_size=None):
+        return self._breakdown("year", county, min_size)
+
+    def top_property_damage(self, start_date, end_date, limit=5, columns=None,
+                            include_narratives=False):
+        mask = self._data().date_mask(start_date, end_date)
+        return self._top_rows("DAMAGE_PROPERTY_NUM", limit, mask, columns, include_narratives)
+
+    def percent_of_hail_in_time_range(self, start_time, end_time, start_year=None, end_year=None):
+        return self._percent_in_time_window(start_time, end_time, start_year, end_year)
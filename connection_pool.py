@@ -0,0 +1,134 @@
+import os
+import pathlib
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+class ReadConnectionPool:
+    """
+    A fixed set of read-only SQLite connections that threads check out per query.
+
+    Each connection is opened with the URI mode=ro flag and check_same_thread=False,
+    so any thread can use whichever connection it is handed, and keeps its own
+    prepared-statement cache. The database should be in WAL mode so readers never
+    block on (or block) the single writer.
+    """
+
+    def __init__(self, db_path, size=4, statement_cache_size=128, timeout=30.0):
+        """
+        Args:
+            db_path (str): Path to an existing SQLite database file.
+            size (int): Number of read connections. Defaults to 4.
+            statement_cache_size (int): Prepared statements cached per connection.
+            timeout (float): Seconds to wait for a free connection (and for SQLite
+                locks) before raising. Defaults to 30.
+        """
+        if size < 1:
+            raise ValueError("Connection pool size must be at least 1")
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        uri = pathlib.Path(os.path.abspath(db_path)).as_uri() + "?mode=ro"
+
+        self._all = []
+        self._available = queue.LifoQueue()  # reuse the warmest connection first
+        for _ in range(size):
+            conn = sqlite3.connect(
+                uri, uri=True, check_same_thread=False,
+                cached_statements=statement_cache_size, timeout=timeout
+            )
+            self._all.append(conn)
+            self._available.put(conn)
+
+        self._stats_lock = threading.Lock()
+        # connection -> its PRAGMA data_version when last read (see data_version)
+        self._seen_versions = {}
+        self._external_version = 0
+        self.checkouts = 0
+        self.waits = 0  # checkouts that found no free connection
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @contextmanager
+    def connection(self):
+        """
+        Check out a connection for the duration of the with-block.
+
+        Raises:
+            TimeoutError: If no connection frees up within the pool timeout.
+        """
+        started = time.perf_counter()
+        try:
+            conn = self._available.get_nowait()
+            waited = False
+        except queue.Empty:
+            waited = True
+            try:
+                conn = self._available.get(timeout=self.timeout)
+            except queue.Empty:
+                raise TimeoutError(
+                    f"No read connection free after {self.timeout}s (pool size {self.size})"
+                ) from None
+        wait = time.perf_counter() - started
+
+        with self._stats_lock:
+            self.checkouts += 1
+            self.waits += waited
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._available.put(conn)
+
+    def data_version(self):
+        """
+        A counter that goes up after any other connection (the writer included)
+        commits, read from a pooled connection so it never waits on the writer.
+
+        PRAGMA data_version is per connection, so each connection's last value
+        is kept, and the counter is bumped when the one checked out has moved
+        on (or is read for the first time). A commit may bump it once per
+        connection, never zero times.
+        """
+        with self.connection() as conn:
+            seen = conn.execute("PRAGMA data_version").fetchone()[0]
+            with self._stats_lock:
+                if seen != self._seen_versions.get(conn):
+                    self._seen_versions[conn] = seen
+                    self._external_version += 1
+                return self._external_version
+
+    def set_progress_handler(self, handler, n):
+        """
+        Install an sqlite3 progress handler on every pooled connection.
+        """
+        for conn in self._all:
+            conn.set_progress_handler(handler, n)
+
+    def stats(self):
+        """
+        Returns:
+            dict: size, in_use, checkouts, waits, total_wait, avg_wait and max_wait
+                (seconds).
+        """
+        with self._stats_lock:
+            return {
+                "size": self.size,
+                "in_use": self.size - self._available.qsize(),
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "total_wait": self.total_wait,
+                "avg_wait": self.total_wait / self.checkouts if self.checkouts else 0.0,
+                "max_wait": self.max_wait,
+            }
+
+    def close(self):
+        for conn in self._all:
+            conn.close()
@@ -1,4 +1,4 @@
-from storm_database import StormDatabase
+from storm_database import StormDatabase, iso_to_day_number, resolve_columns
 
 class HailSQL:
     def __init__(self, db):
@@ -11,7 +11,7 @@ class HailSQL:
         self.db = db
         self.table = "hail"
     
-    def count_hail_above_size(self, min_size, start_date, end_date):
+    def count_hail_above_size(self, min_size, start_date, end_date, approximate=False):
         """
         Count hail events with size >= specified inches in date range.
         
@@ -19,51 +19,155 @@ class HailSQL:
             min_size (float): Minimum hail size in inches.
             start_date (str): Start date in YYYY-MM-DD format.
             end_date (str): End date in YYYY-MM-DD format.
+            approximate (bool): If True, estimate the count from the samples kept
+                at ingest (see StormDatabase.approximate_count). Defaults to False.
             
         Returns:
-            int: Number of matching hail events.
+            int: Number of matching hail events, or an Estimate (value, low, high)
+                if approximate.
         """
+        if approximate:
+            return self.db.approximate_count(self.table, start_date, end_date, min_size)
         sql = f"""
         SELECT COUNT(*)
-        FROM {self.table}
+        FROM {self.db.events_source(self.table, start_date, end_date)}
         WHERE [HAIL SIZE (INCHES)] >= ?
-          AND DATE >= ?
-          AND DATE <= ?
+          AND DATE_NUM >= ?
+          AND DATE_NUM <= ?
         """
-        row = self.db.execute_query(sql, (min_size, start_date, end_date))
+        row = self.db.execute_query(
+            sql, (min_size, iso_to_day_number(start_date), iso_to_day_number(end_date))
+        )
         return row[0][0]
 
-    def monthly_breakdown(self):
+    def count_hail_above_sizes(self, sizes, start_date, end_date):
+        """
+        Count hail events >= each of several sizes in one table pass.
+        
+        Args:
+            sizes (iterable): Minimum hail sizes in inches, e.g. [1, 1.75, 2.75].
+            start_date (str): Start date in YYYY-MM-DD format.
+            end_date (str): End date in YYYY-MM-DD format.
+            
+        Returns:
+            dict: Maps each size to the count count_hail_above_size would return.
+        """
+        return self.db.threshold_counts(self.table, "[HAIL SIZE (INCHES)]", sizes,
+                                        start_date, end_date)
+
+    def get_percentile_rank(self, size_inches, approximate=False):
+        """
+        Calculate percentile rank of a given hail size.
+        
+        Args:
+            size_inches (float): Hail size in inches.
+            approximate (bool): If True, estimate it (see get_percentile_ranks).
+            
+        Returns:
+            float: Percentage of hail events smaller than size_inches, or an
+                Estimate (value, low, high) if approximate.
+        """
+        return self.get_percentile_ranks([size_inches], approximate)[0]
+
+    def get_percentile_ranks(self, size_values, approximate=False):
+        """
+        Calculate percentile ranks for many hail sizes at once.
+        
+        Args:
+            size_values (iterable): Hail sizes in inches.
+            approximate (bool): If True, estimate the ranks from the size
+                sketches kept at ingest instead. Defaults to False.
+            
+        Returns:
+            list: Percentile rank of each value (an Estimate if approximate),
+                in input order.
+        """
+        if approximate:
+            return self.db.approximate_percentile_ranks(self.table, "[HAIL SIZE (INCHES)]",
+                                                        size_values)
+        return self.db.percentile_ranks(self.table, "[HAIL SIZE (INCHES)]", size_values)
+
+    def size_percentiles(self, percents, approximate=False):
+        """
+        Hail sizes at the given percentiles of all hail events.
+        
+        Args:
+            percents (iterable): Percentiles, each 0-100, e.g. [50, 90, 99].
+            approximate (bool): If True, estimate them from the size sketches
+                kept at ingest. Defaults to False.
+            
+        Returns:
+            list: Inches at each percentile (an Estimate if approximate; None if
+                there are no sizes), in input order.
+        """
+        if approximate:
+            return self.db.approximate_percentiles(self.table, "[HAIL SIZE (INCHES)]", percents)
+        return self.db.column_percentiles(self.table, "[HAIL SIZE (INCHES)]", percents)
+
+    def damage_percentiles(self, percents, approximate=False):
+        """
+        Property damage at the given percentiles of all hail events.
+        
+        Args:
+            percents (iterable): Percentiles, each 0-100, e.g. [50, 90, 99].
+            approximate (bool): If True, estimate them from the damage sketches
+                kept at ingest. Defaults to False.
+            
+        Returns:
+            list: Damage in dollars at each percentile (an Estimate if
+                approximate; None if there are no damage figures), in input order.
+        """
+        if approximate:
+            return self.db.approximate_percentiles(self.table, "DAMAGE_PROPERTY_NUM", percents)
+        return self.db.column_percentiles(self.table, "DAMAGE_PROPERTY_NUM", percents)
+
+    def distinct_counties(self, approximate=False):
+        """
+        Count the distinct counties with hail events.
+        
+        Args:
+            approximate (bool): If True, estimate it from the HyperLogLog
+                sketches kept at ingest. Defaults to False.
+            
+        Returns:
+            int: Number of distinct CountyName values, or an Estimate
+                (value, low, high) if approximate.
+        """
+        if approximate:
+            return self.db.approximate_distinct_count(self.table, "CountyName")
+        return self.db.distinct_count(self.table, "CountyName")
+
+    def monthly_breakdown(self, county=None, min_size=None):
         """
         Group hail events by month across all years.
         
+        Args:
+            county (str, optional): Only count events in this CountyName.
+            min_size (float, optional): Only count events with hail size >= this many inches.
+        
         Returns:
             list: List of (month, count) tuples, where month is '01'-'12'.
+            
+        Note:
+            Reads the storm_rollup table maintained at ingest, not the hail table.
         """
-        sql = f"""
-        SELECT strftime('%m', DATE) AS Month, COUNT(*)
-        FROM {self.table}
-        GROUP BY Month
-        ORDER BY Month
-        """
-        return self.db.execute_query(sql)
+        return self.db.rollup_breakdown(self.table, "month", county, min_size)
 
-    def yearly_breakdown(self):
+    def yearly_breakdown(self, county=None, min_size=None):
         """
         Group hail events by year across entire dataset.
         
+        Args:
+            county (str, optional): Only count events in this CountyName.
+            min_size (float, optional): Only count events with hail size >= this many inches.
+        
         Returns:
             list: List of (year, count) tuples, where year is like '1950'.
         """
-        sql = f"""
-        SELECT strftime('%Y', DATE) AS Year, COUNT(*)
-        FROM {self.table}
-        GROUP BY Year
-        ORDER BY Year
-        """
-        return self.db.execute_query(sql)
+        return self.db.rollup_breakdown(self.table, "year", county, min_size)
 
-    def top_property_damage(self, start_date, end_date, limit=5):
+    def top_property_damage(self, start_date, end_date, limit=5, columns=None,
+                            include_narratives=False):
         """
         Get hail events with highest property damage within date range.
         
@@ -71,41 +175,106 @@ class HailSQL:
             start_date (str): Start date in YYYY-MM-DD format.
             end_date (str): End date in YYYY-MM-DD format.
             limit (int): Maximum number of results to return. Defaults to 5.
-            
+            columns (list, optional): Columns to return, e.g. ['DATE', 'CountyName'].
+                Defaults to every column.
+            include_narratives (bool): Accepted for symmetry with wind and tornado;
+                the hail data has no narratives.
+        
         Returns:
             list: List of hail event records sorted by damage amount.
+        
+        Raises:
+            ValueError: If columns names a column the hail table doesn't have.
         """
-        sql = f"""
-        SELECT *
-        FROM {self.table}
-        WHERE DATE >= ?
-          AND DATE <= ?
-        ORDER BY DAMAGE_PROPERTY_NUM DESC
-        LIMIT ?
-        """
-        return self.db.execute_query(sql, (start_date, end_date, limit))
+        names = resolve_columns(self.table, columns, include_narratives)
+        rows = self.db.top_rows(self.table, names, "DAMAGE_PROPERTY_NUM", limit,
+                                start_date, end_date)
+        return self.db.attach_narratives(self.table, names, rows)
+
+    def iter_events(self, start_date, end_date, header=True):
+        """
+        Stream every hail event in a date range, in date order, for exports.
+        
+        Args:
+            start_date (str): Start date in YYYY-MM-DD format.
+            end_date (str): End date in YYYY-MM-DD format.
+            header (bool): If True, the first item is a tuple of column names.
+            
+        Returns:
+            iterator: Event rows (the hail table's columns), fetched in batches
+                rather than all at once.
+        """
+        return self.db.iter_events(self.table, start_date, end_date, header)
+
+    def events_in_bbox(self, min_lat, min_lon, max_lat, max_lon, start_date=None,
+                       end_date=None, min_size=None, columns=None):
+        """
+        Get hail events located inside a lat/lon box, via the R*Tree index.
+        
+        Args:
+            min_lat, min_lon, max_lat, max_lon (float): The box, in degrees.
+            start_date (str, optional): Only events on or after this YYYY-MM-DD date.
+            end_date (str, optional): Only events on or before this YYYY-MM-DD date.
+            min_size (float, optional): Only events with hail size >= this many inches.
+            columns (list, optional): Columns to return. Defaults to every column
+                except the narratives.
+        
+        Returns:
+            list: Tuples of the requested columns.
+        """
+        return self.db.events_in_bbox(self.table, min_lat, min_lon, max_lat, max_lon,
+                                      start_date, end_date, min_size, columns)
 
-    def percent_of_hail_in_time_range(self, start_time, end_time):
+    def events_within_km(self, lat, lon, radius_km, start_date=None, end_date=None,
+                         min_size=None, columns=None):
+        """
+        Get hail events within radius_km of a point, nearest first.
+        
+        Args:
+            lat, lon (float): The point, in degrees.
+            radius_km (float): Search radius in kilometres.
+            start_date (str, optional): Only events on or after this YYYY-MM-DD date.
+            end_date (str, optional): Only events on or before this YYYY-MM-DD date.
+            min_size (float, optional): Only events with hail size >= this many inches.
+            columns (list, optional): Columns to return. Defaults to every column
+                except the narratives.
+        
+        Returns:
+            list: Tuples of the requested columns followed by the distance in km.
+        
+        Note:
+            Candidates come from the R*Tree box around the circle; only those are
+            checked with the exact haversine distance.
+        """
+        return self.db.events_within_km(self.table, lat, lon, radius_km,
+                                        start_date, end_date, min_size, columns)
+
+    def count_within_km(self, lat, lon, radius_km, start_date=None, end_date=None, min_size=None):
+        """
+        Count hail events within radius_km of a point (see events_within_km).
+        
+        Returns:
+            int: Number of matching hail events.
+        """
+        return self.db.count_within_km(self.table, lat, lon, radius_km,
+                                       start_date, end_date, min_size)
+
+    def percent_of_hail_in_time_range(self, start_time, end_time, start_year=None, end_year=None):
         """
         Calculate percentage of hail events occurring between specified times.
         
         Args:
             start_time (str): Start time in HHMM format (e.g., '1400').
-            end_time (str): End time in HHMM format (e.g., '1600').
+            end_time (str): End time in HHMM format (e.g., '1600'). If earlier than
+                start_time, the window wraps past midnight (e.g., '2200' to '0200').
+            start_year (int, optional): Only consider events from this year on.
+            end_year (int, optional): Only consider events up to this year.
             
         Returns:
             float: Percentage of events occurring in time range.
+            
+        Note:
+            Answered from prefix sums over the time_histogram table, not a scan.
         """
-        total_sql = f"SELECT COUNT(*) FROM {self.table}"
-        total = self.db.execute_query(total_sql)[0][0]
-        if total == 0:
-            return 0.0
-
-        range_sql = f"""
-        SELECT COUNT(*)
-        FROM {self.table}
-        WHERE BEGIN_TIME >= ?
-          AND BEGIN_TIME <= ?
-        """
-        in_range = self.db.execute_query(range_sql, (start_time, end_time))[0][0]
-        return (in_range / total) * 100
\ No newline at end of file
+        return self.db.percent_in_time_window(self.table, start_time, end_time,
+                                              start_year, end_year)
\ No newline at end of file
@@ -5,34 +5,60 @@
 import streamlit as st
 import pandas as pd
 
-from storm_database import StormDatabase
+from storm_database import DEFAULT_CSV_SOURCES, fts_phrase, fts_terms, iso_to_day_number
+from snapshot import open_or_restore
 from wind_sql import WindSQL
 from tornado_sql import TornadoSQL
 from hail_sql import HailSQL
+from columnar_engine import ColumnarStore, ColumnarWindSQL, ColumnarTornadoSQL, ColumnarHailSQL
 
 # This is our new helper that handles showing/downloading DataFrame results in Streamlit
 from ui_helper_sql import UIHelperSQL
 
+# How the "Search narratives" text becomes an FTS5 query. Only the last mode
+# reads operators, so only it can fail on input like half-inch or *.
+SEARCH_MODES = {
+    "Exact phrase": fts_phrase,
+    "All of the words": fts_terms,
+    "FTS5 query syntax": lambda text: text,
+}
+SEARCH_SYNTAX_HELP = ("FTS5 syntax: words are ANDed; OR, NOT and NEAR(a b, 5) combine them, "
+                      "\"quotes\" make a phrase, and a trailing * matches a prefix (roof*). "
+                      "Quote words with - or other punctuation in them.")
+
+@st.cache_resource
+def get_query_objects():
+    """
+    Open storms.db once per server process and share it across sessions and reruns.
+    Queries check out one of the pooled read-only connections, so concurrent
+    sessions don't serialize on a single connection. If storms.db is missing but
+    a storms_snapshot/ export exists, the database is rebuilt from that instead
+    of the CSVs.
+    """
+    db = open_or_restore("storms.db", "storms_snapshot", DEFAULT_CSV_SOURCES, pool_size=4)
+    return db, WindSQL(db), TornadoSQL(db), HailSQL(db)
+
+@st.cache_resource
+def get_columnar_query_objects(_db):
+    """
+    The same queries answered from in-memory NumPy columns (columnar_engine.py).
+    Each table is loaded into memory the first time one of its queries runs.
+    """
+    store = ColumnarStore(_db)
+    return ColumnarWindSQL(_db, store), ColumnarTornadoSQL(_db, store), ColumnarHailSQL(_db, store)
+
 def main():
     st.title("Severe Weather Data Explorer (SQL Edition)")
 
-    # 1) Create brand-new DB (removes old file if recreate=True)
-    db = StormDatabase("storms.db", recreate=True)
-
-    # 2) Create tables
-    db.create_table("wind")
-    db.create_table("tornado")
-    db.create_table("hail")
-
-    # 3) Load CSV data into those tables
-    db.load_csv_into_table("wind_historical_data.csv", "wind")
-    db.load_csv_into_table("tor_historical_data.csv", "tornado")
-    db.load_csv_into_table("hail_historical_data.csv", "hail")
+    # 1-3) Open storms.db, rebuilding only the tables whose CSVs (or schema) changed.
+    #      When nothing changed this is a read-only open with no CSV parsing at all.
+    # 4) Instantiate SQL classes (like your old approach), shared by every session
+    db, wind, tornado, hail = get_query_objects()
 
-    # 4) Instantiate SQL classes (like your old approach)
-    wind = WindSQL(db)
-    tornado = TornadoSQL(db)
-    hail = HailSQL(db)
+    # Both engines take the same arguments and return the same results
+    engine = st.sidebar.radio("Query engine:", ["SQLite", "Columnar (NumPy)"])
+    if engine == "Columnar (NumPy)":
+        wind, tornado, hail = get_columnar_query_objects(db)
 
     # 5) Let user pick which dataset they'd like to query
     dataset_choice = st.radio("Pick a Dataset:", ["Wind", "Tornado", "Hail"])
@@ -51,6 +77,8 @@ def main():
                 "Monthly breakdown (entire dataset)",
                 "Yearly breakdown (entire dataset)",
                 "Percent of events between times",
+                "Export all events in date range (CSV)",
+                "Search narratives",
             ]
         )
 
@@ -65,28 +93,38 @@ def main():
                 UIHelperSQL.clear_dataset_keys(key_prefix)
 
                 # Execute the SQL query
-                result = wind.count_wind_gusts(min_knots, start_date, end_date)
-                # Convert the single integer to a 1-row DataFrame
-                df_result = pd.DataFrame({"Count": [result]})
-                UIHelperSQL.set_query_results(df_result, f"{key_prefix}_count_gusts")
-
-                # Let user show/download the last results for this query
-                UIHelperSQL.show_and_download_results(f"{key_prefix}_count_gusts", "Wind Gusts Count")
+                try:
+                    result = wind.count_wind_gusts(min_knots, start_date, end_date)
+                except ValueError as exc:
+                    st.error(str(exc))
+                else:
+                    # Convert the single integer to a 1-row DataFrame
+                    df_result = pd.DataFrame({"Count": [result]})
+                    UIHelperSQL.set_query_results(df_result, f"{key_prefix}_count_gusts")
+
+                    # Let user show/download the last results for this query
+                    UIHelperSQL.show_and_download_results(f"{key_prefix}_count_gusts", "Wind Gusts Count")
 
         # 2) Top-N property damage
         elif query_type == "Top-N property damage (in date range)":
             start_date = st.text_input("Start Date (YYYY-MM-DD)", "1950-01-01")
             end_date = st.text_input("End Date (YYYY-MM-DD)", "2025-12-31")
             limit = st.number_input("Top N results", min_value=1, value=5)
+            include_narratives = st.checkbox("Include narratives", value=False)
 
             if st.button("Run Query"):
                 UIHelperSQL.clear_dataset_keys(key_prefix)
-                rows = wind.get_top_property_damage(start_date, end_date, limit)
-                df_result = pd.DataFrame(rows)
-                UIHelperSQL.set_query_results(df_result, f"{key_prefix}_top_damage")
-
-                # Let user show/download the last results for this query
-                UIHelperSQL.show_and_download_results(f"{key_prefix}_top_damage", "Wind Top Damage")
+                try:
+                    rows = wind.get_top_property_damage(start_date, end_date, limit,
+                                                        include_narratives=include_narratives)
+                except ValueError as exc:
+                    st.error(str(exc))
+                else:
+                    df_result = pd.DataFrame(rows)
+                    UIHelperSQL.set_query_results(df_result, f"{key_prefix}_top_damage")
+
+                    # Let user show/download the last results for this query
+                    UIHelperSQL.show_and_download_results(f"{key_prefix}_top_damage", "Wind Top Damage")
 
         # 3) Percentile rank of a certain gust
         elif query_type == "Percentile rank of a certain gust":
@@ -129,12 +167,64 @@ def main():
 
             if st.button("Run Query"):
                 UIHelperSQL.clear_dataset_keys(key_prefix)
-                pct = wind.percent_of_events_in_time_range(t_start, t_end)
-                df_result = pd.DataFrame({"Percent (%)": [pct]})
-                UIHelperSQL.set_query_results(df_result, f"{key_prefix}_pct_time")
+                try:
+                    pct = wind.percent_of_events_in_time_range(t_start, t_end)
+                except ValueError as exc:
+                    st.error(str(exc))
+                else:
+                    df_result = pd.DataFrame({"Percent (%)": [pct]})
+                    UIHelperSQL.set_query_results(df_result, f"{key_prefix}_pct_time")
+
+                    # Let user show/download the last results for this query
+                    UIHelperSQL.show_and_download_results(f"{key_prefix}_pct_time", "Wind Events % in Time Range")
+
+        # 7) Export all events in a date range, streamed from the database
+        elif query_type == "Export all events in date range (CSV)":
+            start_date = st.text_input("Start Date (YYYY-MM-DD)", "1950-01-01")
+            end_date = st.text_input("End Date (YYYY-MM-DD)", "2025-12-31")
 
-                # Let user show/download the last results for this query
-                UIHelperSQL.show_and_download_results(f"{key_prefix}_pct_time", "Wind Events % in Time Range")
+            if st.button("Run Query"):
+                UIHelperSQL.clear_dataset_keys(key_prefix)
+                try:
+                    # iter_events only runs when the preview/download needs rows, so
+                    # check the dates now rather than storing a query that can't run
+                    iso_to_day_number(start_date)
+                    iso_to_day_number(end_date)
+                except ValueError as exc:
+                    st.error(str(exc))
+                else:
+                    UIHelperSQL.set_streamed_results(
+                        lambda: wind.iter_events(start_date, end_date), f"{key_prefix}_export"
+                    )
+
+            UIHelperSQL.show_and_stream_results(f"{key_prefix}_export", "Wind Events")
+
+        # 8) Full-text search over the event/episode narratives
+        elif query_type == "Search narratives":
+            search_text = st.text_input("Search for", "roof blown off")
+            match_mode = st.radio("Match", list(SEARCH_MODES), help=SEARCH_SYNTAX_HELP)
+            start_date = st.text_input("Start Date (YYYY-MM-DD)", "1950-01-01")
+            end_date = st.text_input("End Date (YYYY-MM-DD)", "2025-12-31")
+            min_knots = st.number_input("Minimum knots", min_value=0.0, value=0.0)
+            limit = st.number_input("Max results", min_value=1, value=20)
+
+            if st.button("Run Query"):
+                UIHelperSQL.clear_dataset_keys(key_prefix)
+                query = SEARCH_MODES[match_mode](search_text)
+                try:
+                    rows = wind.search_narratives(
+                        query, start_date, end_date, min_knots or None,
+                        ["DATE", "CountyName", "MAGNITUDE (Knots)"], limit
+                    )
+                except ValueError as exc:
+                    st.error(str(exc))
+                else:
+                    df_result = pd.DataFrame(
+                        rows, columns=["Date", "County", "Knots", "Score", "Snippet"]
+                    )
+                    UIHelperSQL.set_query_results(df_result, f"{key_prefix}_search")
+
+            UIHelperSQL.show_and_download_results(f"{key_prefix}_search", "Wind Narrative Search")
 
     ###################################
     # TORNADO QUERIES
@@ -150,6 +240,8 @@ def main():
                 "Top-N by property damage",
                 "Top-N by tornado length",
                 "Percent of tornadoes between times",
+                "Export all tornadoes in date range (CSV)",
+                "Search narratives",
             ]
         )
 
@@ -161,12 +253,16 @@ def main():
 
             if st.button("Run Query"):
                 UIHelperSQL.clear_dataset_keys(key_prefix)
-                result = tornado.count_ef_tornadoes_exact(ef_scale, start_date, end_date)
-                df_result = pd.DataFrame({"Count": [result]})
-                UIHelperSQL.set_query_results(df_result, f"{key_prefix}_ef_exact")
+                try:
+                    result = tornado.count_ef_tornadoes_exact(ef_scale, start_date, end_date)
+                except ValueError as exc:
+                    st.error(str(exc))
+                else:
+                    df_result = pd.DataFrame({"Count": [result]})
+                    UIHelperSQL.set_query_results(df_result, f"{key_prefix}_ef_exact")
 
-                # Let user show/download the last results for this query
-                UIHelperSQL.show_and_download_results(f"{key_prefix}_ef_exact", "Tornado EF Exact Count")
+                    # Let user show/download the last results for this query
+                    UIHelperSQL.show_and_download_results(f"{key_prefix}_ef_exact", "Tornado EF Exact Count")
 
         # 2) Count EF tornadoes >= rating
         elif query_type == "Count EF tornadoes >= rating":
@@ -176,11 +272,15 @@ def main():
 
             if st.button("Run Query"):
                 UIHelperSQL.clear_dataset_keys(key_prefix)
-                result = tornado.count_ef_tornadoes_at_least(ef_scale, start_date, end_date)
-                df_result = pd.DataFrame({"Count": [result]})
-                UIHelperSQL.set_query_results(df_result, f"{key_prefix}_ef_atleast")
+                try:
+                    result = tornado.count_ef_tornadoes_at_least(ef_scale, start_date, end_date)
+                except ValueError as exc:
+                    st.error(str(exc))
+                else:
+                    df_result = pd.DataFrame({"Count": [result]})
+                    UIHelperSQL.set_query_results(df_result, f"{key_prefix}_ef_atleast")
 
-                UIHelperSQL.show_and_download_results(f"{key_prefix}_ef_atleast", "Tornado EF >= Count")
+                    UIHelperSQL.show_and_download_results(f"{key_prefix}_ef_atleast", "Tornado EF >= Count")
 
         # 3) Monthly breakdown
         elif query_type == "Monthly breakdown":
@@ -207,22 +307,29 @@ def main():
             start_date = st.text_input("Start Date (YYYY-MM-DD)", "1950-01-01")
             end_date = st.text_input("End Date (YYYY-MM-DD)", "2025-12-31")
             limit = st.number_input("How many results?", min_value=1, value=5)
+            include_narratives = st.checkbox("Include narratives", value=False)
 
             if st.button("Run Query"):
                 UIHelperSQL.clear_dataset_keys(key_prefix)
-                rows = tornado.top_property_damage(start_date, end_date, limit)
-                df_result = pd.DataFrame(rows)
-                UIHelperSQL.set_query_results(df_result, f"{key_prefix}_top_damage")
+                try:
+                    rows = tornado.top_property_damage(start_date, end_date, limit,
+                                                       include_narratives=include_narratives)
+                except ValueError as exc:
+                    st.error(str(exc))
+                else:
+                    df_result = pd.DataFrame(rows)
+                    UIHelperSQL.set_query_results(df_result, f"{key_prefix}_top_damage")
 
-                UIHelperSQL.show_and_download_results(f"{key_prefix}_top_damage", "Tornado Top Damage")
+                    UIHelperSQL.show_and_download_results(f"{key_prefix}_top_damage", "Tornado Top Damage")
 
         # 6) Top-N by tornado length
         elif query_type == "Top-N by tornado length":
             limit = st.number_input("How many results?", min_value=1, value=5)
+            include_narratives = st.checkbox("Include narratives", value=False)
 
             if st.button("Run Query"):
                 UIHelperSQL.clear_dataset_keys(key_prefix)
-                rows = tornado.top_tornado_length(limit)
+                rows = tornado.top_tornado_length(limit, include_narratives=include_narratives)
                 df_result = pd.DataFrame(rows)
                 UIHelperSQL.set_query_results(df_result, f"{key_prefix}_top_length")
 
@@ -235,11 +342,61 @@ def main():
 
             if st.button("Run Query"):
                 UIHelperSQL.clear_dataset_keys(key_prefix)
-                pct = tornado.percent_of_tornadoes_between_times(start_time, end_time)
-                df_result = pd.DataFrame({"Percent (%)": [pct]})
-                UIHelperSQL.set_query_results(df_result, f"{key_prefix}_pct_time")
+                try:
+                    pct = tornado.percent_of_tornadoes_between_times(start_time, end_time)
+                except ValueError as exc:
+                    st.error(str(exc))
+                else:
+                    df_result = pd.DataFrame({"Percent (%)": [pct]})
+                    UIHelperSQL.set_query_results(df_result, f"{key_prefix}_pct_time")
+
+                    UIHelperSQL.show_and_download_results(f"{key_prefix}_pct_time", "Tornado % Between Times")
+
+        # 8) Export all tornadoes in a date range, streamed from the database
+        elif query_type == "Export all tornadoes in date range (CSV)":
+            start_date = st.text_input("Start Date (YYYY-MM-DD)", "1950-01-01")
+            end_date = st.text_input("End Date (YYYY-MM-DD)", "2025-12-31")
 
-                UIHelperSQL.show_and_download_results(f"{key_prefix}_pct_time", "Tornado % Between Times")
+            if st.button("Run Query"):
+                UIHelperSQL.clear_dataset_keys(key_prefix)
+                try:
+                    iso_to_day_number(start_date)
+                    iso_to_day_number(end_date)
+                except ValueError as exc:
+                    st.error(str(exc))
+                else:
+                    UIHelperSQL.set_streamed_results(
+                        lambda: tornado.iter_events(start_date, end_date), f"{key_prefix}_export"
+                    )
+
+            UIHelperSQL.show_and_stream_results(f"{key_prefix}_export", "Tornado Events")
+
+        # 9) Full-text search over the event/episode narratives
+        elif query_type == "Search narratives":
+            search_text = st.text_input("Search for", "mobile home")
+            match_mode = st.radio("Match", list(SEARCH_MODES), help=SEARCH_SYNTAX_HELP)
+            start_date = st.text_input("Start Date (YYYY-MM-DD)", "1950-01-01")
+            end_date = st.text_input("End Date (YYYY-MM-DD)", "2025-12-31")
+            ef_scale = st.text_input("Minimum EF Scale (blank for any)", "")
+            limit = st.number_input("Max results", min_value=1, value=20)
+
+            if st.button("Run Query"):
+                UIHelperSQL.clear_dataset_keys(key_prefix)
+                query = SEARCH_MODES[match_mode](search_text)
+                try:
+                    rows = tornado.search_narratives(
+                        query, start_date, end_date, ef_scale or None,
+                        ["DATE", "CountyName", "TOR_F_SCALE"], limit
+                    )
+                except ValueError as exc:
+                    st.error(str(exc))
+                else:
+                    df_result = pd.DataFrame(
+                        rows, columns=["Date", "County", "Rating", "Score", "Snippet"]
+                    )
+                    UIHelperSQL.set_query_results(df_result, f"{key_prefix}_search")
+
+            UIHelperSQL.show_and_download_results(f"{key_prefix}_search", "Tornado Narrative Search")
 
     ###################################
     # HAIL QUERIES
@@ -252,7 +409,8 @@ def main():
                 "Monthly breakdown",
                 "Yearly breakdown",
                 "Top-N by property damage",
-                "Percent of hail events between times"
+                "Percent of hail events between times",
+                "Export all hail events in date range (CSV)",
             ]
         )
 
@@ -264,11 +422,15 @@ def main():
 
             if st.button("Run Query"):
                 UIHelperSQL.clear_dataset_keys(key_prefix)
-                result = hail.count_hail_above_size(min_hail, start_date, end_date)
-                df_result = pd.DataFrame({"Count": [result]})
-                UIHelperSQL.set_query_results(df_result, f"{key_prefix}_count_size")
+                try:
+                    result = hail.count_hail_above_size(min_hail, start_date, end_date)
+                except ValueError as exc:
+                    st.error(str(exc))
+                else:
+                    df_result = pd.DataFrame({"Count": [result]})
+                    UIHelperSQL.set_query_results(df_result, f"{key_prefix}_count_size")
 
-                UIHelperSQL.show_and_download_results(f"{key_prefix}_count_size", "Hail Count >= Size")
+                    UIHelperSQL.show_and_download_results(f"{key_prefix}_count_size", "Hail Count >= Size")
 
         # 2) Monthly breakdown
         elif query_type == "Monthly breakdown":
@@ -298,11 +460,15 @@ def main():
 
             if st.button("Run Query"):
                 UIHelperSQL.clear_dataset_keys(key_prefix)
-                rows = hail.top_property_damage(start_date, end_date, limit)
-                df_result = pd.DataFrame(rows)
-                UIHelperSQL.set_query_results(df_result, f"{key_prefix}_top_damage")
+                try:
+                    rows = hail.top_property_damage(start_date, end_date, limit)
+                except ValueError as exc:
+                    st.error(str(exc))
+                else:
+                    df_result = pd.DataFrame(rows)
+                    UIHelperSQL.set_query_results(df_result, f"{key_prefix}_top_damage")
 
-                UIHelperSQL.show_and_download_results(f"{key_prefix}_top_damage", "Hail Top Damage")
+                    UIHelperSQL.show_and_download_results(f"{key_prefix}_top_damage", "Hail Top Damage")
 
         # 5) Percent of hail events between times
         elif query_type == "Percent of hail events between times":
@@ -311,15 +477,40 @@ def main():
 
             if st.button("Run Query"):
                 UIHelperSQL.clear_dataset_keys(key_prefix)
-                pct = hail.percent_of_hail_in_time_range(start_time, end_time)
-                df_result = pd.DataFrame({"Percent (%)": [pct]})
-                UIHelperSQL.set_query_results(df_result, f"{key_prefix}_pct_time")
+                try:
+                    pct = hail.percent_of_hail_in_time_range(start_time, end_time)
+                except ValueError as exc:
+                    st.error(str(exc))
+                else:
+                    df_result = pd.DataFrame({"Percent (%)": [pct]})
+                    UIHelperSQL.set_query_results(df_result, f"{key_prefix}_pct_time")
+
+                    UIHelperSQL.show_and_download_results(f"{key_prefix}_pct_time", "Hail % Between Times")
+
+        # 6) Export all hail events in a date range, streamed from the database
+        elif query_type == "Export all hail events in date range (CSV)":
+            start_date = st.text_input("Start Date (YYYY-MM-DD)", "1950-01-01")
+            end_date = st.text_input("End Date (YYYY-MM-DD)", "2025-12-31")
 
-                UIHelperSQL.show_and_download_results(f"{key_prefix}_pct_time", "Hail % Between Times")
+            if st.button("Run Query"):
+                UIHelperSQL.clear_dataset_keys(key_prefix)
+                try:
+                    iso_to_day_number(start_date)
+                    iso_to_day_number(end_date)
+                except ValueError as exc:
+                    st.error(str(exc))
+                else:
+                    UIHelperSQL.set_streamed_results(
+                        lambda: hail.iter_events(start_date, end_date), f"{key_prefix}_export"
+                    )
+
+            UIHelperSQL.show_and_stream_results(f"{key_prefix}_export", "Hail Events")
 
     # Optionally, a button to close the DB
     if st.button("Close DB"):
         db.close()
+        get_query_objects.clear()  # the next rerun reopens it
+        get_columnar_query_objects.clear()
         st.write("Database connection closed.")
 
 
@@ -0,0 +1,115 @@
+import sys
+import threading
+from collections import OrderedDict
+
+
+def estimate_size(rows):
+    """
+    Rough byte size of a query result (list of tuples), for the cache's byte limit.
+    """
+    size = sys.getsizeof(rows)
+    for row in rows:
+        size += sys.getsizeof(row)
+        for value in row:
+            size += sys.getsizeof(value)
+    return size
+
+
+def normalize_sql(sql):
+    """
+    Collapse whitespace so the same query written with different indentation
+    shares one cache entry.
+    """
+    return " ".join(sql.split())
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache of query results, bounded by entry count and total bytes.
+
+    Entries are tagged with the data version they were computed at. When the
+    caller presents a newer version, everything cached so far is dropped.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024):
+        """
+        Args:
+            max_entries (int): Maximum number of cached results. 0 disables caching.
+            max_bytes (int): Maximum estimated size of all cached results. Results
+                larger than this on their own are never cached.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (rows, size)
+        self._bytes = 0
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _check_version(self, version):
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._bytes = 0
+            self._version = version
+
+    def get(self, key, version):
+        """
+        Return the cached rows for key, or None on a miss.
+        """
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, rows, version):
+        """
+        Cache rows for key, evicting least-recently-used entries to stay in bounds.
+        """
+        if self.max_entries <= 0:
+            return
+        size = estimate_size(rows)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._check_version(version)
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (rows, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """
+        Returns:
+            dict: hits, misses, evictions, invalidations, entries, bytes and hit_rate.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
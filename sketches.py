@@ -0,0 +1,301 @@
+import base64
+import bisect
+import hashlib
+import json
+import math
+import random
+from collections import namedtuple
+
+# Mergeable summaries behind StormDatabase's approximate mode. One of each is
+# kept per partition table (storm_sketches) and updated at ingest:
+#   KLLSketch    quantiles and ranks of a numeric column
+#   HyperLogLog  number of distinct values in a column
+#   Reservoir    uniform sample of EVENT_IDs, for counts under ad-hoc filters
+
+CONFIDENCE = 0.99
+Z_SCORE = 2.576  # two-sided normal quantile for CONFIDENCE
+
+KLL_K = 200
+HLL_PRECISION = 12  # 4096 registers: about 1.6% standard error
+SAMPLE_SIZE = 1024
+
+Estimate = namedtuple("Estimate", ["value", "low", "high"])
+Estimate.__doc__ = """
+An approximate answer with bounds that hold with probability CONFIDENCE.
+"""
+
+_random = random.Random()
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch (Karnin, Lang & Liberty 2016) over numbers.
+
+    Items live in levels; an item at level h stands for 2**h inputs. When a
+    level outgrows its capacity it is sorted and every other item (odd or even
+    positions, at random) is promoted to the next level. Each such compaction
+    moves any rank by at most 2**h with zero mean, so the rank error is bounded
+    with Hoeffding's inequality from the compactions done so far (rank_error).
+    """
+
+    def __init__(self, k=KLL_K):
+        self.k = k
+        self.n = 0
+        self.min = None
+        self.max = None
+        self.levels = [[]]
+        self.compactions = [0]
+        self._cumulative = None
+
+    def update(self, values):
+        """
+        Add an iterable of numbers.
+        """
+        values = list(values)
+        if not values:
+            return
+        self.n += len(values)
+        low, high = min(values), max(values)
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+        self.levels[0].extend(values)
+        self._compress()
+
+    def merge(self, other):
+        """
+        Fold another sketch into this one.
+        """
+        if not other.n:
+            return
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+            self.compactions.append(0)
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+        for level, count in enumerate(other.compactions):
+            self.compactions[level] += count
+        self.n += other.n
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self._compress()
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, math.ceil(self.k * (2 / 3) ** depth))
+
+    def _compress(self):
+        self._cumulative = None
+        level = 0
+        while level < len(self.levels):
+            if len(self.levels[level]) >= self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append([])
+                    self.compactions.append(0)
+                items = sorted(self.levels[level])
+                self.levels[level] = [items.pop()] if len(items) % 2 else []
+                self.levels[level + 1].extend(items[_random.getrandbits(1)::2])
+                self.compactions[level] += 1
+            level += 1
+
+    def _weighted(self):
+        """
+        (sorted items, cumulative weights), rebuilt after each change.
+        """
+        if self._cumulative is None:
+            pairs = sorted((value, 1 << level)
+                           for level, items in enumerate(self.levels) for value in items)
+            total = 0
+            cumulative = []
+            for _, weight in pairs:
+                total += weight
+                cumulative.append(total)
+            self._cumulative = ([value for value, _ in pairs], cumulative)
+        return self._cumulative
+
+    def rank_error(self, confidence=CONFIDENCE):
+        """
+        Bound on the error of rank() that holds with probability confidence.
+        """
+        variance = sum(count * 4 ** level for level, count in enumerate(self.compactions))
+        return math.sqrt(2 * variance * math.log(2 / (1 - confidence)))
+
+    def rank(self, value):
+        """
+        Estimated number of inputs less than value.
+        """
+        items, cumulative = self._weighted()
+        index = bisect.bisect_left(items, value)
+        return cumulative[index - 1] if index else 0
+
+    def rank_estimate(self, value):
+        """
+        rank() as an Estimate, clamped to 0..n.
+        """
+        if self.min is None or value <= self.min:
+            return Estimate(0, 0, 0)
+        if value > self.max:
+            return Estimate(self.n, self.n, self.n)
+        rank = self.rank(value)
+        error = self.rank_error()
+        return Estimate(rank, max(0.0, rank - error), min(float(self.n), rank + error))
+
+    def _at_rank(self, rank):
+        if rank <= 1:
+            return self.min
+        if rank >= self.n:
+            return self.max
+        items, cumulative = self._weighted()
+        return items[min(bisect.bisect_left(cumulative, rank), len(items) - 1)]
+
+    def quantile(self, percent):
+        """
+        Nearest-rank percentile of the inputs as an Estimate, or None if empty.
+        """
+        if not self.n:
+            return None
+        rank = max(1, math.ceil(percent / 100 * self.n))
+        error = self.rank_error()
+        return Estimate(self._at_rank(rank), self._at_rank(math.floor(rank - error)),
+                        self._at_rank(math.ceil(rank + error)))
+
+    def to_state(self):
+        return json.dumps({"k": self.k, "n": self.n, "min": self.min, "max": self.max,
+                           "levels": self.levels, "compactions": self.compactions})
+
+    @classmethod
+    def from_state(cls, state):
+        fields = json.loads(state)
+        sketch = cls(fields["k"])
+        sketch.n = fields["n"]
+        sketch.min = fields["min"]
+        sketch.max = fields["max"]
+        sketch.levels = fields["levels"]
+        sketch.compactions = fields["compactions"]
+        return sketch
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct counter (Flajolet et al. 2007) with 2**precision
+    registers, using linear counting while many registers are still empty.
+    Values are hashed by repr(), so 1 and '1' count as different values.
+    """
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def update(self, values):
+        """
+        Add an iterable of values; None is skipped, as COUNT(DISTINCT) does.
+        """
+        suffix_bits = 64 - self.precision
+        suffix_mask = (1 << suffix_bits) - 1
+        registers = self.registers
+        for value in set(values):
+            if value is None:
+                continue
+            digest = hashlib.blake2b(repr(value).encode(), digest_size=8).digest()
+            hashed = int.from_bytes(digest, "big")
+            index = hashed >> suffix_bits
+            rank = suffix_bits - (hashed & suffix_mask).bit_length() + 1
+            if rank > registers[index]:
+                registers[index] = rank
+
+    def merge(self, other):
+        """
+        Fold another counter (of the same precision) into this one.
+        """
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def estimate(self):
+        """
+        Distinct count as an Estimate (bounds from the 1.04/sqrt(m) standard error).
+        """
+        m = len(self.registers)
+        zeros = self.registers.count(0)
+        if zeros == m:
+            return Estimate(0.0, 0.0, 0.0)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        value = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        if value <= 2.5 * m and zeros:
+            value = m * math.log(m / zeros)
+        error = Z_SCORE * 1.04 / math.sqrt(m) * value
+        return Estimate(value, max(1.0, value - error), value + error)
+
+    def to_state(self):
+        return json.dumps({"precision": self.precision,
+                           "registers": base64.b64encode(self.registers).decode("ascii")})
+
+    @classmethod
+    def from_state(cls, state):
+        fields = json.loads(state)
+        counter = cls(fields["precision"])
+        counter.registers = bytearray(base64.b64decode(fields["registers"]))
+        return counter
+
+
+class Reservoir:
+    """
+    Uniform sample of up to size items from a stream (Vitter's Algorithm R).
+    seen is the exact number of items offered, i.e. the partition's row count.
+    """
+
+    def __init__(self, size=SAMPLE_SIZE):
+        self.size = size
+        self.seen = 0
+        self.items = []
+
+    def update(self, items):
+        """
+        Offer an iterable of items.
+        """
+        for item in items:
+            self.seen += 1
+            if len(self.items) < self.size:
+                self.items.append(item)
+            else:
+                slot = _random.randrange(self.seen)
+                if slot < self.size:
+                    self.items[slot] = item
+
+    def to_state(self):
+        return json.dumps({"size": self.size, "seen": self.seen, "items": self.items})
+
+    @classmethod
+    def from_state(cls, state):
+        fields = json.loads(state)
+        sample = cls(fields["size"])
+        sample.seen = fields["seen"]
+        sample.items = fields["items"]
+        return sample
+
+
+def stratified_count(strata):
+    """
+    Estimate how many rows match a filter from per-partition samples.
+
+    Args:
+        strata (iterable): (rows in partition, rows sampled, sampled rows that
+            matched) per partition.
+
+    Returns:
+        Estimate: Sum of the per-partition estimates. Each partition's match
+            rate gets an Agresti-Coull interval with a finite population
+            correction; fully sampled partitions contribute exactly.
+    """
+    value = variance = 0.0
+    low_floor = high_cap = 0
+    z2 = Z_SCORE ** 2
+    for rows, sampled, hits in strata:
+        low_floor += hits
+        high_cap += rows - (sampled - hits)
+        if not sampled:
+            continue
+        value += rows * hits / sampled
+        if sampled < rows:
+            rate = (hits + z2 / 2) / (sampled + z2)
+            correction = (rows - sampled) / (rows - 1)
+            variance += rows * rows * rate * (1 - rate) / (sampled + z2) * correction
+    error = Z_SCORE * math.sqrt(variance)
+    return Estimate(value, max(float(low_floor), value - error), min(float(high_cap), value + error))
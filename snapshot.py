@@ -0,0 +1,327 @@
+#############################################
+# snapshot.py
+#
+# Columnar snapshots of the hazard tables, so a cold start never re-parses
+# the CSVs. Each table is written as one Arrow IPC (or Parquet) file per year:
+#
+#   storms_snapshot/
+#     snapshot.json          format, row counts, schema hashes, CSV manifest
+#     wind/year=1950.arrow
+#     wind/year=1951.arrow   ...  (year=0 holds rows with no date)
+#
+#   python snapshot.py export storms.db storms_snapshot [--format parquet]
+#   python snapshot.py build storms_snapshot storms.db
+#
+# Arrow IPC files are written uncompressed and read through a memory map, so
+# loading them is zero-copy. Needs pyarrow (pandas too for load_frames).
+#############################################
+
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:  # optional: only needed to write or read snapshots
+    pa = pq = None
+
+from storm_database import (
+    StormDatabase, TABLE_DEFINITIONS, TIME_HISTOGRAM_TABLE, DEFAULT_CHUNK_SIZE,
+    events_table, iso_to_day_number, logical_source, schema_hash, table_columns,
+)
+
+SNAPSHOT_MANIFEST = "snapshot.json"
+SNAPSHOT_FORMATS = {"arrow": ".arrow", "parquet": ".parquet"}
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("Snapshots need pyarrow: pip install pyarrow")
+
+
+def partition_path(snapshot_dir, table_name, year, file_format):
+    return os.path.join(snapshot_dir, table_name, f"year={year}{SNAPSHOT_FORMATS[file_format]}")
+
+
+def arrow_schema(table_name, text_columns=(), real_columns=()):
+    """
+    Arrow schema for a table: string for TEXT, float64 for REAL and int64 for
+    INTEGER columns, except that numeric columns in text_columns are string and
+    INTEGER columns in real_columns are float64.
+    """
+    fields = []
+    for name, col_type in table_columns(table_name):
+        if col_type == "TEXT" or name in text_columns:
+            arrow_type = pa.string()
+        elif col_type == "REAL" or name in real_columns:
+            arrow_type = pa.float64()
+        else:
+            arrow_type = pa.int64()
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields, metadata={"table": table_name, "schema_hash": schema_hash(table_name)})
+
+
+def stored_schema(db, table_name):
+    """
+    Arrow schema that fits what a table actually stores.
+
+    SQLite lets a numeric column hold other storage classes, so a REAL or
+    INTEGER column holding any text is written as string, and an INTEGER
+    column holding non-integer numbers as float64. Loading the snapshot back
+    into SQLite gives the original values again, since the column's type
+    affinity converts them on insert.
+    """
+    numeric = [name for name, col_type in table_columns(table_name) if col_type != "TEXT"]
+    checks = ", ".join(
+        f"MAX(typeof({name}) = 'text'), MAX(typeof({name}) = 'real')" for name in numeric
+    )
+    found = db.execute_query(f"SELECT {checks} FROM {events_table(table_name)}",
+                             use_cache=False)[0]
+    text_columns = {name for name, flag in zip(numeric, found[0::2]) if flag}
+    real_columns = {name for name, flag in zip(numeric, found[1::2]) if flag}
+    return arrow_schema(table_name, text_columns, real_columns)
+
+
+def rows_to_arrow(rows, schema):
+    """
+    Convert rows (tuples in table column order) to an Arrow table.
+    """
+    columns = list(zip(*rows)) if rows else [()] * len(schema)
+    arrays = []
+    for field, values in zip(schema, columns):
+        if field.type == pa.string():
+            values = [None if v is None else str(v) for v in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def export_snapshot(db, snapshot_dir, tables=None, file_format="arrow"):
+    """
+    Write the hazard tables to a snapshot directory, one file per year.
+
+    Each year is read with a DATE_NUM range on the date index, so only one
+    year's rows are in memory at a time.
+
+    Args:
+        db (StormDatabase): Database to export.
+        snapshot_dir (str): Output directory (created if needed). A previous
+            snapshot there is replaced table by table.
+        tables (list, optional): Tables to export. Defaults to every table present.
+        file_format (str): 'arrow' (IPC, memory-mappable) or 'parquet'.
+
+    Returns:
+        dict: The snapshot manifest, also written to snapshot.json.
+
+    Raises:
+        ImportError: If pyarrow isn't installed.
+    """
+    _require_pyarrow()
+    if file_format not in SNAPSHOT_FORMATS:
+        raise ValueError(f"file_format must be one of {sorted(SNAPSHOT_FORMATS)}, not {file_format!r}")
+    if tables is None:
+        existing = {name for (name,) in db.execute_query(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'view')", use_cache=False
+        )}
+        tables = [t for t in TABLE_DEFINITIONS if t in existing]
+
+    manifest = {
+        "format": file_format,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "tables": {},
+    }
+    for table_name in tables:
+        table_dir = os.path.join(snapshot_dir, table_name)
+        os.makedirs(table_dir, exist_ok=True)
+        for old in os.listdir(table_dir):
+            os.remove(os.path.join(table_dir, old))
+
+        schema = stored_schema(db, table_name)
+        years = [year for (year,) in db.execute_query(
+            f"SELECT DISTINCT year FROM {TIME_HISTOGRAM_TABLE} WHERE hazard = ? ORDER BY year",
+            (table_name,), use_cache=False
+        )]
+        # Every table_columns column, derived ones included, as load_rows takes them
+        events = events_table(table_name)
+        select, source = logical_source(table_name)
+        partitions = {}
+        for year in years:
+            if year == 0:
+                rows = db.execute_query(
+                    f"SELECT {select} FROM {source} WHERE {events}.DATE_NUM IS NULL", use_cache=False
+                )
+            else:
+                rows = db.execute_query(
+                    f"SELECT {select} FROM {source} "
+                    f"WHERE {events}.DATE_NUM >= ? AND {events}.DATE_NUM < ?",
+                    (iso_to_day_number(f"{year:04d}-01-01"), iso_to_day_number(f"{year + 1:04d}-01-01")),
+                    use_cache=False
+                )
+            table = rows_to_arrow(rows, schema)
+            path = partition_path(snapshot_dir, table_name, year, file_format)
+            if file_format == "arrow":
+                with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+                    writer.write_table(table)
+            else:
+                pq.write_table(table, path)
+            partitions[str(year)] = table.num_rows
+
+        manifest["tables"][table_name] = {
+            "schema_hash": schema_hash(table_name),
+            "table_version": db.table_version(table_name),
+            "rows": sum(partitions.values()),
+            "partitions": partitions,
+            # The CSV fingerprints the table was built from, restored with it
+            "csv_manifest": [list(entry) for entry in db.manifest_entries(table_name)],
+        }
+
+    with open(os.path.join(snapshot_dir, SNAPSHOT_MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def read_manifest(snapshot_dir):
+    with open(os.path.join(snapshot_dir, SNAPSHOT_MANIFEST), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_table(snapshot_dir, table_name, years=None, manifest=None):
+    """
+    Load one table from a snapshot as a pyarrow Table.
+
+    Arrow IPC partitions are memory-mapped, so no data is copied or parsed up
+    front; pages are read from disk as the columns are touched.
+
+    Args:
+        snapshot_dir (str): Snapshot directory written by export_snapshot.
+        table_name (str): 'wind', 'tornado', or 'hail'.
+        years (iterable, optional): Only load these years' partitions (0 for rows
+            with no date). Defaults to all of them.
+        manifest (dict, optional): Already-read snapshot.json contents.
+
+    Returns:
+        pyarrow.Table: The rows, in table column order.
+    """
+    _require_pyarrow()
+    manifest = manifest or read_manifest(snapshot_dir)
+    file_format = manifest["format"]
+    partitions = manifest["tables"][table_name]["partitions"]
+    wanted = sorted(int(year) for year in partitions)
+    if years is not None:
+        years = set(years)
+        wanted = [year for year in wanted if year in years]
+
+    parts = []
+    for year in wanted:
+        path = partition_path(snapshot_dir, table_name, year, file_format)
+        if file_format == "arrow":
+            parts.append(pa.ipc.open_file(pa.memory_map(path, "r")).read_all())
+        else:
+            parts.append(pq.read_table(path, memory_map=True))
+    if not parts:
+        return rows_to_arrow([], arrow_schema(table_name))
+    return pa.concat_tables(parts)  # chunks are kept as-is, not copied
+
+
+def load_frames(snapshot_dir, tables=None, years=None):
+    """
+    Load snapshot tables as pandas DataFrames, with the same columns as
+    SELECT * on the table.
+
+    Returns:
+        dict: Maps table name to DataFrame.
+    """
+    manifest = read_manifest(snapshot_dir)
+    tables = tables or list(manifest["tables"])
+    return {t: load_table(snapshot_dir, t, years, manifest).to_pandas() for t in tables}
+
+
+def iter_snapshot_rows(table, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield a pyarrow Table's rows as lists of tuples, chunk_size rows at a time.
+    """
+    for batch in table.to_batches(max_chunksize=chunk_size):
+        yield list(zip(*(column.to_pylist() for column in batch.columns)))
+
+
+def build_database(snapshot_dir, db_path, tables=None, chunk_size=DEFAULT_CHUNK_SIZE, **kwargs):
+    """
+    (Re)build storms.db from a snapshot instead of the CSVs.
+
+    Tables are loaded through StormDatabase.load_rows, so the rollup, time
+    histogram and indexes are rebuilt as for a CSV load, and the CSV build
+    manifest recorded in the snapshot is restored. open_or_build then treats
+    the tables as fresh as long as the CSVs haven't changed since the export.
+
+    Args:
+        snapshot_dir (str): Snapshot directory written by export_snapshot.
+        db_path (str): Database file to write. Existing tables are replaced.
+        tables (list, optional): Tables to build. Defaults to all in the snapshot.
+        chunk_size (int): Rows per insert batch.
+        **kwargs: Passed on to StormDatabase.
+
+    Returns:
+        StormDatabase: The database, open for writing.
+
+    Raises:
+        ValueError: If the snapshot was written for a different table definition.
+    """
+    manifest = read_manifest(snapshot_dir)
+    tables = tables or list(manifest["tables"])
+    for table_name in tables:
+        if manifest["tables"][table_name]["schema_hash"] != schema_hash(table_name):
+            raise ValueError(
+                f"Snapshot of '{table_name}' in {snapshot_dir} was written for a different "
+                f"table definition; rebuild from the CSVs and export it again"
+            )
+
+    db = StormDatabase(db_path, recreate=False, **kwargs)
+    for table_name in tables:
+        table = load_table(snapshot_dir, table_name, manifest=manifest)
+        db.drop_table(table_name)
+        db.create_table(table_name)
+        db.load_rows(table_name, iter_snapshot_rows(table, chunk_size))
+        db.restore_manifest_entries(table_name, manifest["tables"][table_name]["csv_manifest"])
+    return db
+
+
+def open_or_restore(db_path, snapshot_dir, sources, **kwargs):
+    """
+    Like StormDatabase.open_or_build, but when db_path doesn't exist yet and a
+    snapshot does, build it from the snapshot first. Only tables whose CSVs
+    changed since the snapshot are then re-parsed.
+    """
+    if not os.path.exists(db_path) and os.path.exists(os.path.join(snapshot_dir, SNAPSHOT_MANIFEST)):
+        build_database(snapshot_dir, db_path).close()
+    return StormDatabase.open_or_build(db_path, sources, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or restore storms.db snapshots.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="write a snapshot of a database")
+    export.add_argument("db_path")
+    export.add_argument("snapshot_dir")
+    export.add_argument("--format", choices=sorted(SNAPSHOT_FORMATS), default="arrow")
+    build = commands.add_parser("build", help="build a database from a snapshot")
+    build.add_argument("snapshot_dir")
+    build.add_argument("db_path")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        db = StormDatabase(args.db_path, recreate=False, read_only=True)
+        manifest = export_snapshot(db, args.snapshot_dir, file_format=args.format)
+        db.close()
+        for table_name, info in manifest["tables"].items():
+            print(f"{table_name}: {info['rows']} rows in {len(info['partitions'])} partitions")
+    else:
+        db = build_database(args.snapshot_dir, args.db_path)
+        db.close()
+        print(f"Built {args.db_path} from {args.snapshot_dir}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+import math
+
+EARTH_RADIUS_KM = 6371.0088  # mean Earth radius
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180
+
+
+def valid_point(lat, lon):
+    """
+    True if lat/lon are numbers within -90..90 / -180..180. Malformed CSV rows
+    can leave text, NULL or shifted values (e.g. 1753.0) in the coordinate columns.
+    """
+    return (isinstance(lat, (int, float)) and isinstance(lon, (int, float))
+            and -90 <= lat <= 90 and -180 <= lon <= 180)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in kilometres between two points given in degrees.
+    """
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def expand_box(min_lat, max_lat, min_lon, max_lon, margin_km):
+    """
+    Grow a lat/lon box so it contains every point within margin_km of it.
+
+    Returns:
+        tuple: (min_lat, max_lat, min_lon, max_lon). The box isn't split at the
+            antimeridian, so it is clamped to -180..180 instead.
+    """
+    dlat = margin_km / KM_PER_DEGREE_LAT
+    min_lat = max(-90.0, min_lat - dlat)
+    max_lat = min(90.0, max_lat + dlat)
+    # longitude degrees shrink towards the poles, so size the margin at the widest
+    cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    if cos_lat * KM_PER_DEGREE_LAT * 180 <= margin_km:
+        return min_lat, max_lat, -180.0, 180.0
+    dlon = dlat / cos_lat
+    return min_lat, max_lat, max(-180.0, min_lon - dlon), min(180.0, max_lon + dlon)
+
+
+def radius_box(lat, lon, radius_km):
+    """
+    A lat/lon box that contains every point within radius_km of (lat, lon).
+    """
+    return expand_box(lat, lat, lon, lon, radius_km)
+
+
+def project_km(lat, lon, lat0, lon0):
+    """
+    (x, y) in kilometres east/north of (lat0, lon0), in an equirectangular
+    projection centred there. Accurate for distances of a few hundred km.
+    """
+    return ((lon - lon0) * math.cos(math.radians(lat0)) * KM_PER_DEGREE_LAT,
+            (lat - lat0) * KM_PER_DEGREE_LAT)
+
+
+def point_in_polygon(x, y, vertices):
+    """
+    Even-odd rule test of (x, y) against a polygon given as (x, y) vertices.
+    """
+    inside = False
+    for (x1, y1), (x2, y2) in zip(vertices, vertices[1:] + vertices[:1]):
+        if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+    return inside
+
+
+def point_segment_distance(p, a, b):
+    """
+    Distance from point p to segment a-b, all (x, y) in the same plane.
+    """
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    length2 = dx * dx + dy * dy
+    t = 0.0 if length2 == 0 else max(0.0, min(1.0, ((p[0] - a[0]) * dx + (p[1] - a[1]) * dy) / length2))
+    return math.hypot(p[0] - a[0] - t * dx, p[1] - a[1] - t * dy)
+
+
+def segments_intersect(a, b, c, d):
+    """
+    True if segments a-b and c-d touch or cross, all (x, y) in the same plane.
+    """
+    def orientation(p, q, r):
+        cross = (q[0] - p[0]) * (r[1] - p[1]) - (q[1] - p[1]) * (r[0] - p[0])
+        return (cross > 0) - (cross < 0)
+
+    def on_segment(p, q, r):  # r collinear with p-q: is it between them?
+        return (min(p[0], q[0]) <= r[0] <= max(p[0], q[0])
+                and min(p[1], q[1]) <= r[1] <= max(p[1], q[1]))
+
+    o1, o2 = orientation(a, b, c), orientation(a, b, d)
+    o3, o4 = orientation(c, d, a), orientation(c, d, b)
+    if o1 != o2 and o3 != o4:
+        return True
+    return ((o1 == 0 and on_segment(a, b, c)) or (o2 == 0 and on_segment(a, b, d))
+            or (o3 == 0 and on_segment(c, d, a)) or (o4 == 0 and on_segment(c, d, b)))
+
+
+def segment_distance(a, b, c, d):
+    """
+    Shortest distance between segments a-b and c-d (0 if they intersect).
+    """
+    if segments_intersect(a, b, c, d):
+        return 0.0
+    return min(point_segment_distance(a, c, d), point_segment_distance(b, c, d),
+               point_segment_distance(c, a, b), point_segment_distance(d, a, b))
+
+
+def distance_to_segment_km(lat, lon, lat1, lon1, lat2, lon2):
+    """
+    Distance in kilometres from (lat, lon) to the segment (lat1, lon1)-(lat2, lon2).
+
+    The closest point is found in an equirectangular projection centred on
+    (lat, lon), which is accurate for segments of a few hundred kilometres,
+    and the distance to it is then measured with the haversine formula.
+    """
+    if (lat1, lon1) == (lat2, lon2):
+        return haversine_km(lat, lon, lat1, lon1)
+    scale = math.cos(math.radians(lat))
+    x1, y1 = (lon1 - lon) * scale, lat1 - lat
+    x2, y2 = (lon2 - lon) * scale, lat2 - lat
+    dx, dy = x2 - x1, y2 - y1
+    t = max(0.0, min(1.0, -(x1 * dx + y1 * dy) / (dx * dx + dy * dy)))
+    return haversine_km(lat, lon, lat1 + t * (lat2 - lat1), lon1 + t * (lon2 - lon1))
+
+
+def event_distance_km(lat, lon, begin_lat, begin_lon, end_lat=None, end_lon=None):
+    """
+    Distance from (lat, lon) to an event: to its track when it has a valid end
+    point, else to its begin point. None if the begin point isn't valid.
+    """
+    if not valid_point(begin_lat, begin_lon):
+        return None
+    if valid_point(end_lat, end_lon):
+        return distance_to_segment_km(lat, lon, begin_lat, begin_lon, end_lat, end_lon)
+    return haversine_km(lat, lon, begin_lat, begin_lon)
@@ -1,78 +1,265 @@
 import os
 import sqlite3
+import bisect
 import csv
-from datetime import datetime
+import hashlib
+import heapq
+import itertools
+import json
+import math
+import multiprocessing
+import pathlib
+import queue
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+from functools import lru_cache
 
-def convert_to_iso_date(date_str):
+from connection_pool import ReadConnectionPool
+from result_cache import ResultCache, normalize_sql
+from sketches import Estimate, KLLSketch, HyperLogLog, Reservoir, stratified_count
+from spatial import event_distance_km, radius_box
+
+# Day numbers count days since 1970-01-01, so date-range filters compare integers.
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+@lru_cache(maxsize=65536)
+def _parse_us_date(date_str):
     """
-    Convert 'MM/DD/YYYY' to 'YYYY-MM-DD'. If invalid/blank, returns None.
+    Parse 'MM/DD/YYYY' once per distinct string.
+    Storm data repeats a small set of dates, so the cache hit rate is very high.
+    
+    Returns:
+        tuple: (iso_date, day_number), or (None, None) if invalid/blank.
     """
     if not date_str or not date_str.strip():
-        return None
+        return None, None
     try:
         dt = datetime.strptime(date_str.strip(), "%m/%d/%Y")
-        return dt.strftime("%Y-%m-%d")
     except ValueError:
-        return None
+        return None, None
+    return dt.strftime("%Y-%m-%d"), dt.toordinal() - EPOCH_ORDINAL
+
+
+def convert_to_iso_date(date_str):
+    """
+    Convert 'MM/DD/YYYY' to 'YYYY-MM-DD'. If invalid/blank, returns None.
+    """
+    return _parse_us_date(date_str)[0]
+
+
+def convert_to_day_number(date_str):
+    """
+    Convert 'MM/DD/YYYY' to days since 1970-01-01. If invalid/blank, returns None.
+    """
+    return _parse_us_date(date_str)[1]
+
+
+# TOR_F_SCALE spellings and their numeric rating. Unknown-intensity (EFU/FU) is -1.
+EF_RATINGS = {
+    "EFU": -1, "FU": -1,
+    "EF0": 0, "F0": 0,
+    "EF1": 1, "F1": 1,
+    "EF2": 2, "F2": 2,
+    "EF3": 3, "F3": 3,
+    "EF4": 4, "F4": 4,
+    "EF5": 5, "F5": 5,
+}
+
+
+def parse_ef_rating(rating_str, strict=True):
+    """
+    Convert an EF/F scale rating to its numeric value.
+    
+    Args:
+        rating_str (str): 'EF0'-'EF5', 'F0'-'F5', 'EFU' or 'FU' (case-insensitive).
+        strict (bool): If True, raise on anything else; if False, return None.
+            Ingest uses strict=False so blank/odd TOR_F_SCALE cells become NULL.
+        
+    Returns:
+        int: -1 for EFU/FU, otherwise 0-5.
+        
+    Raises:
+        ValueError: If rating_str isn't a recognised rating and strict is True.
+    """
+    rating = EF_RATINGS.get((rating_str or "").strip().upper())
+    if rating is None and strict:
+        raise ValueError(
+            f"Unrecognised tornado rating {rating_str!r}; expected EF0-EF5, F0-F5, EFU or FU"
+        )
+    return rating
+
+
+@lru_cache(maxsize=4096)
+def hhmm_to_minute(time_str, strict=True):
+    """
+    Convert an HHMM time to minutes after midnight (0-1439).
+    
+    Unpadded values are read as HHMM with leading zeros dropped,
+    so '930' is 09:30 and '15' is 00:15.
+    
+    Args:
+        time_str (str): Time like '1400', '930' or '0005'.
+        strict (bool): If True, raise on blank/invalid input; if False, return None.
+            Ingest uses strict=False so blank BEGIN_TIME cells become NULL.
+        
+    Returns:
+        int: Minute of day.
+        
+    Raises:
+        ValueError: If time_str isn't a valid HHMM time and strict is True.
+    """
+    text = (time_str or "").strip()
+    if text.isdigit() and len(text) <= 4:
+        hours, minutes = divmod(int(text), 100)
+        if hours < 24 and minutes < 60:
+            return hours * 60 + minutes
+    if strict:
+        raise ValueError(f"Invalid time {time_str!r}; expected HHMM, e.g. '1430'")
+    return None
+
+
+def iso_to_day_number(iso_date):
+    """
+    Convert a 'YYYY-MM-DD' query bound to days since 1970-01-01.
+    
+    Raises:
+        ValueError: If iso_date isn't a valid YYYY-MM-DD date.
+    """
+    try:
+        return date.fromisoformat(iso_date.strip()).toordinal() - EPOCH_ORDINAL
+    except ValueError:
+        raise ValueError(f"Invalid date {iso_date!r}; expected YYYY-MM-DD, e.g. '1999-05-03'") from None
+
+
+def day_number_to_iso(day_number):
+    """
+    Convert days since 1970-01-01 back to 'YYYY-MM-DD'.
+    """
+    return date.fromordinal(day_number + EPOCH_ORDINAL).isoformat()
 
 
 TABLE_DEFINITIONS = {
     "wind": {
         "create_sql": """
-            CREATE TABLE IF NOT EXISTS wind (
+            CREATE TABLE IF NOT EXISTS {partition} (
                 DATE TEXT,
-                CountyName TEXT,
+                CountyName INTEGER,
                 [MAGNITUDE (Knots)] REAL,
                 [Converted to MPH] REAL,
-                BEGIN_LOCATION TEXT,
+                BEGIN_LOCATION INTEGER,
                 BEGIN_TIME TEXT,
                 DEATHS_DIRECT INTEGER,
                 INJURIES_DIRECT INTEGER,
                 DAMAGE_PROPERTY_NUM REAL,
                 DAMAGE_CROPS_NUM REAL,
-                CZ_TIMEZONE TEXT,
-                MAGNITUDE_TYPE TEXT,
+                CZ_TIMEZONE INTEGER,
+                MAGNITUDE_TYPE INTEGER,
                 EPISODE_ID TEXT,
-                CZ_TYPE TEXT,
+                CZ_TYPE INTEGER,
                 CZ_FIPS TEXT,
-                WFO TEXT,
+                WFO INTEGER,
                 INJURIES_INDIRECT INTEGER,
                 DEATHS_INDIRECT INTEGER,
-                SOURCE TEXT,
-                FLOOD_CAUSE TEXT,
+                SOURCE INTEGER,
+                FLOOD_CAUSE INTEGER,
                 TOR_LENGTH REAL,
                 TOR_WIDTH REAL,
                 BEGIN_RANGE REAL,
-                BEGIN_AZIMUTH TEXT,
+                BEGIN_AZIMUTH INTEGER,
                 END_RANGE REAL,
-                END_AZIMUTH TEXT,
-                END_LOCATION TEXT,
+                END_AZIMUTH INTEGER,
+                END_LOCATION INTEGER,
                 END_TIME TEXT,
                 BEGIN_LAT REAL,
                 BEGIN_LON REAL,
                 END_LAT REAL,
                 END_LON REAL,
-                EVENT_NARRATIVE TEXT,
-                EPISODE_NARRATIVE TEXT
+                DATE_NUM INTEGER,
+                BEGIN_MINUTE INTEGER,
+                EVENT_ID INTEGER PRIMARY KEY
             );
         """,
         "num_columns": 34,
         "date_columns": [0],  # Only 'DATE' at index 0 needs converting
+        "time_column": 5,  # 'BEGIN_TIME' = index 5, normalized into BEGIN_MINUTE
         "insert_sql": """
-            INSERT INTO wind VALUES (
+            INSERT INTO {partition} VALUES (
                 ?,?,?,?,?,?,?,?,?,?,
                 ?,?,?,?,?,?,?,?,?,?,
                 ?,?,?,?,?,?,?,?,?,?,
-                ?,?,?,?
+                ?,?,?,?,?
             )
-        """
+        """,
+        "indexes": {
+            # Built after bulk load (see load_csv_into_table), not during it.
+            "date": ["DATE_NUM", "DATE"],
+            "magnitude_date": ["[MAGNITUDE (Knots)]", "DATE_NUM"],
+            "damage": ["DAMAGE_PROPERTY_NUM"],
+            "begin_minute": ["BEGIN_MINUTE"],
+            "county": ["CountyName"],
+            "episode": ["EPISODE_ID"],
+        },
+        # EVENT_NARRATIVE / EPISODE_NARRATIVE (parsed-row indexes 32, 33) live in a
+        # side table keyed by EVENT_ID, out of the way of scans and sorts.
+        "narratives": {
+            "columns": [32, 33],
+            "create_sql": """
+                CREATE TABLE IF NOT EXISTS wind_narratives (
+                    EVENT_ID INTEGER PRIMARY KEY,
+                    EVENT_NARRATIVE TEXT,
+                    EPISODE_NARRATIVE TEXT
+                );
+            """,
+            "insert_sql": "INSERT INTO wind_narratives VALUES (?, ?, ?)",
+            # FTS5 index over both narratives, kept in sync by triggers
+            "fts_table": "wind_narratives_fts",
+        },
+        # R*Tree over BEGIN_LAT/BEGIN_LON point boxes, kept in sync by triggers
+        "spatial": {"rtree_table": "wind_rtree", "track": False},
+        # EPISODE_ID alone is shared by every event of an episode
+        "identity": ["EPISODE_ID", "BEGIN_TIME", "BEGIN_LOCATION", "CountyName"],
+        # Low-cardinality text columns, stored as integer codes into lookup tables
+        # shared by every hazard and decoded by the views (see lookup_joins)
+        "lookups": {
+            "CountyName": "lookup_county",
+            "BEGIN_LOCATION": "lookup_location",
+            "CZ_TIMEZONE": "lookup_timezone",
+            "MAGNITUDE_TYPE": "lookup_magnitude_type",
+            "CZ_TYPE": "lookup_cz_type",
+            "WFO": "lookup_wfo",
+            "SOURCE": "lookup_source",
+            "FLOOD_CAUSE": "lookup_flood_cause",
+            "BEGIN_AZIMUTH": "lookup_azimuth",
+            "END_AZIMUTH": "lookup_azimuth",
+            "END_LOCATION": "lookup_location",
+        },
+        # Parsed-row indexes feeding the storm_rollup table (see ROLLUP_CREATE_SQL)
+        "rollup": {
+            "county": 1,
+            "magnitude": 2,  # knots, bucketed to whole knots
+            "bucket_scale": 1,
+            "deaths": 6,
+            "injuries": 7,
+            "damage_property": 8,
+            "damage_crops": 9,
+        },
+        # Columns summarized per partition for approximate mode (see sketches.py):
+        # KLL sketches for the quantile columns, HyperLogLog for the distinct ones
+        "sketches": {
+            "quantiles": ["[MAGNITUDE (Knots)]", "DAMAGE_PROPERTY_NUM"],
+            "distinct": ["CountyName", "EPISODE_ID"],
+        },
     },
     "tornado": {
         "create_sql": """
-            CREATE TABLE IF NOT EXISTS tornado (
+            CREATE TABLE IF NOT EXISTS {partition} (
                 DATE TEXT,
-                CountyName TEXT,
-                TOR_F_SCALE TEXT,
+                CountyName INTEGER,
+                TOR_F_SCALE INTEGER,
                 BEGIN_LAT REAL,
                 BEGIN_LON REAL,
                 END_LAT REAL,
@@ -82,166 +269,3205 @@ TABLE_DEFINITIONS = {
                 INJURIES_DIRECT INTEGER,
                 DAMAGE_PROPERTY_NUM REAL,
                 DAMAGE_CROPS_NUM REAL,
-                CZ_TIMEZONE TEXT,
-                SOURCE TEXT,
+                CZ_TIMEZONE INTEGER,
+                SOURCE INTEGER,
                 TOR_LENGTH REAL,
                 TOR_WIDTH REAL,
                 BEGIN_RANGE INTEGER,
-                BEGIN_AZIMUTH TEXT,
+                BEGIN_AZIMUTH INTEGER,
                 END_RANGE INTEGER,
-                END_AZIMUTH TEXT,
-                BEGIN_LOCATION TEXT,
-                END_LOCATION TEXT,
+                END_AZIMUTH INTEGER,
+                BEGIN_LOCATION INTEGER,
+                END_LOCATION INTEGER,
                 END_DATE TEXT,
                 END_TIME TEXT,
-                EVENT_NARRATIVE TEXT,
-                EPISODE_NARRATIVE TEXT,
-                ABSOLUTE_ROWNUMBER INTEGER
+                ABSOLUTE_ROWNUMBER INTEGER,
+                DATE_NUM INTEGER,
+                END_DATE_NUM INTEGER,
+                EF_NUM INTEGER,
+                BEGIN_MINUTE INTEGER,
+                EVENT_ID INTEGER PRIMARY KEY
             );
         """,
         "num_columns": 27,
         "date_columns": [0, 22],  # 'DATE' = index 0, 'END_DATE' = index 22
+        "ef_scale_column": 2,  # 'TOR_F_SCALE' = index 2, normalized into EF_NUM
+        "time_column": 7,  # 'BEGIN_TIME' = index 7, normalized into BEGIN_MINUTE
         "insert_sql": """
-            INSERT INTO tornado VALUES (
+            INSERT INTO {partition} VALUES (
                 ?,?,?,?,?,?,?,?,?,?,
                 ?,?,?,?,?,?,?,?,?,?,
-                ?,?,?,?,?,?,?
+                ?,?,?,?,?,?,?,?,?,?
             )
-        """
+        """,
+        "indexes": {
+            "date": ["DATE_NUM", "DATE"],
+            "ef_date": ["EF_NUM", "DATE_NUM"],
+            "damage": ["DAMAGE_PROPERTY_NUM"],
+            "length": ["TOR_LENGTH"],
+            "width": ["TOR_WIDTH"],  # widest path, for track_geometry's prefilter margin
+            "begin_minute": ["BEGIN_MINUTE"],
+            "county": ["CountyName"],
+        },
+        # EVENT_NARRATIVE / EPISODE_NARRATIVE (parsed-row indexes 24, 25) live in a
+        # side table keyed by EVENT_ID, out of the way of scans and sorts.
+        "narratives": {
+            "columns": [24, 25],
+            "create_sql": """
+                CREATE TABLE IF NOT EXISTS tornado_narratives (
+                    EVENT_ID INTEGER PRIMARY KEY,
+                    EVENT_NARRATIVE TEXT,
+                    EPISODE_NARRATIVE TEXT
+                );
+            """,
+            "insert_sql": "INSERT INTO tornado_narratives VALUES (?, ?, ?)",
+            # FTS5 index over both narratives, kept in sync by triggers
+            "fts_table": "tornado_narratives_fts",
+        },
+        # R*Tree over the bounding box of each BEGIN -> END track
+        "spatial": {"rtree_table": "tornado_rtree", "track": True},
+        # ABSOLUTE_ROWNUMBER repeats across the file, but not within a month
+        "identity": ["ABSOLUTE_ROWNUMBER"],
+        "lookups": {
+            "CountyName": "lookup_county",
+            "TOR_F_SCALE": "lookup_f_scale",
+            "CZ_TIMEZONE": "lookup_timezone",
+            "SOURCE": "lookup_source",
+            "BEGIN_AZIMUTH": "lookup_azimuth",
+            "END_AZIMUTH": "lookup_azimuth",
+            "BEGIN_LOCATION": "lookup_location",
+            "END_LOCATION": "lookup_location",
+        },
+        "rollup": {
+            "county": 1,
+            "magnitude": 29,  # EF_NUM
+            "bucket_scale": 1,
+            "deaths": 8,
+            "injuries": 9,
+            "damage_property": 10,
+            "damage_crops": 11,
+        },
+        "sketches": {
+            "quantiles": ["TOR_LENGTH", "DAMAGE_PROPERTY_NUM"],
+            "distinct": ["CountyName"],
+        },
     },
     "hail": {
         "create_sql": """
-            CREATE TABLE IF NOT EXISTS hail (
+            CREATE TABLE IF NOT EXISTS {partition} (
                 DATE TEXT,
-                CountyName TEXT,
+                CountyName INTEGER,
                 [HAIL SIZE (INCHES)] REAL,
-                BEGIN_LOCATION TEXT,
+                BEGIN_LOCATION INTEGER,
                 BEGIN_TIME TEXT,
                 INJURIES_DIRECT INTEGER,
                 DAMAGE_PROPERTY_NUM REAL,
                 DAMAGE_CROPS_NUM REAL,
-                CZ_TIMEZONE TEXT,
-                MAGNITUDE_TYPE TEXT,
+                CZ_TIMEZONE INTEGER,
+                MAGNITUDE_TYPE INTEGER,
                 CZ_FIPS TEXT,
-                WFO TEXT,
-                SOURCE TEXT,
-                FLOOD_CAUSE TEXT,
+                WFO INTEGER,
+                SOURCE INTEGER,
+                FLOOD_CAUSE INTEGER,
                 TOR_LENGTH REAL,
                 TOR_WIDTH REAL,
                 BEGIN_RANGE REAL,
-                BEGIN_AZIMUTH TEXT,
+                BEGIN_AZIMUTH INTEGER,
                 END_RANGE REAL,
-                END_AZIMUTH TEXT,
-                END_LOCATION TEXT,
+                END_AZIMUTH INTEGER,
+                END_LOCATION INTEGER,
                 END_TIME TEXT,
                 BEGIN_LAT REAL,
-                BEGIN_LON REAL
+                BEGIN_LON REAL,
+                DATE_NUM INTEGER,
+                BEGIN_MINUTE INTEGER,
+                EVENT_ID INTEGER PRIMARY KEY
             );
         """,
         "num_columns": 24,
         "date_columns": [0],  # 'DATE' = index 0
+        "time_column": 4,  # 'BEGIN_TIME' = index 4, normalized into BEGIN_MINUTE
         "insert_sql": """
-            INSERT INTO hail VALUES (
+            INSERT INTO {partition} VALUES (
                 ?,?,?,?,?,?,?,?,?,?,
                 ?,?,?,?,?,?,?,?,?,?,
-                ?,?,?
+                ?,?,?,?,?,?,?
             )
-        """
+        """,
+        "indexes": {
+            "date": ["DATE_NUM", "DATE"],
+            "size_date": ["[HAIL SIZE (INCHES)]", "DATE_NUM"],
+            "damage": ["DAMAGE_PROPERTY_NUM"],
+            "begin_minute": ["BEGIN_MINUTE"],
+            "county": ["CountyName"],
+        },
+        "narratives": None,  # the hail CSV has no narrative columns
+        "spatial": {"rtree_table": "hail_rtree", "track": False},
+        "identity": None,  # no event id column; rows are matched on content only
+        "lookups": {
+            "CountyName": "lookup_county",
+            "BEGIN_LOCATION": "lookup_location",
+            "CZ_TIMEZONE": "lookup_timezone",
+            "MAGNITUDE_TYPE": "lookup_magnitude_type",
+            "WFO": "lookup_wfo",
+            "SOURCE": "lookup_source",
+            "FLOOD_CAUSE": "lookup_flood_cause",
+            "BEGIN_AZIMUTH": "lookup_azimuth",
+            "END_AZIMUTH": "lookup_azimuth",
+            "END_LOCATION": "lookup_location",
+        },
+        "rollup": {
+            "county": 1,
+            "magnitude": 2,  # inches, bucketed to hundredths
+            "bucket_scale": 100,
+            "deaths": None,  # hail has no DEATHS_DIRECT column
+            "injuries": 5,
+            "damage_property": 6,
+            "damage_crops": 7,
+        },
+        "sketches": {
+            "quantiles": ["[HAIL SIZE (INCHES)]", "DAMAGE_PROPERTY_NUM"],
+            "distinct": ["CountyName"],
+        },
     }
 }
 
+# Per hazard x year x month x county x magnitude bucket totals, maintained at
+# ingest so the breakdown queries never scan the event tables. Missing dates
+# are stored as year/month 0 and missing magnitudes as ROLLUP_MISSING_BUCKET,
+# since these columns are part of the primary key.
+ROLLUP_TABLE = "storm_rollup"
+ROLLUP_MISSING_BUCKET = -1_000_000
 
-class StormDatabase:
-    def __init__(self, db_path="storms.db", recreate=True):
-        """
-        Initialize a new StormDatabase connection.
-        
-        Args:
-            db_path (str): Path to the SQLite database file. Defaults to 'storms.db'.
-            recreate (bool): If True, deletes existing database to start fresh. Defaults to True.
-        """
-        if recreate and os.path.exists(db_path):
-            os.remove(db_path)
+ROLLUP_CREATE_SQL = f"""
+    CREATE TABLE IF NOT EXISTS {ROLLUP_TABLE} (
+        hazard TEXT NOT NULL,
+        year INTEGER NOT NULL,
+        month INTEGER NOT NULL,
+        county TEXT NOT NULL,
+        mag_bucket INTEGER NOT NULL,
+        event_count INTEGER NOT NULL,
+        deaths INTEGER NOT NULL,
+        injuries INTEGER NOT NULL,
+        damage_property REAL NOT NULL,
+        damage_crops REAL NOT NULL,
+        PRIMARY KEY (hazard, year, month, county, mag_bucket)
+    ) WITHOUT ROWID;
+"""
 
-        self.db_path = db_path
-        self.conn = sqlite3.connect(self.db_path)
-        self.cursor = self.conn.cursor()
+ROLLUP_UPSERT_SQL = f"""
+    INSERT INTO {ROLLUP_TABLE} VALUES (?,?,?,?,?,?,?,?,?,?)
+    ON CONFLICT (hazard, year, month, county, mag_bucket) DO UPDATE SET
+        event_count = event_count + excluded.event_count,
+        deaths = deaths + excluded.deaths,
+        injuries = injuries + excluded.injuries,
+        damage_property = damage_property + excluded.damage_property,
+        damage_crops = damage_crops + excluded.damage_crops
+"""
 
-    def create_table(self, table_name):
-        """
-        Create a new table in the database based on predefined schema.
+# Per hazard x year x minute-of-day event counts, maintained at ingest so
+# "percent of events between times" needs no table scan. Events with no
+# BEGIN_TIME use minute -1; events with no date use year 0.
+TIME_HISTOGRAM_TABLE = "time_histogram"
+MINUTES_PER_DAY = 1440
+
+TIME_HISTOGRAM_CREATE_SQL = f"""
+    CREATE TABLE IF NOT EXISTS {TIME_HISTOGRAM_TABLE} (
+        hazard TEXT NOT NULL,
+        year INTEGER NOT NULL,
+        minute INTEGER NOT NULL,
+        event_count INTEGER NOT NULL,
+        PRIMARY KEY (hazard, year, minute)
+    ) WITHOUT ROWID;
+"""
+
+TIME_HISTOGRAM_UPSERT_SQL = f"""
+    INSERT INTO {TIME_HISTOGRAM_TABLE} VALUES (?,?,?,?)
+    ON CONFLICT (hazard, year, minute) DO UPDATE SET
+        event_count = event_count + excluded.event_count
+"""
+
+# Bumped whenever a table's rows change, so in-memory caches derived from a
+# table (e.g. sorted magnitude arrays) know when to rebuild.
+VERSIONS_TABLE = "table_versions"
+
+VERSIONS_CREATE_SQL = f"""
+    CREATE TABLE IF NOT EXISTS {VERSIONS_TABLE} (
+        table_name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL
+    );
+"""
+
+# Per hazard x partition table summaries behind the approximate queries, kept
+# up to date at ingest: a Reservoir of EVENT_IDs ('sample'), a KLLSketch per
+# "sketches" quantile column ('quantiles:<column>') and a HyperLogLog per
+# distinct column ('distinct:<column>'), each stored as its JSON state.
+SKETCHES_TABLE = "storm_sketches"
+
+SKETCHES_CREATE_SQL = f"""
+    CREATE TABLE IF NOT EXISTS {SKETCHES_TABLE} (
+        hazard TEXT NOT NULL,
+        partition_table TEXT NOT NULL,
+        sketch TEXT NOT NULL,
+        state TEXT NOT NULL,
+        PRIMARY KEY (hazard, partition_table, sketch)
+    ) WITHOUT ROWID;
+"""
+
+# DDL shared by every hazard table; part of each table's schema hash.
+SHARED_SCHEMA_SQL = [ROLLUP_CREATE_SQL, TIME_HISTOGRAM_CREATE_SQL, VERSIONS_CREATE_SQL,
+                     SKETCHES_CREATE_SQL]
+
+# One lookup table per dictionary-encoded value domain (TABLE_DEFINITIONS
+# "lookups"), shared by the hazards. Codes are only ever added, never reused,
+# so dropping one hazard leaves the others' codes valid.
+LOOKUP_CREATE_SQL = """
+    CREATE TABLE IF NOT EXISTS {lookup} (
+        id INTEGER PRIMARY KEY,
+        value TEXT NOT NULL UNIQUE
+    );
+"""
+
+
+# CSV file(s) each table is built from
+DEFAULT_CSV_SOURCES = {
+    "wind": "wind_historical_data.csv",
+    "tornado": "tor_historical_data.csv",
+    "hail": "hail_historical_data.csv",
+}
+
+# Rows per executemany batch when streaming a CSV into a table.
+DEFAULT_CHUNK_SIZE = 50_000
+
+# How often load_many's writer checks that its parser processes are still alive
+# while it waits for a batch.
+WORKER_POLL_SECONDS = 5
+
+# Rows per fetchmany call when streaming query results (see iter_query).
+DEFAULT_FETCH_SIZE = 10_000
+
+# Connection settings used only for the duration of a bulk load.
+# The previous values are read back and restored when the load finishes.
+BULK_LOAD_PRAGMAS = {
+    "journal_mode": "MEMORY",
+    "synchronous": "OFF",
+    "cache_size": -262144,  # negative = KiB, i.e. 256 MiB
+    "temp_store": "MEMORY",
+}
+
+# Records which CSV files (and which schema) each table was built from, so an
+# unchanged database can be reused instead of rebuilt on every Streamlit rerun.
+MANIFEST_TABLE = "build_manifest"
+
+MANIFEST_CREATE_SQL = f"""
+    CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE} (
+        table_name TEXT NOT NULL,
+        csv_path TEXT NOT NULL,
+        file_size INTEGER,
+        file_mtime REAL,
+        content_hash TEXT,
+        schema_hash TEXT,
+        built_at TEXT,
+        PRIMARY KEY (table_name, csv_path)
+    );
+"""
+
+
+# Bump when iter_csv_rows changes what it stores for the same CSV, so the schema
+# hash changes and existing tables are rebuilt.
+PARSE_VERSION = 2
+
+COLUMN_PATTERN = re.compile(r"^\s*(\[[^\]]+\]|\w+)\s+(TEXT|REAL|INTEGER)\b", re.MULTILINE)
+
+
+# Events are stored in one table per this many years (see partition_table).
+PARTITION_YEARS = 10
+
+
+def events_table(table_name):
+    """
+    Name of the view over all of a hazard's partition tables, i.e. its rows
+    minus the narratives. The hazard name itself ('wind') is a view over this
+    and the narratives side table.
+    """
+    return f"{table_name}_events"
+
+
+def partition_key(day_number):
+    """
+    Partition of an event with this DATE_NUM: the first year of its
+    PARTITION_YEARS block (e.g. 1990), or None for an event with no date.
+    """
+    if not isinstance(day_number, int):
+        return None
+    year = date.fromordinal(day_number + EPOCH_ORDINAL).year
+    return year - year % PARTITION_YEARS
+
+
+def partition_table(table_name, key):
+    """
+    Name of the table holding one partition of a hazard's events, e.g.
+    'wind_events_1990', or 'wind_events_undated' for key None.
+    """
+    return f"{events_table(table_name)}_{'undated' if key is None else key}"
+
+
+def partition_day_range(key):
+    """
+    (first, last + 1) day numbers of the events a dated partition can hold.
+    """
+    first = date(key, 1, 1).toordinal() - EPOCH_ORDINAL
+    following = date(key + PARTITION_YEARS, 1, 1).toordinal() - EPOCH_ORDINAL
+    return first, following
+
+
+def partition_statements(table_name, key):
+    """
+    Statements that create one partition table and the triggers that keep the
+    hazard's R*Tree in step with it (see rtree_statements). Its indexes are
+    created separately, so a bulk load can add them after the rows.
+    """
+    partition = partition_table(table_name, key)
+    rtree = TABLE_DEFINITIONS[table_name]["spatial"]["rtree_table"]
+    valid, *box = spatial_box_sql(table_name, "new.")
+    insert = (f"INSERT INTO {rtree} SELECT new.EVENT_ID, {', '.join(box)} WHERE {valid};")
+    delete = f"DELETE FROM {rtree} WHERE EVENT_ID = old.EVENT_ID;"
+    return [
+        TABLE_DEFINITIONS[table_name]["create_sql"].format(partition=partition),
+        f"CREATE TRIGGER IF NOT EXISTS {partition}_rtree_ai AFTER INSERT ON {partition} "
+        f"BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {partition}_rtree_ad AFTER DELETE ON {partition} "
+        f"BEGIN {delete} END",
+        f"CREATE TRIGGER IF NOT EXISTS {partition}_rtree_au AFTER UPDATE ON {partition} "
+        f"BEGIN {delete} {insert} END",
+    ]
+
+
+def events_view_sql(table_name, keys):
+    """
+    CREATE VIEW statement for events_table(table_name): the UNION ALL of the
+    partitions with the given keys. SQLite pushes WHERE terms and joins down
+    into each arm, so the partitions' own indexes are still used through it.
+    """
+    arms = "\n        UNION ALL ".join(
+        f"SELECT * FROM {partition_table(table_name, key)}" for key in keys
+    )
+    return f"""
+        CREATE VIEW {events_table(table_name)} AS
+        {arms}
+    """
+
+
+def narratives_table(table_name):
+    """
+    Name of the side table holding a hazard's narratives, keyed by EVENT_ID.
+    """
+    return f"{table_name}_narratives"
+
+
+@lru_cache(maxsize=None)
+def stored_columns(table_name):
+    """
+    Column names and declared types of a hazard's events table, in create_sql
+    order, ending with EVENT_ID. Dictionary-encoded columns are INTEGER here.
+    
+    Returns:
+        tuple: (name, type) pairs, e.g. ('[MAGNITUDE (Knots)]', 'REAL').
+    """
+    return tuple(COLUMN_PATTERN.findall(TABLE_DEFINITIONS[table_name]["create_sql"]))
+
+
+@lru_cache(maxsize=None)
+def narrative_columns(table_name):
+    """
+    Names of a hazard's narrative columns (empty for hail).
+    """
+    narratives = TABLE_DEFINITIONS[table_name]["narratives"]
+    if not narratives:
+        return ()
+    return tuple(name for name, _ in COLUMN_PATTERN.findall(narratives["create_sql"])[1:])
+
+
+@lru_cache(maxsize=None)
+def table_columns(table_name):
+    """
+    Column names and declared types of a hazard, in parsed-row order: the CSV
+    columns (narratives included) followed by the derived ones. This is also
+    the column order of SELECT * on the hazard's view.
+    
+    Returns:
+        tuple: (name, type) pairs, e.g. ('[MAGNITUDE (Knots)]', 'REAL').
+            Dictionary-encoded columns are TEXT, the type of their values.
+    """
+    lookups = TABLE_DEFINITIONS[table_name]["lookups"]
+    columns = [(name, "TEXT" if name in lookups else col_type)
+               for name, col_type in stored_columns(table_name) if name != "EVENT_ID"]
+    narratives = TABLE_DEFINITIONS[table_name]["narratives"]
+    if narratives:
+        for index, name in zip(narratives["columns"], narrative_columns(table_name)):
+            columns.insert(index, (name, "TEXT"))
+    return tuple(columns)
+
+
+@lru_cache(maxsize=None)
+def public_columns(table_name):
+    """
+    The table_columns a hazard shows to users: its CSV columns, without the
+    ones derived at ingest (DATE_NUM, BEGIN_MINUTE, ...). These are the
+    columns of the hazard's view; the derived ones are only on its events table.
+    """
+    return table_columns(table_name)[:TABLE_DEFINITIONS[table_name]["num_columns"]]
+
+
+def view_sql(table_name):
+    """
+    CREATE VIEW statement for a hazard: its events table joined to its
+    narratives, with the public_columns in table_columns order, so SELECT * on
+    the hazard name returns the CSV's columns.
+    
+    Note:
+        SQLite drops the unused join from plain row queries on the view, but not
+        from aggregates like COUNT(*), so those read the events table directly.
+    """
+    select, source = logical_source(table_name,
+                                    names=[name for name, _ in public_columns(table_name)])
+    return f"""
+        CREATE VIEW IF NOT EXISTS {table_name} AS
+        SELECT
+            {select}
+        FROM {source}
+    """
+
+
+def logical_source(table_name, events_source=None, names=None):
+    """
+    SELECT list and FROM clause that read a hazard's rows in table_columns
+    order from its events and narratives tables (the body of its view, which
+    passes only the public_columns as names). events_source replaces the
+    events view in the FROM clause, e.g. with one partition (see
+    StormDatabase.events_source).
+    
+    Returns:
+        tuple: (select list, FROM clause), with columns qualified by table name.
+    """
+    events = events_table(table_name)
+    narratives = narratives_table(table_name)
+    narrative_names = narrative_columns(table_name)
+    if names is None:
+        names = [name for name, _ in table_columns(table_name)]
+    select = ",\n            ".join(
+        f"{narratives}.{name}" if name in narrative_names else column_sql(table_name, name)
+        for name in names
+    )
+    join = (f"\n        LEFT JOIN {narratives} ON {narratives}.EVENT_ID = {events}.EVENT_ID"
+            if narrative_names else "")
+    return select, f"{events_source or events}{join}{lookup_joins(table_name, names)}"
+
+
+def column_sql(table_name, name):
+    """
+    SELECT-list expression for one of a hazard's columns in a query on its
+    events, qualified as <table>_events.<column>. A dictionary-encoded column
+    is read from its lookup table, so the query also needs lookup_joins.
+    """
+    if name in TABLE_DEFINITIONS[table_name]["lookups"]:
+        return f"{name}_lookup.value AS {name}"
+    return f"{events_table(table_name)}.{name}"
+
+
+def lookup_joins(table_name, names):
+    """
+    LEFT JOINs that decode the dictionary-encoded columns among names (see
+    column_sql), to follow the events in a FROM clause. Each is a rowid
+    lookup, and SQLite drops the ones whose column the query doesn't use.
+    """
+    events = events_table(table_name)
+    lookups = TABLE_DEFINITIONS[table_name]["lookups"]
+    return "".join(
+        f"\n        LEFT JOIN {lookups[name]} AS {name}_lookup "
+        f"ON {name}_lookup.id = {events}.{name}"
+        for name in dict.fromkeys(names) if name in lookups
+    )
+
+
+def fts_statements(table_name):
+    """
+    Statements that create a hazard's FTS5 narrative index: an external-content
+    FTS5 table over <table>_narratives (rowid = EVENT_ID, Porter-stemmed, so
+    'blown' also finds 'blow') and the triggers that keep it in step with
+    inserts, updates and deletes on the narratives table.
+    
+    Returns:
+        list: SQL statements, empty for a hazard without narratives.
+    """
+    narratives = TABLE_DEFINITIONS[table_name]["narratives"]
+    if not narratives:
+        return []
+    content = narratives_table(table_name)
+    fts = narratives["fts_table"]
+    names = narrative_columns(table_name)
+    column_list = ", ".join(names)
+    new_values = ", ".join(f"new.{name}" for name in names)
+    old_values = ", ".join(f"old.{name}" for name in names)
+    insert = (f"INSERT INTO {fts}(rowid, {column_list}) "
+              f"VALUES (new.EVENT_ID, {new_values});")
+    delete = (f"INSERT INTO {fts}({fts}, rowid, {column_list}) "
+              f"VALUES ('delete', old.EVENT_ID, {old_values});")
+    return [
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            {column_list},
+            content='{content}', content_rowid='EVENT_ID',
+            tokenize='porter unicode61 remove_diacritics 2'
+        )
+        """,
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {content} BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {content} BEGIN {delete} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {content} "
+        f"BEGIN {delete} {insert} END",
+    ]
+
+
+def _valid_point_sql(lat, lon):
+    # SQL twin of spatial.valid_point
+    return (f"typeof({lat}) IN ('integer', 'real') AND {lat} BETWEEN -90 AND 90 "
+            f"AND typeof({lon}) IN ('integer', 'real') AND {lon} BETWEEN -180 AND 180")
+
+
+def spatial_box_sql(table_name, prefix):
+    """
+    SQL expressions for an event's R*Tree box, given the prefix its columns
+    are qualified with ('new.' in a trigger, 'wind_events.' in a query).
+    
+    Returns:
+        tuple: (valid, min_lat, max_lat, min_lon, max_lon), where valid is the
+            condition for the event to be in the R*Tree at all (a valid begin
+            point). A tornado's box also covers its end point when that's valid.
+    """
+    begin_lat, begin_lon = f"{prefix}BEGIN_LAT", f"{prefix}BEGIN_LON"
+    valid = _valid_point_sql(begin_lat, begin_lon)
+    if not TABLE_DEFINITIONS[table_name]["spatial"]["track"]:
+        return valid, begin_lat, begin_lat, begin_lon, begin_lon
+    has_end = _valid_point_sql(f"{prefix}END_LAT", f"{prefix}END_LON")
+    end_lat = f"CASE WHEN {has_end} THEN {prefix}END_LAT ELSE {begin_lat} END"
+    end_lon = f"CASE WHEN {has_end} THEN {prefix}END_LON ELSE {begin_lon} END"
+    return (valid, f"min({begin_lat}, {end_lat})", f"max({begin_lat}, {end_lat})",
+            f"min({begin_lon}, {end_lon})", f"max({begin_lon}, {end_lon})")
+
+
+def rtree_statements(table_name):
+    """
+    Statement that creates a hazard's R*Tree (id = EVENT_ID). Each partition
+    table has triggers that keep it in step with inserts, updates and deletes
+    (see partition_statements); events without a valid begin point aren't indexed.
+    """
+    rtree = TABLE_DEFINITIONS[table_name]["spatial"]["rtree_table"]
+    return f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {rtree} USING rtree(
+            EVENT_ID, min_lat, max_lat, min_lon, max_lon
+        )
+    """
+
+
+def event_filters(table_name, start_date=None, end_date=None, min_magnitude=None):
+    """
+    WHERE conditions on a hazard's events table for the optional filters that
+    the search methods share.
+    
+    Args:
+        table_name (str): Hazard table ('wind', 'tornado', or 'hail').
+        start_date (str, optional): Only events on or after this YYYY-MM-DD date.
+        end_date (str, optional): Only events on or before this YYYY-MM-DD date.
+        min_magnitude (float, optional): Only events with magnitude >= this (knots,
+            EF_NUM or inches, the rollup's magnitude column).
         
-        Args:
-            table_name (str): Name of the table to create ('wind', 'tornado', or 'hail').
-            
-        Note:
-            Table schema is pulled from TABLE_DEFINITIONS dictionary.
-        """
-        table_def = TABLE_DEFINITIONS[table_name]
-        self.cursor.execute(table_def["create_sql"])
-        self.conn.commit()
+    Returns:
+        tuple: (list of conditions, list of parameters).
+    """
+    events = events_table(table_name)
+    where = []
+    params = []
+    if start_date is not None:
+        where.append(f"{events}.DATE_NUM >= ?")
+        params.append(iso_to_day_number(start_date))
+    if end_date is not None:
+        where.append(f"{events}.DATE_NUM <= ?")
+        params.append(iso_to_day_number(end_date))
+    if min_magnitude is not None:
+        magnitude = table_columns(table_name)[TABLE_DEFINITIONS[table_name]["rollup"]["magnitude"]][0]
+        where.append(f"{events}.{magnitude} >= ?")
+        params.append(min_magnitude)
+    return where, params
 
-    def load_csv_into_table(self, csv_path, table_name):
-        """
-        Load data from a CSV file into the specified database table.
+
+def fts_phrase(text):
+    """
+    Quote text as a single FTS5 phrase, e.g. roof blown off -> "roof blown off",
+    so it matches those words in order and operators in it are taken literally.
+    """
+    return '"' + text.replace('"', '""') + '"'
+
+
+def fts_terms(text):
+    """
+    Quote each whitespace-separated word of text as its own FTS5 phrase, e.g.
+    half-inch hail -> "half-inch" "hail", so a hit has to contain all of them
+    (in any order) and nothing in them is read as FTS5 syntax.
+    """
+    return " ".join(fts_phrase(word) for word in text.split())
+
+
+def resolve_columns(table_name, columns=None, include_narratives=False):
+    """
+    Work out which columns a row-returning query should return.
+    
+    Args:
+        table_name (str): Hazard table ('wind', 'tornado', or 'hail').
+        columns (list, optional): Column names, e.g. ['DATE', 'MAGNITUDE (Knots)']
+            (square brackets optional), from public_columns. Defaults to every
+            public column except the narratives, in table_columns order.
+        include_narratives (bool): Also return the narrative columns; in their
+            usual place when columns is None (so the rows match SELECT *), else
+            after the listed columns.
         
-        Args:
-            csv_path (str): Path to the CSV file to load.
-            table_name (str): Name of the target table ('wind', 'tornado', or 'hail').
-            
-        Raises:
-            ValueError: If a row's column count doesn't match the expected schema.
-            
-        Note:
-            - Skips the CSV header row
-            - Converts date fields from MM/DD/YYYY to YYYY-MM-DD format
-            - Performs batch insert for better performance
-        """
-        table_def = TABLE_DEFINITIONS[table_name]
-        num_cols = table_def["num_columns"]
-        date_columns = table_def["date_columns"]
-        insert_sql = table_def["insert_sql"]
-
-        with open(csv_path, "r", encoding="utf-8") as f:
-            reader = csv.reader(f)
-            header = next(reader)  # skip CSV header
-
-            to_insert = []
-            for row_num, row in enumerate(reader, start=2):
-                # Check column count
-                if len(row) != num_cols:
-                    raise ValueError(
-                        f"{table_name} row {row_num} in {csv_path} has {len(row)} cols, expected {num_cols}. Row = {row}"
-                    )
+    Returns:
+        list: Column names as spelled in table_columns.
+        
+    Raises:
+        ValueError: If a column isn't one of the table's public columns.
+    """
+    all_names = [name for name, _ in public_columns(table_name)]
+    narrative_names = narrative_columns(table_name)
+    if columns is None:
+        return [name for name in all_names
+                if include_narratives or name not in narrative_names]
 
-                # Convert date columns
-                for dc in date_columns:
-                    row[dc] = convert_to_iso_date(row[dc])
+    by_bare_name = {name.strip("[]"): name for name in all_names}
+    names = []
+    for column in columns:
+        name = by_bare_name.get(column.strip().strip("[]"))
+        if name is None:
+            raise ValueError(f"Unknown {table_name} column {column!r}")
+        names.append(name)
+    if include_narratives:
+        names += [name for name in narrative_names if name not in names]
+    return names
 
-                to_insert.append(row)
 
-        self.cursor.executemany(insert_sql, to_insert)
-        self.conn.commit()
+def event_select_list(table_name, names):
+    """
+    SELECT list for a query on the events table that returns EVENT_ID followed
+    by the non-narrative columns among names (see StormDatabase.attach_narratives).
+    The query needs lookup_joins for the same names.
+    """
+    narrative_names = narrative_columns(table_name)
+    return ", ".join([f"{events_table(table_name)}.EVENT_ID"]
+                     + [column_sql(table_name, name) for name in names
+                        if name not in narrative_names])
 
-    def execute_query(self, sql, params=None):
-        """
-        Execute a SQL query and return results.
+
+def split_event_rows(table_name, rows, first_id):
+    """
+    Split parsed rows into events-table rows and narratives-table rows,
+    numbering them with consecutive EVENT_IDs from first_id.
+    
+    Returns:
+        tuple: (event rows, narrative rows). Narrative rows is empty for hail.
+    """
+    narratives = TABLE_DEFINITIONS[table_name]["narratives"]
+    narrative_indexes = narratives["columns"] if narratives else []
+    keep = [i for i in range(len(table_columns(table_name))) if i not in narrative_indexes]
+    event_rows = []
+    narrative_rows = []
+    for event_id, row in enumerate(rows, start=first_id):
+        event_rows.append([row[i] for i in keep] + [event_id])
+        if narrative_indexes:
+            narrative_rows.append([event_id] + [row[i] for i in narrative_indexes])
+    return event_rows, narrative_rows
+
+
+def file_content_hash(path, block_size=1 << 20):
+    """
+    Compute the SHA-256 hex digest of a file, reading it in blocks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def schema_hash(table_name):
+    """
+    Hash the TABLE_DEFINITIONS entry for a table.
+    Any edit to the table definition (or the view built from it) changes the
+    hash and forces a rebuild.
+    """
+    table_def = json.dumps([TABLE_DEFINITIONS[table_name], SHARED_SCHEMA_SQL, LOOKUP_CREATE_SQL,
+                            view_sql(table_name), PARSE_VERSION, PARTITION_YEARS],
+                           sort_keys=True, default=repr)
+    return hashlib.sha256(table_def.encode("utf-8")).hexdigest()
+
+
+def iter_csv_rows(csv_path, table_name, bad_rows=None):
+    """
+    Yield parsed rows from a StormEvents CSV one at a time.
+    
+    Args:
+        csv_path (str): Path to the CSV file.
+        table_name (str): Table whose TABLE_DEFINITIONS entry describes the file.
+        bad_rows (list, optional): If given, rows with the wrong column count are
+            skipped and their CSV line numbers appended here instead of raising.
         
-        Args:
-            sql (str): SQL query to execute.
-            params (tuple, optional): Parameters to bind to the query. Defaults to None.
-            
-        Returns:
-            list: List of tuples containing query results.
-        """
-        if params is None:
-            params = ()
-        self.cursor.execute(sql, params)
-        return self.cursor.fetchall()
+    Yields:
+        list: Row values with line breaks inside cells normalised to LF and date
+            columns converted to YYYY-MM-DD, followed by the day number of each
+            date column, EF_NUM (tornadoes only) and BEGIN_MINUTE.
+        
+    Raises:
+        ValueError: If a row's column count doesn't match and bad_rows is None.
+    """
+    table_def = TABLE_DEFINITIONS[table_name]
+    num_cols = table_def["num_columns"]
+    date_columns = table_def["date_columns"]
+
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        next(reader, None)  # skip CSV header
+
+        for row_num, row in enumerate(reader, start=2):
+            # Check column count
+            if len(row) != num_cols:
+                if bad_rows is not None:
+                    bad_rows.append(row_num)
+                    continue
+                raise ValueError(
+                    f"{table_name} row {row_num} in {csv_path} has {len(row)} cols, expected {num_cols}. Row = {row}"
+                )
+
+            # newline="" keeps line breaks inside quoted cells as written (\r\n in
+            # the StormEvents files); store them as \n, as text-mode reading did
+            for i, value in enumerate(row):
+                if "\r" in value:
+                    row[i] = value.replace("\r\n", "\n").replace("\r", "\n")
+
+            # Convert date columns, appending each one's day number
+            # (DATE_NUM, END_DATE_NUM) after the CSV columns
+            day_numbers = []
+            for dc in date_columns:
+                row[dc], day_number = _parse_us_date(row[dc])
+                day_numbers.append(day_number)
+            row.extend(day_numbers)
+
+            if "ef_scale_column" in table_def:
+                row.append(parse_ef_rating(row[table_def["ef_scale_column"]], strict=False))
+
+            row.append(hhmm_to_minute(row[table_def["time_column"]], strict=False))
+
+            yield row
+
+
+def iter_chunks(iterable, chunk_size):
+    """
+    Split an iterable into lists of at most chunk_size items.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def to_number(value):
+    """
+    Convert a CSV/DB cell to float. Blank or non-numeric values return None.
+    """
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def rollup_rows(table_name, rows):
+    """
+    Aggregate parsed rows into storm_rollup deltas.
+    
+    Returns:
+        list: (hazard, year, month, county, mag_bucket, event_count, deaths,
+            injuries, damage_property, damage_crops) tuples, one per key.
+    """
+    spec = TABLE_DEFINITIONS[table_name]["rollup"]
+    scale = spec["bucket_scale"]
+    totals = {}
+    for row in rows:
+        iso_date = row[0]
+        year, month = (int(iso_date[:4]), int(iso_date[5:7])) if iso_date else (0, 0)
+        magnitude = to_number(row[spec["magnitude"]])
+        # small epsilon so 1.75 * 100 buckets to 175, not 174
+        bucket = ROLLUP_MISSING_BUCKET if magnitude is None else math.floor(magnitude * scale + 1e-9)
+        key = (table_name, year, month, row[spec["county"]] or "", bucket)
+
+        entry = totals.get(key)
+        if entry is None:
+            entry = totals[key] = [0, 0, 0, 0.0, 0.0]
+        entry[0] += 1
+        for i, field in enumerate(("deaths", "injuries", "damage_property", "damage_crops"), start=1):
+            index = spec[field]
+            if index is not None:
+                entry[i] += to_number(row[index]) or 0
+    return [key + (count, int(deaths), int(injuries), prop, crops)
+            for key, (count, deaths, injuries, prop, crops) in totals.items()]
+
+
+def bucket_threshold(table_name, min_magnitude):
+    """
+    The storm_rollup mag_bucket that magnitudes >= min_magnitude start at, or
+    None if min_magnitude falls inside a bucket (e.g. 50.5 knots), where the
+    rollup can't tell 50.2 from 50.7 and the events have to be read instead.
+    """
+    scale = TABLE_DEFINITIONS[table_name]["rollup"]["bucket_scale"]
+    bucket = round(min_magnitude * scale)
+    # same epsilon as rollup_rows, so 1.75 inches is bucket 175
+    return bucket if abs(min_magnitude * scale - bucket) < 1e-9 else None
+
+
+def time_histogram_rows(table_name, rows):
+    """
+    Aggregate parsed rows into time_histogram deltas.
+    
+    Returns:
+        list: (hazard, year, minute, event_count) tuples, one per key.
+    """
+    time_column = TABLE_DEFINITIONS[table_name]["time_column"]
+    counts = {}
+    for row in rows:
+        iso_date = row[0]
+        minute = hhmm_to_minute(row[time_column], strict=False)
+        key = (int(iso_date[:4]) if iso_date else 0, -1 if minute is None else minute)
+        counts[key] = counts.get(key, 0) + 1
+    return [(table_name, year, minute, count) for (year, minute), count in counts.items()]
+
+
+def negated_deltas(rows, key_length):
+    """
+    Negate the counts and totals in rollup_rows / time_histogram_rows output
+    (everything after the first key_length fields), so upserting them takes
+    those rows back out of the aggregates.
+    """
+    return [row[:key_length] + tuple(-value for value in row[key_length:]) for row in rows]
+
+
+@lru_cache(maxsize=None)
+def _column_index(table_name, name):
+    return [column for column, _ in table_columns(table_name)].index(name)
+
+
+@lru_cache(maxsize=None)
+def _stored_index(table_name, name):
+    return [column for column, _ in stored_columns(table_name)].index(name)
+
+
+def sqlite_sort_key(value):
+    """
+    Sort key that orders Python values the way SQLite orders column values:
+    NULL, then numbers, then text, then blobs.
+    """
+    if value is None:
+        return (0, 0)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    return (3, value)
+
+
+SKETCH_CLASSES = {"sample": Reservoir, "quantiles": KLLSketch, "distinct": HyperLogLog}
+
+
+def new_sketches(table_name):
+    """
+    Empty sketches for one of a hazard's partitions, keyed by their
+    storm_sketches name (see SKETCHES_CREATE_SQL).
+    """
+    spec = TABLE_DEFINITIONS[table_name]["sketches"]
+    sketches = {"sample": Reservoir()}
+    sketches.update((f"quantiles:{column}", KLLSketch()) for column in spec["quantiles"])
+    sketches.update((f"distinct:{column}", HyperLogLog()) for column in spec["distinct"])
+    return sketches
+
+
+def load_sketch(name, state):
+    return SKETCH_CLASSES[name.split(":", 1)[0]].from_state(state)
+
+
+def _checked_percents(percents):
+    percents = list(percents)
+    for percent in percents:
+        if not 0 <= percent <= 100:
+            raise ValueError(f"Percentile {percent!r} is outside 0-100")
+    return percents
+
+
+def sketch_number(value):
+    """
+    A cell as the number its REAL/INTEGER column holds, or None if it is NULL
+    or stays text (which sorted_column_values leaves out too).
+    """
+    if isinstance(value, (int, float)):
+        return value
+    number = to_number(value)
+    return number if number is not None and math.isfinite(number) else None
+
+
+def update_sketches(table_name, sketches, event_rows):
+    """
+    Add events-table rows (stored_columns order, dictionary-encoded) to one
+    partition's sketches (see new_sketches).
+    """
+    spec = TABLE_DEFINITIONS[table_name]["sketches"]
+    id_index = _stored_index(table_name, "EVENT_ID")
+    sketches["sample"].update(row[id_index] for row in event_rows)
+    for column in spec["quantiles"]:
+        index = _stored_index(table_name, column)
+        numbers = (sketch_number(row[index]) for row in event_rows)
+        sketches[f"quantiles:{column}"].update(number for number in numbers if number is not None)
+    for column in spec["distinct"]:
+        index = _stored_index(table_name, column)
+        sketches[f"distinct:{column}"].update(row[index] for row in event_rows)
+
+
+def partition_keys(table_name, names):
+    """
+    Partition keys (see partition_key) of the partition tables among names,
+    dated ones in order and then None for the undated partition if present.
+    """
+    prefix = f"{events_table(table_name)}_"
+    keys = []
+    for name in names:
+        suffix = name[len(prefix):] if name.startswith(prefix) else ""
+        if suffix == "undated":
+            keys.append(None)
+        elif suffix.isdigit():
+            keys.append(int(suffix))
+    return sorted(keys, key=lambda key: (key is None, key or 0))
+
+
+def row_month(table_name, row):
+    """
+    Month of a parsed row for load_delta: the (year, month) of its DATE_NUM,
+    or None if it has no date.
+    """
+    day_number = row[_column_index(table_name, "DATE_NUM")]
+    if not isinstance(day_number, int):
+        return None
+    day = date.fromordinal(day_number + EPOCH_ORDINAL)
+    return day.year, day.month
+
+
+def month_day_range(month):
+    """
+    (first, last + 1) day numbers of a (year, month) pair.
+    """
+    year, month = month
+    first = date(year, month, 1).toordinal() - EPOCH_ORDINAL
+    following = date(year + month // 12, month % 12 + 1, 1).toordinal() - EPOCH_ORDINAL
+    return first, following
+
+
+def identity_key(table_name, row):
+    """
+    A parsed row's identity key from TABLE_DEFINITIONS "identity", or None if
+    the table has none or any of the key's cells is blank.
+    """
+    names = TABLE_DEFINITIONS[table_name]["identity"]
+    if not names:
+        return None
+    key = tuple(row[_column_index(table_name, name)] for name in names)
+    if any(value is None or value == "" for value in key):
+        return None
+    return key
+
+
+def match_delta_rows(table_name, existing, incoming):
+    """
+    Match one partition's incoming rows against the rows already stored.
+    
+    Identical rows are matched first (as a multiset, so repeated rows pair up
+    one to one). Of what is left, rows whose identity key occurs exactly once
+    on each side are paired as updates; everything else is new.
+    
+    Args:
+        table_name (str): Hazard the rows belong to.
+        existing (list): (EVENT_ID, row) pairs already in the table.
+        incoming (list): Rows from the delta, as tuples.
+        
+    Returns:
+        tuple: (unchanged count, [(EVENT_ID, old row, new row)] updates,
+            new rows, [(EVENT_ID, old row)] existing rows left unmatched).
+    """
+    by_content = {}
+    for event_id, row in existing:
+        by_content.setdefault(row, []).append(event_id)
+    unchanged = 0
+    pending = []
+    for row in incoming:
+        ids = by_content.get(row)
+        if ids:
+            ids.pop()
+            unchanged += 1
+        else:
+            pending.append(row)
+    leftover = [(event_id, row) for row, ids in by_content.items() for event_id in ids]
+
+    old_keys = {}
+    for event_id, row in leftover:
+        old_keys.setdefault(identity_key(table_name, row), []).append((event_id, row))
+    new_keys = {}
+    for row in pending:
+        new_keys.setdefault(identity_key(table_name, row), []).append(row)
+
+    updates = []
+    matched_ids = set()
+    inserts = []
+    for key, rows in new_keys.items():
+        old = old_keys.get(key, [])
+        if key is not None and len(rows) == 1 and len(old) == 1:
+            event_id, old_row = old[0]
+            updates.append((event_id, old_row, rows[0]))
+            matched_ids.add(event_id)
+        else:
+            inserts.extend(rows)
+    unmatched = [(event_id, row) for event_id, row in leftover if event_id not in matched_ids]
+    return unchanged, updates, inserts, unmatched
+
+
+def _parse_worker(worker, task_queue, batch_queue, table_name, chunk_size, skip_bad_rows):
+    """
+    Worker process body for StormDatabase.load_many.
+    
+    Takes CSV paths from task_queue until it gets None, and puts
+    ("rows", rows, skipped), ("error", message) or ("done", worker) on batch_queue.
+    """
+    while True:
+        csv_path = task_queue.get()
+        if csv_path is None:
+            batch_queue.put(("done", worker))
+            return
+        try:
+            bad_rows = [] if skip_bad_rows else None
+            for chunk in iter_chunks(iter_csv_rows(csv_path, table_name, bad_rows), chunk_size):
+                batch_queue.put(("rows", [tuple(row) for row in chunk], 0))
+            if bad_rows:
+                batch_queue.put(("rows", [], len(bad_rows)))
+        except Exception as exc:
+            batch_queue.put(("error", str(exc)))
+            batch_queue.put(("done", worker))
+            return
+
+
+def _parsed_batches(csv_paths, table_name, workers, chunk_size, skip_bad_rows):
+    """
+    Yield (rows, skipped) batches parsed from csv_paths by `workers` processes.
+    
+    With one worker the files are parsed in this process instead.
+    """
+    if workers <= 1:
+        for csv_path in csv_paths:
+            bad_rows = [] if skip_bad_rows else None
+            for chunk in iter_chunks(iter_csv_rows(csv_path, table_name, bad_rows), chunk_size):
+                yield chunk, 0
+            if bad_rows:
+                yield [], len(bad_rows)
+        return
+
+    task_queue = multiprocessing.Queue()
+    for csv_path in csv_paths:
+        task_queue.put(csv_path)
+    for _ in range(workers):
+        task_queue.put(None)
+    # Bounded, so parsers can't run arbitrarily far ahead of the writer.
+    batch_queue = multiprocessing.Queue(maxsize=workers * 2)
+
+    processes = [
+        multiprocessing.Process(
+            target=_parse_worker,
+            args=(worker, task_queue, batch_queue, table_name, chunk_size, skip_bad_rows),
+            daemon=True,
+        )
+        for worker in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    try:
+        running = set(range(workers))
+        while running:
+            try:
+                message = batch_queue.get(timeout=WORKER_POLL_SECONDS)
+            except queue.Empty:
+                # A worker killed by a signal or the OOM killer never says
+                # "done"; don't wait for it forever with the write transaction open.
+                dead = [worker for worker in sorted(running)
+                        if not processes[worker].is_alive()]
+                if dead and batch_queue.empty():
+                    codes = ", ".join(str(processes[worker].exitcode) for worker in dead)
+                    raise RuntimeError(
+                        f"{len(dead)} CSV parser process(es) exited without finishing "
+                        f"(exit code {codes})"
+                    )
+                continue
+            if message[0] == "rows":
+                yield message[1], message[2]
+            elif message[0] == "error":
+                raise ValueError(message[1])
+            else:
+                running.discard(message[1])
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+
+
+def _is_read_query(sql):
+    return sql.lstrip().upper().startswith(("SELECT", "WITH"))
+
+
+def _params_key(params):
+    if isinstance(params, dict):
+        return tuple(sorted(params.items()))
+    return tuple(params)
+
+
+def _as_path_list(csv_paths):
+    if isinstance(csv_paths, (str, os.PathLike)):
+        return [os.fspath(csv_paths)]
+    return [os.fspath(p) for p in csv_paths]
+
+
+class StormDatabase:
+    def __init__(self, db_path="storms.db", recreate=True, read_only=False,
+                 cache_entries=256, cache_bytes=64 * 1024 * 1024,
+                 pool_size=0, statement_cache_size=128):
+        """
+        Initialize a new StormDatabase connection.
+        
+        Args:
+            db_path (str): Path to the SQLite database file. Defaults to 'storms.db'.
+            recreate (bool): If True, deletes existing database to start fresh. Defaults to True.
+            read_only (bool): If True, opens an existing database file with SQLite's
+                read-only URI mode. Defaults to False.
+            cache_entries (int): Maximum number of SELECT results kept by the result
+                cache in execute_query. 0 disables it. Defaults to 256.
+            cache_bytes (int): Maximum estimated size of all cached results.
+                Defaults to 64 MiB.
+            pool_size (int): If > 0, queries run on a pool of this many read-only
+                connections (checked out per query) and a writable database is
+                switched to WAL mode, so one StormDatabase (and the WindSQL /
+                TornadoSQL / HailSQL objects built on it) can be shared across
+                threads and Streamlit sessions. Defaults to 0 (single connection).
+            statement_cache_size (int): Prepared statements cached per connection.
+        """
+        if recreate and not read_only and os.path.exists(db_path):
+            os.remove(db_path)
+
+        self.db_path = db_path
+        self.read_only = read_only
+        # One connection owns all writes; the lock serializes its use across threads.
+        self._lock = threading.RLock()
+        if read_only:
+            uri = pathlib.Path(os.path.abspath(db_path)).as_uri() + "?mode=ro"
+            self.conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                                        cached_statements=statement_cache_size)
+        else:
+            self.conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                                        cached_statements=statement_cache_size)
+        self.cursor = self.conn.cursor()
+
+        # Per-thread cancellation events checked by the SQLite progress handler
+        # (see cancellable); installed on first use.
+        self._cancel_state = threading.local()
+        self._cancellation_enabled = False
+
+        self.pool = None
+        if pool_size:
+            if db_path == ":memory:":
+                raise ValueError("A connection pool needs a database file, not ':memory:'")
+            if not read_only:
+                self.cursor.execute("PRAGMA journal_mode = WAL")
+            self.pool = ReadConnectionPool(db_path, pool_size, statement_cache_size)
+        self.last_load_stats = None
+        # (table_name, column) -> (table version, sorted numeric values, row count)
+        self._sorted_values = {}
+        # table_name -> (table version, years, cumulative minute counts)
+        self._time_prefix_sums = {}
+        # table_name -> (table version, {partition key: sketches}, {name: merged sketch})
+        self._sketch_cache = {}
+        # table_name -> (table version, {partition key: sampled rows as dicts})
+        self._sample_cache = {}
+        self.result_cache = ResultCache(cache_entries, cache_bytes)
+        # table_name -> (schema version, partition keys)
+        self._partition_keys = {}
+        # lookup table -> {value: code}, filled during one write transaction
+        self._lookup_codes = {}
+        # partition table -> sketches changed by the current write transaction
+        self._pending_sketches = {}
+        # Bumped by writes through this object; PRAGMA data_version covers the
+        # writes made by other connections.
+        self._local_data_version = 0
+
+    @classmethod
+    def open_or_build(cls, db_path, sources, **kwargs):
+        """
+        Open db_path read-only if every table is up to date with its CSV sources,
+        otherwise open it for writing and rebuild only the stale tables.
+        
+        Args:
+            db_path (str): Path to the SQLite database file.
+            sources (dict): Maps table name to a CSV path (or list of CSV paths),
+                e.g. {"wind": "wind_historical_data.csv"}.
+            **kwargs: Passed on to StormDatabase (e.g. cache_entries).
+            
+        Returns:
+            StormDatabase: A ready-to-query database.
+        """
+        if os.path.exists(db_path):
+            db = cls(db_path, recreate=False, read_only=True, **kwargs)
+            if not db.stale_tables(sources):
+                return db
+            db.close()
+
+        db = cls(db_path, recreate=False, **kwargs)
+        db.build(sources)
+        return db
+
+    def _read_manifest(self):
+        """
+        Return {table_name: {csv_path: (size, mtime, content_hash, schema_hash)}}.
+        """
+        exists = self.cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (MANIFEST_TABLE,)
+        ).fetchone()
+        if not exists:
+            return {}
+
+        manifest = {}
+        rows = self.cursor.execute(
+            f"SELECT table_name, csv_path, file_size, file_mtime, content_hash, schema_hash "
+            f"FROM {MANIFEST_TABLE}"
+        ).fetchall()
+        for table_name, csv_path, size, mtime, content_hash, table_schema in rows:
+            manifest.setdefault(table_name, {})[csv_path] = (size, mtime, content_hash, table_schema)
+        return manifest
+
+    def _table_exists(self, table_name):
+        row = self.cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (table_name,)
+        ).fetchone()
+        return row is not None
+
+    def stale_tables(self, sources):
+        """
+        Compare the CSV sources against the build manifest.
+        
+        A source whose size and mtime match the manifest is assumed unchanged.
+        If only the mtime moved (e.g. the file was touched or re-copied), the
+        content hash decides.
+        
+        Args:
+            sources (dict): Maps table name to a CSV path or list of CSV paths.
+            
+        Returns:
+            list: Names of tables that need to be rebuilt.
+        """
+        manifest = self._read_manifest()
+        stale = []
+        for table_name, csv_paths in sources.items():
+            recorded = manifest.get(table_name, {})
+            csv_paths = _as_path_list(csv_paths)
+
+            if (not self._table_exists(partition_table(table_name, None))
+                    or set(recorded) != set(csv_paths)):
+                stale.append(table_name)
+                continue
+
+            current_schema = schema_hash(table_name)
+            for csv_path in csv_paths:
+                size, mtime, content_hash, table_schema = recorded[csv_path]
+                if table_schema != current_schema or not os.path.exists(csv_path):
+                    stale.append(table_name)
+                    break
+                stat = os.stat(csv_path)
+                if stat.st_size == size and stat.st_mtime == mtime:
+                    continue
+                if stat.st_size != size or file_content_hash(csv_path) != content_hash:
+                    stale.append(table_name)
+                    break
+        return stale
+
+    def build(self, sources):
+        """
+        Rebuild every table whose CSV sources or schema changed since the last build,
+        and record the new fingerprints in the build manifest.
+        
+        Args:
+            sources (dict): Maps table name to a CSV path or list of CSV paths.
+            
+        Returns:
+            list: Names of the tables that were rebuilt.
+        """
+        with self._lock:
+            stale = self.stale_tables(sources)
+            manifest = self._read_manifest()
+            self.cursor.execute(MANIFEST_CREATE_SQL)
+
+            for table_name, csv_paths in sources.items():
+                csv_paths = _as_path_list(csv_paths)
+                if table_name in stale:
+                    self.drop_table(table_name)
+                    self.create_table(table_name)
+                    for csv_path in csv_paths:
+                        self.load_csv_into_table(csv_path, table_name)
+                    recorded = {}
+                else:
+                    # Fresh tables are re-recorded too, so touched-but-identical files
+                    # go back to the cheap size/mtime check next time.
+                    recorded = manifest.get(table_name, {})
+                self._record_manifest(table_name, csv_paths, recorded)
+
+            self.conn.commit()
+            return stale
+
+    def _record_manifest(self, table_name, csv_paths, recorded):
+        """
+        Write manifest rows for a table, reusing recorded hashes for files whose
+        size and mtime are unchanged.
+        """
+        built_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        table_schema = schema_hash(table_name)
+        self.cursor.execute(f"DELETE FROM {MANIFEST_TABLE} WHERE table_name = ?", (table_name,))
+        for csv_path in csv_paths:
+            stat = os.stat(csv_path)
+            size, mtime, content_hash, _ = recorded.get(csv_path, (None, None, None, None))
+            if stat.st_size != size or stat.st_mtime != mtime:
+                content_hash = file_content_hash(csv_path)
+            self.cursor.execute(
+                f"INSERT INTO {MANIFEST_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (table_name, csv_path, stat.st_size, stat.st_mtime,
+                 content_hash, table_schema, built_at)
+            )
+
+    def manifest_entries(self, table_name):
+        """
+        Return a table's build-manifest rows as (csv_path, file_size, file_mtime,
+        content_hash, schema_hash, built_at) tuples.
+        """
+        if not self._table_exists(MANIFEST_TABLE):
+            return []
+        return self._read(
+            f"SELECT csv_path, file_size, file_mtime, content_hash, schema_hash, built_at "
+            f"FROM {MANIFEST_TABLE} WHERE table_name = ?", (table_name,)
+        )
+
+    def restore_manifest_entries(self, table_name, entries):
+        """
+        Replace a table's build-manifest rows with entries from manifest_entries,
+        e.g. when the table was rebuilt from a snapshot of the same CSVs.
+        """
+        with self._lock:
+            self.cursor.execute(MANIFEST_CREATE_SQL)
+            self.cursor.execute(f"DELETE FROM {MANIFEST_TABLE} WHERE table_name = ?", (table_name,))
+            self.cursor.executemany(
+                f"INSERT INTO {MANIFEST_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(table_name, *entry) for entry in entries]
+            )
+            self.conn.commit()
+
+    def create_table(self, table_name):
+        """
+        Create a new table in the database based on predefined schema.
+        
+        Args:
+            table_name (str): Name of the table to create ('wind', 'tornado', or 'hail').
+            
+        Note:
+            Table schema and indexes are pulled from TABLE_DEFINITIONS dictionary.
+            The rows go in per-decade partition tables (<table>_events_1990, ...,
+            added as rows arrive, plus <table>_events_undated) behind the
+            <table>_events view, the narratives in <table>_narratives (indexed
+            for full-text search by <table>_narratives_fts), event locations are
+            indexed by the <table>_rtree R*Tree, and <table> itself is a view
+            joining events and narratives (see view_sql). Dictionary-encoded
+            columns hold codes into the shared lookup_* tables, which the
+            <table> view decodes.
+        """
+        with self._lock:
+            table_def = TABLE_DEFINITIONS[table_name]
+            for lookup in sorted(set(table_def["lookups"].values())):
+                self.cursor.execute(LOOKUP_CREATE_SQL.format(lookup=lookup))
+            if table_def["narratives"]:
+                self.cursor.execute(table_def["narratives"]["create_sql"])
+                for statement in fts_statements(table_name):
+                    self.cursor.execute(statement)
+            self.cursor.execute(rtree_statements(table_name))
+            self._add_partition(table_name, None, with_indexes=True)
+            self.cursor.execute(view_sql(table_name))
+            self.create_indexes(table_name)
+            for statement in SHARED_SCHEMA_SQL:
+                self.cursor.execute(statement)
+            self.conn.commit()
+
+    def drop_table(self, table_name):
+        """
+        Drop a table (its views, partitions and narratives table) along with its
+        rows in the rollup, time histogram and sketches tables. The lookup
+        tables are shared with the other hazards and kept.
+        """
+        with self._lock:
+            # A database from before the events/narratives split has a plain
+            # table under the hazard name, and one from before partitioning a
+            # plain <table>_events table, so check what each name is.
+            narratives = TABLE_DEFINITIONS[table_name]["narratives"]
+            names = [table_name, events_table(table_name), narratives_table(table_name),
+                     TABLE_DEFINITIONS[table_name]["spatial"]["rtree_table"]]
+            if narratives:
+                names.append(narratives["fts_table"])
+            names.extend(partition_table(table_name, key)
+                         for key in self._stored_partitions(table_name))
+            for name in names:
+                row = self.cursor.execute(
+                    "SELECT type FROM sqlite_master WHERE name = ? AND type IN ('table', 'view')",
+                    (name,)
+                ).fetchone()
+                if row is not None:
+                    self.cursor.execute(f"DROP {row[0].upper()} {name}")
+            for aggregate_table in (ROLLUP_TABLE, TIME_HISTOGRAM_TABLE, SKETCHES_TABLE):
+                if self._table_exists(aggregate_table):
+                    self.cursor.execute(f"DELETE FROM {aggregate_table} WHERE hazard = ?", (table_name,))
+            if self._table_exists(VERSIONS_TABLE):
+                self._bump_table_version(table_name)
+            self.conn.commit()
+            self._local_data_version += 1
+
+    def _bump_table_version(self, table_name):
+        """
+        Mark a table's rows as changed. Runs inside the caller's transaction.
+        """
+        self.cursor.execute(
+            f"INSERT INTO {VERSIONS_TABLE} VALUES (?, 1) "
+            f"ON CONFLICT (table_name) DO UPDATE SET version = version + 1",
+            (table_name,)
+        )
+
+    def _stored_partitions(self, table_name):
+        """
+        Keys of a hazard's partition tables, read on the writing connection so
+        partitions added by the current transaction are included.
+        """
+        rows = self.cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB ?",
+            (f"{events_table(table_name)}_*",)
+        ).fetchall()
+        return partition_keys(table_name, [name for (name,) in rows])
+
+    def _add_partition(self, table_name, key, with_indexes):
+        """
+        Create a partition table (with its indexes unless with_indexes is False)
+        and recreate the <table>_events view to include it.
+        Runs inside the caller's transaction, if there is one.
+        """
+        for statement in partition_statements(table_name, key):
+            self.cursor.execute(statement)
+        if with_indexes:
+            for statement in self.index_statements(table_name, [key]).values():
+                self.cursor.execute(statement)
+        self.cursor.execute(f"DROP VIEW IF EXISTS {events_table(table_name)}")
+        self.cursor.execute(events_view_sql(table_name, self._stored_partitions(table_name)))
+
+    def _next_event_id(self, table_name):
+        """
+        One more than the largest EVENT_ID in any partition. Each partition's
+        MAX(EVENT_ID) is a rowid lookup, unlike MAX over the UNION ALL view.
+        """
+        largest = 0
+        for key in self._stored_partitions(table_name):
+            row = self.cursor.execute(
+                f"SELECT MAX(EVENT_ID) FROM {partition_table(table_name, key)}"
+            ).fetchone()
+            largest = max(largest, row[0] or 0)
+        return largest + 1
+
+    def _insert_events(self, table_name, rows, first_id, with_indexes):
+        """
+        Insert parsed rows with consecutive EVENT_IDs from first_id, each into
+        the partition for its DATE_NUM (created if needed, see _add_partition),
+        and add them to that partition's sketches (saved by _save_sketches).
+        Runs inside the caller's transaction.
+        
+        Returns:
+            set: Keys of the partitions the rows went into.
+        """
+        narratives = TABLE_DEFINITIONS[table_name]["narratives"]
+        event_rows, narrative_rows = split_event_rows(table_name, rows, first_id)
+        self._encode_lookups(table_name, event_rows)
+        date_index = _stored_index(table_name, "DATE_NUM")
+        by_partition = {}
+        for row in event_rows:
+            by_partition.setdefault(partition_key(row[date_index]), []).append(row)
+        existing = set(self._stored_partitions(table_name)) if by_partition else set()
+        for key, partition_rows in by_partition.items():
+            if key not in existing:
+                self._add_partition(table_name, key, with_indexes)
+            insert_sql = TABLE_DEFINITIONS[table_name]["insert_sql"].format(
+                partition=partition_table(table_name, key))
+            self.cursor.executemany(insert_sql, partition_rows)
+            update_sketches(table_name, self._partition_sketches(table_name, key), partition_rows)
+        if narratives:
+            self.cursor.executemany(narratives["insert_sql"], narrative_rows)
+        return set(by_partition)
+
+    def _empty_partitions(self, table_name):
+        """
+        Keys of a hazard's partition tables that hold no rows.
+        Runs inside the caller's transaction, if there is one.
+        """
+        return [key for key in self._stored_partitions(table_name)
+                if self.cursor.execute(
+                    f"SELECT NOT EXISTS (SELECT 1 FROM {partition_table(table_name, key)})"
+                ).fetchone()[0]]
+
+    def _encode_lookups(self, table_name, event_rows):
+        """
+        Replace the dictionary-encoded values in events-table rows (lists, as
+        split_event_rows returns them) with their lookup codes, adding values
+        not seen before to the lookup tables. NULL stays NULL.
+        Runs inside the caller's transaction.
+        """
+        for name, lookup in TABLE_DEFINITIONS[table_name]["lookups"].items():
+            index = _stored_index(table_name, name)
+            codes = self._lookup_codes.get(lookup)
+            if codes is None:
+                codes = self._lookup_codes[lookup] = dict(
+                    self.cursor.execute(f"SELECT value, id FROM {lookup}").fetchall())
+            # the lookup's TEXT column would store any other value as text
+            missing = {value if isinstance(value, str) else str(value)
+                       for value in (row[index] for row in event_rows)
+                       if value is not None} - codes.keys()
+            if missing:
+                self.cursor.executemany(f"INSERT OR IGNORE INTO {lookup} (value) VALUES (?)",
+                                        [(value,) for value in sorted(missing)])
+                codes.update(self.cursor.execute(f"SELECT value, id FROM {lookup}").fetchall())
+            for row in event_rows:
+                value = row[index]
+                if value is not None:
+                    row[index] = codes[value if isinstance(value, str) else str(value)]
+
+    def _partition_sketches(self, table_name, key):
+        """
+        The sketches of a partition the current write transaction changes, read
+        from the sketches table on first use. Runs inside the caller's transaction.
+        """
+        partition = partition_table(table_name, key)
+        sketches = self._pending_sketches.get(partition)
+        if sketches is None:
+            sketches = self._pending_sketches[partition] = new_sketches(table_name)
+            rows = self.cursor.execute(
+                f"SELECT sketch, state FROM {SKETCHES_TABLE} WHERE hazard = ? AND partition_table = ?",
+                (table_name, partition)
+            ).fetchall()
+            for name, state in rows:
+                if name in sketches:
+                    sketches[name] = load_sketch(name, state)
+        return sketches
+
+    def _rebuild_sketches(self, table_name, key):
+        """
+        Recompute a partition's sketches from its stored rows, for when rows were
+        updated or deleted (sketches can only add). Runs inside the caller's
+        transaction.
+        """
+        sketches = self._pending_sketches[partition_table(table_name, key)] = new_sketches(table_name)
+        rows = self.cursor.execute(f"SELECT * FROM {partition_table(table_name, key)}")
+        for batch in iter(lambda: rows.fetchmany(DEFAULT_FETCH_SIZE), []):
+            update_sketches(table_name, sketches, batch)
+
+    def _save_sketches(self, table_name):
+        """
+        Write the sketches changed by the current write transaction. Runs inside
+        the caller's transaction.
+        """
+        self.cursor.executemany(
+            f"INSERT OR REPLACE INTO {SKETCHES_TABLE} VALUES (?, ?, ?, ?)",
+            [(table_name, partition, name, sketch.to_state())
+             for partition, sketches in self._pending_sketches.items()
+             for name, sketch in sketches.items()]
+        )
+        self._pending_sketches.clear()
+
+    def lookup_values(self, lookup):
+        """
+        Read a lookup table (see LOOKUP_CREATE_SQL).
+        
+        Returns:
+            dict: Maps each code to its value.
+        """
+        return dict(self._read(f"SELECT id, value FROM {lookup}"))
+
+    def partitions(self, table_name):
+        """
+        Keys of a hazard's partitions (see partition_key): the first year of
+        each dated one in order, then None for the undated one.
+        """
+        schema_version = self._read("PRAGMA schema_version")[0][0]
+        cached = self._partition_keys.get(table_name)
+        if cached is not None and cached[0] == schema_version:
+            return cached[1]
+        rows = self._read(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB ?",
+            (f"{events_table(table_name)}_*",)
+        )
+        keys = partition_keys(table_name, [name for (name,) in rows])
+        self._partition_keys[table_name] = (schema_version, keys)
+        return keys
+
+    def _overlapping_partitions(self, table_name, start_date=None, end_date=None):
+        """
+        Keys of the partitions that can hold events in a date range. The
+        undated partition only counts when neither bound is given.
+        """
+        keys = self.partitions(table_name)
+        if start_date is None and end_date is None:
+            return keys
+        first = None if start_date is None else iso_to_day_number(start_date)
+        last = None if end_date is None else iso_to_day_number(end_date)
+        overlapping = []
+        for key in keys:
+            if key is None:
+                continue
+            key_first, key_following = partition_day_range(key)
+            if (last is None or key_first <= last) and (first is None or key_following > first):
+                overlapping.append(key)
+        return overlapping
+
+    def events_source(self, table_name, start_date=None, end_date=None):
+        """
+        FROM-clause source for a query on a hazard's events over a date range:
+        only the partitions that overlap it, aliased as <table>_events so the
+        query's column references still work. Without bounds it is the whole
+        <table>_events view.
+        
+        Args:
+            table_name (str): Hazard table ('wind', 'tornado', or 'hail').
+            start_date (str, optional): First date (YYYY-MM-DD) the query covers.
+            end_date (str, optional): Last date (YYYY-MM-DD) the query covers.
+            
+        Returns:
+            str: e.g. 'wind_events_2000 AS wind_events', or a UNION ALL subquery
+                over several partitions.
+                
+        Note:
+            The date filter must still be in the query's WHERE clause; this only
+            keeps partitions outside the range from being searched at all. If
+            none overlap, the undated partition is used: its NULL DATE_NUMs never
+            match a date range, so the query returns no rows.
+        """
+        events = events_table(table_name)
+        if start_date is None and end_date is None:
+            return events
+        keys = self._overlapping_partitions(table_name, start_date, end_date) or [None]
+        if len(keys) == 1:
+            return f"{partition_table(table_name, keys[0])} AS {events}"
+        arms = " UNION ALL ".join(f"SELECT * FROM {partition_table(table_name, key)}"
+                                  for key in keys)
+        return f"({arms}) AS {events}"
+
+    def partition_union(self, table_name, sql, params, start_date=None, end_date=None):
+        """
+        Repeat a query once per partition overlapping a date range, as one
+        UNION ALL. For queries that join the events to the R*Tree or FTS index:
+        SQLite flattens a join with the <table>_events view into one join per
+        partition but drops the CROSS JOIN order, letting it scan partitions
+        and probe the index instead of the other way round.
+        
+        Args:
+            table_name (str): Hazard table ('wind', 'tornado', or 'hail').
+            sql (str): A SELECT with "{events_source}" where the events go and
+                columns qualified as <table>_events.<column>; each arm names
+                one partition table in their place.
+            params (iterable): The SELECT's parameters.
+            start_date (str, optional): First date (YYYY-MM-DD) the query covers.
+            end_date (str, optional): Last date (YYYY-MM-DD) the query covers.
+            
+        Returns:
+            tuple: (compound SELECT, parameters repeated for each arm). An ORDER
+                BY appended to it must name result columns by number.
+        """
+        events = events_table(table_name)
+        keys = self._overlapping_partitions(table_name, start_date, end_date) or [None]
+        arms = []
+        for key in keys:
+            partition = partition_table(table_name, key)
+            arms.append(sql.replace("{events_source}", partition)
+                        .replace(f"{events}.", f"{partition}."))
+        return "\nUNION ALL\n".join(arms), tuple(params) * len(arms)
+
+    def top_rows(self, table_name, names, order_column, limit, start_date=None, end_date=None):
+        """
+        The limit events with the largest order_column in a date range.
+        
+        Each overlapping partition answers its own ORDER BY ... DESC LIMIT query
+        (from its index on order_column or the date), and the per-partition
+        lists are merged with a heap, so only about limit rows per partition
+        are read.
+        
+        Args:
+            table_name (str): Hazard table ('wind', 'tornado', or 'hail').
+            names (list): Columns from resolve_columns.
+            order_column (str): Column to rank by, e.g. 'DAMAGE_PROPERTY_NUM'.
+            limit (int): Maximum number of rows to return.
+            start_date (str, optional): Only events on or after this YYYY-MM-DD date.
+            end_date (str, optional): Only events on or before this YYYY-MM-DD date.
+            
+        Returns:
+            list: Rows of event_select_list(table_name, names), in order_column
+                order as SQLite sorts it (text above numbers, NULLs last).
+        """
+        events = events_table(table_name)
+        where, params = event_filters(table_name, start_date, end_date)
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+        ranked = []
+        for key in self._overlapping_partitions(table_name, start_date, end_date):
+            sql = f"""
+            SELECT {event_select_list(table_name, names)}, {events}.{order_column}
+            FROM {partition_table(table_name, key)} AS {events}{lookup_joins(table_name, names)}
+            {where_sql}
+            ORDER BY {events}.{order_column} DESC
+            LIMIT ?
+            """
+            ranked.append(self.execute_query(sql, (*params, limit)))
+        merged = heapq.merge(*ranked, key=lambda row: sqlite_sort_key(row[-1]), reverse=True)
+        return [row[:-1] for row in itertools.islice(merged, max(limit, 0))]
+
+    def iter_events(self, table_name, start_date, end_date, header=True):
+        """
+        Stream a hazard's rows in a date range, in date order, as SELECT * on
+        its view would return them (public_columns, narratives included).
+        
+        Args:
+            table_name (str): Hazard table ('wind', 'tornado', or 'hail').
+            start_date (str): Start date in YYYY-MM-DD format.
+            end_date (str): End date in YYYY-MM-DD format.
+            header (bool): If True, the first item is a tuple of column names.
+            
+        Returns:
+            iterator: Event rows, fetched in batches (see iter_query).
+        """
+        events = events_table(table_name)
+        select, source = logical_source(table_name,
+                                        names=[name for name, _ in public_columns(table_name)])
+        sql = f"""
+        SELECT {select}
+        FROM {source}
+        WHERE {events}.DATE_NUM >= ?
+          AND {events}.DATE_NUM <= ?
+        ORDER BY {events}.DATE_NUM
+        """
+        return self.iter_query(
+            sql, (iso_to_day_number(start_date), iso_to_day_number(end_date)), header=header
+        )
+
+    def enable_cancellation(self, every_n_instructions=1000):
+        """
+        Install a progress handler on every connection so that queries run inside
+        cancellable() can be aborted from another thread.
+        """
+        with self._lock:
+            if self._cancellation_enabled:
+                return
+            self.conn.set_progress_handler(self._should_abort, every_n_instructions)
+            if self.pool is not None:
+                self.pool.set_progress_handler(self._should_abort, every_n_instructions)
+            self._cancellation_enabled = True
+
+    def _should_abort(self):
+        event = getattr(self._cancel_state, "event", None)
+        return 1 if event is not None and event.is_set() else 0
+
+    @contextmanager
+    def cancellable(self, event):
+        """
+        Let queries run by this thread inside the with-block be cancelled.
+        
+        Setting event from any thread makes the statement currently executing
+        here fail with sqlite3.OperationalError ('interrupted').
+        
+        Args:
+            event (threading.Event): Cancellation flag.
+        """
+        self.enable_cancellation()
+        previous = getattr(self._cancel_state, "event", None)
+        self._cancel_state.event = event
+        try:
+            yield
+        finally:
+            self._cancel_state.event = previous
+
+    def _read(self, sql, params=()):
+        """
+        Run a read-only statement and return all rows, bypassing the result cache.
+        Uses a pooled read connection if there is a pool, else the main connection.
+        """
+        with self._read_connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def table_version(self, table_name):
+        """
+        Return a counter that changes whenever the table's rows change.
+        This is read from the database, so it also sees loads made through
+        other connections or processes.
+        """
+        try:
+            rows = self._read(
+                f"SELECT version FROM {VERSIONS_TABLE} WHERE table_name = ?", (table_name,)
+            )
+        except sqlite3.OperationalError:  # no table_versions table yet
+            return 0
+        return rows[0][0] if rows else 0
+
+    def clear_caches(self):
+        """
+        Drop every in-memory cache derived from table contents.
+        """
+        self._sorted_values.clear()
+        self._time_prefix_sums.clear()
+        self._sketch_cache.clear()
+        self._sample_cache.clear()
+        self.result_cache.clear()
+
+    def sorted_column_values(self, table_name, column):
+        """
+        Return a table column's numeric values in ascending order, plus the
+        table's total row count, cached in memory until the table changes.
+        
+        Args:
+            table_name (str): Table to read ('wind', 'tornado', or 'hail').
+            column (str): Column to sort, e.g. '[MAGNITUDE (Knots)]'.
+            
+        Returns:
+            tuple: (sorted list of numbers, total row count). NULL and blank
+                cells are left out of the list but still counted in the total.
+        """
+        version = self.table_version(table_name)
+        cached = self._sorted_values.get((table_name, column))
+        if cached is not None and cached[0] == version:
+            return cached[1], cached[2]
+
+        rows = self._read(
+            f"SELECT {column} FROM {events_table(table_name)} "
+            f"WHERE {column} IS NOT NULL ORDER BY {column}"
+        )
+        # ORDER BY puts numbers before text, so blank ('') cells sort to the end
+        values = [value for (value,) in rows if isinstance(value, (int, float))]
+        # Counted per partition, as each can count from its smallest index
+        total = sum(
+            self._read(f"SELECT COUNT(*) FROM {partition_table(table_name, key)}")[0][0]
+            for key in self.partitions(table_name)
+        )
+
+        self._sorted_values[(table_name, column)] = (version, values, total)
+        return values, total
+
+    def percentile_ranks(self, table_name, column, values):
+        """
+        Percentage of a table's rows whose column is strictly less than each value.
+        
+        Uses the cached sorted column (see sorted_column_values), so each value is
+        a binary search instead of a COUNT(*) scan.
+        
+        Args:
+            table_name (str): Table to read ('wind', 'tornado', or 'hail').
+            column (str): Numeric column to rank against.
+            values (iterable): Values to rank.
+            
+        Returns:
+            list: Percentile rank (0-100) of each value, in input order.
+        """
+        sorted_values, total = self.sorted_column_values(table_name, column)
+        if total == 0:
+            return [0.0 for _ in values]
+        return [bisect.bisect_left(sorted_values, value) / total * 100 for value in values]
+
+    def column_percentiles(self, table_name, column, percents):
+        """
+        Nearest-rank percentiles of a table column's numeric values, from the
+        cached sorted column (see sorted_column_values).
+        
+        Args:
+            table_name (str): Table to read ('wind', 'tornado', or 'hail').
+            column (str): Numeric column, e.g. 'DAMAGE_PROPERTY_NUM'.
+            percents (iterable): Percentiles to compute, each 0-100.
+            
+        Returns:
+            list: The column value at each percentile (None if the column holds
+                no numbers), in input order.
+            
+        Raises:
+            ValueError: If a percentile is outside 0-100.
+        """
+        percents = _checked_percents(percents)
+        sorted_values, _ = self.sorted_column_values(table_name, column)
+        if not sorted_values:
+            return [None for _ in percents]
+        return [sorted_values[max(1, math.ceil(percent / 100 * len(sorted_values))) - 1]
+                for percent in percents]
+
+    def distinct_count(self, table_name, column):
+        """
+        Number of distinct non-NULL values in a table column, read from each
+        partition's index on the column (TABLE_DEFINITIONS "indexes").
+        """
+        arms = "\n            UNION\n            ".join(
+            f"SELECT DISTINCT {column} FROM {partition_table(table_name, key)}"
+            for key in self.partitions(table_name)
+        )
+        return self.execute_query(f"SELECT COUNT({column}) FROM ({arms})")[0][0]
+
+    def _sketches(self, table_name):
+        """
+        Every partition's sketches (see new_sketches), read from the sketches
+        table and cached in memory until the table changes.
+        
+        Returns:
+            dict: Maps each partition key to its sketches, keyed by name.
+        """
+        version = self.table_version(table_name)
+        cached = self._sketch_cache.get(table_name)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        by_partition = {key: new_sketches(table_name) for key in self.partitions(table_name)}
+        keys = {partition_table(table_name, key): key for key in by_partition}
+        rows = self._read(
+            f"SELECT partition_table, sketch, state FROM {SKETCHES_TABLE} WHERE hazard = ?",
+            (table_name,)
+        )
+        for partition, name, state in rows:
+            if partition in keys and name in by_partition[keys[partition]]:
+                by_partition[keys[partition]][name] = load_sketch(name, state)
+
+        self._sketch_cache[table_name] = (version, by_partition, {})
+        return by_partition
+
+    def _merged_sketch(self, table_name, kind, column):
+        """
+        A column's 'quantiles' or 'distinct' sketch over the whole table,
+        merged from the per-partition ones and cached along with them (merging
+        compacts at random, so repeated queries would otherwise differ).
+        
+        Raises:
+            ValueError: If the table keeps no such sketch (TABLE_DEFINITIONS "sketches").
+        """
+        if column not in TABLE_DEFINITIONS[table_name]["sketches"][kind]:
+            raise ValueError(f"The {table_name} table keeps no {kind} sketch of {column}")
+        by_partition = self._sketches(table_name)
+        merged_cache = self._sketch_cache[table_name][2]
+        name = f"{kind}:{column}"
+        if name not in merged_cache:
+            merged = SKETCH_CLASSES[kind]()
+            for sketches in by_partition.values():
+                merged.merge(sketches[name])
+            merged_cache[name] = merged
+        return merged_cache[name]
+
+    def _sampled_rows(self, table_name):
+        """
+        The rows behind each partition's reservoir sample, as dicts keyed by
+        table_columns name plus EVENT_ID (dictionary-encoded columns decoded),
+        cached in memory until the table changes.
+        
+        Returns:
+            dict: Maps each partition key to its list of sampled rows.
+        """
+        version = self.table_version(table_name)
+        cached = self._sample_cache.get(table_name)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        events = events_table(table_name)
+        names = [name for name, _ in table_columns(table_name)] + ["EVENT_ID"]
+        samples = {}
+        for key, sketches in self._sketches(table_name).items():
+            select, source = logical_source(table_name,
+                                            f"{partition_table(table_name, key)} AS {events}")
+            rows = []
+            for ids in iter_chunks(sketches["sample"].items, 500):
+                rows.extend(self._read(
+                    f"SELECT {select}, {events}.EVENT_ID FROM {source} "
+                    f"WHERE {events}.EVENT_ID IN ({', '.join('?' * len(ids))})", ids
+                ))
+            samples[key] = [dict(zip(names, row)) for row in rows]
+
+        self._sample_cache[table_name] = (version, samples)
+        return samples
+
+    def approximate_percentile_ranks(self, table_name, column, values):
+        """
+        Estimate percentile_ranks from the column's KLL sketches (see
+        TABLE_DEFINITIONS "sketches") instead of the sorted column.
+        
+        Returns:
+            list: An Estimate (value, low, high) of each value's percentile rank
+                (0-100), in input order.
+            
+        Raises:
+            ValueError: If the table keeps no quantile sketch of column.
+        """
+        sketch = self._merged_sketch(table_name, "quantiles", column)
+        total = sum(sketches["sample"].seen for sketches in self._sketches(table_name).values())
+        if total == 0:
+            return [Estimate(0.0, 0.0, 0.0) for _ in values]
+        return [Estimate(*(rank / total * 100 for rank in sketch.rank_estimate(value)))
+                for value in values]
+
+    def approximate_percentiles(self, table_name, column, percents):
+        """
+        Estimate column_percentiles from the column's KLL sketches.
+        
+        Returns:
+            list: An Estimate (value, low, high) of the value at each percentile
+                (None if the column holds no numbers), in input order.
+            
+        Raises:
+            ValueError: If a percentile is outside 0-100, or the table keeps no
+                quantile sketch of column.
+        """
+        percents = _checked_percents(percents)
+        sketch = self._merged_sketch(table_name, "quantiles", column)
+        return [sketch.quantile(percent) for percent in percents]
+
+    def approximate_distinct_count(self, table_name, column):
+        """
+        Estimate distinct_count from the column's HyperLogLog sketches.
+        
+        Returns:
+            Estimate: (value, low, high) of the number of distinct values.
+            
+        Raises:
+            ValueError: If the table keeps no distinct sketch of column.
+        """
+        return self._merged_sketch(table_name, "distinct", column).estimate()
+
+    def approximate_count(self, table_name, start_date=None, end_date=None,
+                          min_magnitude=None, predicate=None):
+        """
+        Estimate how many events match a filter from the reservoir samples of
+        the partitions in the date range, reading at most SAMPLE_SIZE rows from
+        each (cached until the table changes) rather than the matching rows.
+        
+        Args:
+            table_name (str): Table to count ('wind', 'tornado', or 'hail').
+            start_date (str, optional): Only events on or after this YYYY-MM-DD date.
+            end_date (str, optional): Only events on or before this YYYY-MM-DD date.
+            min_magnitude (float, optional): Only events whose magnitude column
+                (the rollup's: knots, EF_NUM, or hail inches) is >= this.
+            predicate (callable, optional): Any further filter, called with each
+                sampled row as a dict keyed by table_columns name plus EVENT_ID,
+                with dictionary-encoded columns decoded.
+            
+        Returns:
+            Estimate: (value, low, high) of the number of matching events. It is
+                exact for partitions small enough to be sampled whole.
+        """
+        first = None if start_date is None else iso_to_day_number(start_date)
+        last = None if end_date is None else iso_to_day_number(end_date)
+        magnitude = table_columns(table_name)[TABLE_DEFINITIONS[table_name]["rollup"]["magnitude"]][0]
+        threshold = None if min_magnitude is None else sqlite_sort_key(min_magnitude)
+
+        def matches(row):
+            day = row["DATE_NUM"]
+            if first is not None and (day is None or day < first):
+                return False
+            if last is not None and (day is None or day > last):
+                return False
+            if threshold is not None and sqlite_sort_key(row[magnitude]) < threshold:
+                return False
+            return predicate is None or bool(predicate(row))
+
+        sketches = self._sketches(table_name)
+        samples = self._sampled_rows(table_name)
+        strata = []
+        for key in self._overlapping_partitions(table_name, start_date, end_date):
+            rows = samples.get(key, [])
+            strata.append((sketches[key]["sample"].seen, len(rows), sum(map(matches, rows))))
+        return stratified_count(strata)
+
+    def fetch_narratives(self, table_name, event_ids):
+        """
+        Read the narratives of a set of events from the narratives side table.
+        
+        Args:
+            table_name (str): Hazard table ('wind' or 'tornado').
+            event_ids (list): EVENT_IDs to look up.
+            
+        Returns:
+            dict: Maps EVENT_ID to a tuple of its narrative columns. Events
+                without a narratives row are left out.
+        """
+        narratives = {}
+        event_ids = list(event_ids)
+        # stay well under SQLite's bound-parameter limit
+        for start in range(0, len(event_ids), 500):
+            batch = event_ids[start:start + 500]
+            placeholders = ", ".join("?" * len(batch))
+            for row in self._read(
+                f"SELECT * FROM {narratives_table(table_name)} WHERE EVENT_ID IN ({placeholders})",
+                batch
+            ):
+                narratives[row[0]] = tuple(row[1:])
+        return narratives
+
+    def attach_narratives(self, table_name, names, rows):
+        """
+        Turn rows read from an events table into result rows with the given
+        columns, fetching the narratives only if names asks for them.
+        
+        Args:
+            table_name (str): Hazard table ('wind', 'tornado', or 'hail').
+            names (list): Result columns, as returned by resolve_columns.
+            rows (list): Rows of (EVENT_ID, *non-narrative columns of names in
+                order), i.e. the columns given by event_select_list.
+            
+        Returns:
+            list: Tuples with the values of names, in order.
+        """
+        narrative_names = narrative_columns(table_name)
+        wanted = [name for name in names if name in narrative_names]
+        if not wanted:
+            return [tuple(row[1:]) for row in rows]
+
+        narratives = self.fetch_narratives(table_name, [row[0] for row in rows])
+        empty = (None,) * len(narrative_names)
+        results = []
+        for row in rows:
+            stored = iter(row[1:])
+            texts = dict(zip(narrative_names, narratives.get(row[0], empty)))
+            results.append(tuple(texts[name] if name in texts else next(stored)
+                                 for name in names))
+        return results
+
+    def search_narratives(self, table_name, query, start_date=None, end_date=None,
+                          min_magnitude=None, columns=None, limit=20):
+        """
+        Full-text search over a hazard's event and episode narratives.
+        
+        Args:
+            table_name (str): Hazard table with narratives ('wind' or 'tornado').
+            query (str): FTS5 query, e.g. 'mobile home' (both words), 'waterspout
+                NEAR onshore', or '"roof blown off"' for a phrase (see fts_phrase
+                and fts_terms).
+            start_date (str, optional): Only events on or after this YYYY-MM-DD date.
+            end_date (str, optional): Only events on or before this YYYY-MM-DD date.
+            min_magnitude (float, optional): Only events with magnitude >= this
+                (knots or EF_NUM, the rollup's magnitude column).
+            columns (list, optional): Event columns to return (see resolve_columns).
+                Defaults to every column except the narratives.
+            limit (int): Maximum number of hits. Defaults to 20.
+            
+        Returns:
+            list: Hits, best first, as tuples of the requested columns followed by
+                the BM25 score (higher is better) and a snippet of the best
+                matching narrative with the matched terms in [brackets].
+                
+        Raises:
+            ValueError: If the table has no narratives, a column is unknown, or
+                query isn't valid FTS5 syntax.
+        """
+        narratives = TABLE_DEFINITIONS[table_name]["narratives"]
+        if not narratives:
+            raise ValueError(f"The {table_name} table has no narratives to search")
+        names = resolve_columns(table_name, columns)
+        fts = narratives["fts_table"]
+        events = events_table(table_name)
+
+        where, params = event_filters(table_name, start_date, end_date, min_magnitude)
+        where.insert(0, f"{fts} MATCH ?")
+        params.insert(0, query)
+
+        select = ", ".join(column_sql(table_name, name) for name in names)
+        sql = f"""
+        SELECT {select}, -bm25({fts}), snippet({fts}, -1, '[', ']', '...', 16)
+        FROM {fts}
+        JOIN {{events_source}} ON {events}.EVENT_ID = {fts}.rowid{lookup_joins(table_name, names)}
+        WHERE {' AND '.join(where)}
+        """
+        union, params = self.partition_union(table_name, sql, params, start_date, end_date)
+        try:
+            return self.execute_query(f"{union}\nORDER BY {len(names) + 1} DESC\nLIMIT ?",
+                                      params + (limit,))
+        except sqlite3.OperationalError as exc:
+            # FTS5 reports a malformed MATCH expression as an OperationalError
+            # with no common wording ('fts5: syntax error', 'no such column',
+            # 'unknown special query', ...). Only a cancelled query is passed on.
+            if str(exc) == "interrupted":
+                raise
+            raise ValueError(f"Invalid search query {query!r}: {exc}") from exc
+
+    def events_in_bbox(self, table_name, min_lat, min_lon, max_lat, max_lon,
+                       start_date=None, end_date=None, min_magnitude=None, columns=None):
+        """
+        Events whose location falls in a lat/lon box (for tornadoes, whose track
+        box overlaps it), found through the hazard's R*Tree.
+        
+        Args:
+            table_name (str): Hazard table ('wind', 'tornado', or 'hail').
+            min_lat, min_lon, max_lat, max_lon (float): The box, in degrees.
+            start_date, end_date, min_magnitude: Optional filters (see event_filters).
+            columns (list, optional): Columns to return (see resolve_columns).
+                Defaults to every column except the narratives.
+            
+        Returns:
+            list: Tuples of the requested columns, in EVENT_ID (load) order.
+        """
+        names = resolve_columns(table_name, columns)
+        rtree = TABLE_DEFINITIONS[table_name]["spatial"]["rtree_table"]
+        events = events_table(table_name)
+        # The R*Tree stores float32 boxes rounded outwards, so recheck the
+        # exact box on the stored coordinates.
+        _, box_min_lat, box_max_lat, box_min_lon, box_max_lon = spatial_box_sql(
+            table_name, f"{events}.")
+        where, params = event_filters(table_name, start_date, end_date, min_magnitude)
+        where = [
+            f"{rtree}.max_lat >= ?", f"{rtree}.min_lat <= ?",
+            f"{rtree}.max_lon >= ?", f"{rtree}.min_lon <= ?",
+            f"{box_max_lat} >= ?", f"{box_min_lat} <= ?",
+            f"{box_max_lon} >= ?", f"{box_min_lon} <= ?",
+        ] + where
+        params = [min_lat, max_lat, min_lon, max_lon] * 2 + params
+        joins = lookup_joins(table_name, names)
+        sql = f"""
+        SELECT {', '.join(column_sql(table_name, name) for name in names)}, {events}.EVENT_ID
+        FROM {rtree}
+        CROSS JOIN {{events_source}} ON {events}.EVENT_ID = {rtree}.EVENT_ID{joins}
+        WHERE {' AND '.join(where)}
+        """
+        union, params = self.partition_union(table_name, sql, params, start_date, end_date)
+        rows = self.execute_query(f"{union}\nORDER BY {len(names) + 1}", params)
+        return [row[:-1] for row in rows]
+
+    def _radius_candidates(self, table_name, lat, lon, radius_km, start_date, end_date,
+                           min_magnitude, names):
+        # R*Tree prefilter on the box around the circle, then the exact distance
+        # to each candidate. Yields (distance_km, row of names). CROSS JOIN (here
+        # and in events_in_bbox) keeps the R*Tree as the outer loop; otherwise
+        # the planner may scan the events table and probe the R*Tree per row.
+        coordinates = ["BEGIN_LAT", "BEGIN_LON"]
+        if TABLE_DEFINITIONS[table_name]["spatial"]["track"]:
+            coordinates += ["END_LAT", "END_LON"]
+        min_lat, max_lat, min_lon, max_lon = radius_box(lat, lon, radius_km)
+        rtree = TABLE_DEFINITIONS[table_name]["spatial"]["rtree_table"]
+        events = events_table(table_name)
+        where, params = event_filters(table_name, start_date, end_date, min_magnitude)
+        where = [f"{rtree}.max_lat >= ?", f"{rtree}.min_lat <= ?",
+                 f"{rtree}.max_lon >= ?", f"{rtree}.min_lon <= ?"] + where
+        params = [min_lat, max_lat, min_lon, max_lon] + params
+        select = ", ".join(column_sql(table_name, name) for name in coordinates + list(names))
+        joins = lookup_joins(table_name, names)
+        sql = f"""
+        SELECT {select}
+        FROM {rtree}
+        CROSS JOIN {{events_source}} ON {events}.EVENT_ID = {rtree}.EVENT_ID{joins}
+        WHERE {' AND '.join(where)}
+        """
+        for row in self.execute_query(*self.partition_union(table_name, sql, params,
+                                                            start_date, end_date)):
+            distance = event_distance_km(lat, lon, *row[:len(coordinates)])
+            if distance is not None and distance <= radius_km:
+                yield distance, row[len(coordinates):]
+
+    def events_within_km(self, table_name, lat, lon, radius_km, start_date=None,
+                         end_date=None, min_magnitude=None, columns=None):
+        """
+        Events within radius_km of a point, nearest first.
+        
+        Distances are great-circle (haversine) distances to the event's begin
+        point, or for tornadoes to the nearest point of the BEGIN -> END track.
+        
+        Args:
+            table_name (str): Hazard table ('wind', 'tornado', or 'hail').
+            lat, lon (float): The point, in degrees.
+            radius_km (float): Search radius in kilometres.
+            start_date, end_date, min_magnitude: Optional filters (see event_filters).
+            columns (list, optional): Columns to return (see resolve_columns).
+                Defaults to every column except the narratives.
+            
+        Returns:
+            list: Tuples of the requested columns followed by the distance in km.
+        """
+        names = resolve_columns(table_name, columns)
+        hits = self._radius_candidates(table_name, lat, lon, radius_km, start_date,
+                                       end_date, min_magnitude, names)
+        return [tuple(row) + (distance,)
+                for distance, row in sorted(hits, key=lambda hit: hit[0])]
+
+    def count_within_km(self, table_name, lat, lon, radius_km, start_date=None,
+                        end_date=None, min_magnitude=None):
+        """
+        Number of events events_within_km would return, without building the rows.
+        """
+        return sum(1 for _ in self._radius_candidates(table_name, lat, lon, radius_km,
+                                                      start_date, end_date, min_magnitude, []))
+
+    @contextmanager
+    def bulk_load_pragmas(self):
+        """
+        Temporarily switch the connection to bulk-load settings, restoring the
+        previous values afterwards (even if the load fails).
+        
+        journal_mode can't change inside a transaction, so call this before BEGIN.
+        """
+        saved = {}
+        for pragma, value in BULK_LOAD_PRAGMAS.items():
+            current = self.cursor.execute(f"PRAGMA {pragma}").fetchone()[0]
+            if pragma == "journal_mode" and str(current).lower() == "wal":
+                # Leaving WAL needs exclusive access, which pooled readers prevent,
+                # and WAL with synchronous=OFF is already a fast bulk-load mode.
+                continue
+            saved[pragma] = current
+            self.cursor.execute(f"PRAGMA {pragma} = {value}")
+        try:
+            yield
+        finally:
+            for pragma, value in saved.items():
+                self.cursor.execute(f"PRAGMA {pragma} = {value}")
+
+    def load_csv_into_table(self, csv_path, table_name, chunk_size=DEFAULT_CHUNK_SIZE,
+                            skip_bad_rows=False, defer_indexes=True):
+        """
+        Stream data from a CSV file into the specified database table.
+        
+        Args:
+            csv_path (str): Path to the CSV file to load.
+            table_name (str): Name of the target table ('wind', 'tornado', or 'hail').
+            chunk_size (int): Rows per executemany batch. Peak memory is bounded by
+                one chunk regardless of file size. Defaults to 50,000.
+            skip_bad_rows (bool): If True, rows with the wrong column count are
+                skipped and counted instead of aborting the load. Defaults to False.
+            defer_indexes (bool): If True, partitions that are empty when the load
+                starts (all of them on the initial build) get their indexes built
+                after the rows are in rather than maintained row by row. Partitions
+                that already hold rows keep their indexes. Defaults to True.
+            
+        Returns:
+            dict: Load statistics with keys 'table', 'rows', 'skipped', 'seconds',
+                'rows_per_sec' and 'writer_busy'. Also kept on self.last_load_stats.
+            
+        Raises:
+            ValueError: If a row's column count doesn't match the expected schema
+                (and skip_bad_rows is False). Nothing from the file is kept.
+            
+        Note:
+            - Skips the CSV header row
+            - Converts date fields from MM/DD/YYYY to YYYY-MM-DD format and fills
+              the matching integer day-number column (DATE_NUM, END_DATE_NUM)
+            - All chunks go into one explicit transaction, under BULK_LOAD_PRAGMAS
+            - Indexes of empty partitions are built after the rows are in, then
+              the partitions the rows went into are ANALYZEd
+        """
+        batches = _parsed_batches([csv_path], table_name, 1, chunk_size, skip_bad_rows)
+        self.last_load_stats = self._bulk_insert(table_name, batches, defer_indexes)
+        return self.last_load_stats
+
+    def load_many(self, csv_paths, table_name, workers=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                  skip_bad_rows=False, defer_indexes=True):
+        """
+        Load many CSV files (e.g. one StormEvents file per year) into one table.
+        
+        Worker processes parse and validate the files (column-count check and
+        date conversion) and send row batches through a bounded queue to this
+        process, which is the only one that writes to the sqlite3 connection.
+        Everything goes into one transaction, like load_csv_into_table.
+        
+        Args:
+            csv_paths (list): CSV files to load.
+            table_name (str): Name of the target table ('wind', 'tornado', or 'hail').
+            workers (int, optional): Number of parser processes. Defaults to the CPU
+                count; 1 parses in this process without starting any workers.
+            chunk_size (int): Rows per batch sent to the writer. Defaults to 50,000.
+            skip_bad_rows (bool): Skip and count malformed rows instead of failing.
+            defer_indexes (bool): Build the indexes of partitions that are empty
+                when the load starts after it, as for load_csv_into_table.
+                Defaults to True.
+            
+        Returns:
+            dict: Load statistics as for load_csv_into_table, plus 'files' and
+                'workers'. A 'writer_busy' close to 1.0 means the single writer is
+                the bottleneck.
+            
+        Raises:
+            ValueError: If any file has a malformed row (and skip_bad_rows is False).
+                Nothing from any of the files is kept.
+            RuntimeError: If a parser process dies (e.g. is killed) before it has
+                finished. Nothing from any of the files is kept.
+        """
+        csv_paths = _as_path_list(csv_paths)
+        workers = min(workers or os.cpu_count() or 1, max(len(csv_paths), 1))
+        batches = _parsed_batches(csv_paths, table_name, workers, chunk_size, skip_bad_rows)
+        stats = self._bulk_insert(table_name, batches, defer_indexes)
+        stats["files"] = len(csv_paths)
+        stats["workers"] = workers
+        self.last_load_stats = stats
+        return stats
+
+    def load_rows(self, table_name, batches, defer_indexes=True):
+        """
+        Load already-parsed rows (e.g. from a snapshot) into a table, through the
+        same single-transaction path as the CSV loaders, so the rollup and time
+        histogram tables are kept up to date too.
+        
+        Args:
+            table_name (str): Name of the target table ('wind', 'tornado', or 'hail').
+            batches (iterable): Lists of rows, each in the table's column order
+                including the derived columns (as iter_csv_rows yields them).
+            defer_indexes (bool): Build the indexes of empty partitions after the
+                load (see load_csv_into_table).
+            
+        Returns:
+            dict: Load statistics as for load_csv_into_table.
+        """
+        stats = self._bulk_insert(table_name, ((rows, 0) for rows in batches), defer_indexes)
+        self.last_load_stats = stats
+        return stats
+
+    def _bulk_insert(self, table_name, batches, defer_indexes):
+        """
+        Insert (rows, skipped) batches into a table in one transaction under
+        BULK_LOAD_PRAGMAS, rolling back everything if any batch fails.
+        
+        With defer_indexes, partitions that are empty at the start (or created by
+        the load) have their declared indexes dropped and built once at the end,
+        which is much cheaper than maintaining them row by row. Partitions that
+        already hold rows keep their indexes, so appending a small file doesn't
+        rebuild the indexes of the whole table.
+        
+        Returns:
+            dict: 'table', 'rows', 'skipped', 'seconds', 'rows_per_sec' and
+                'writer_busy' (fraction of wall time spent inside executemany).
+        """
+        with self._lock:
+            self.conn.commit()  # journal_mode can only change outside a transaction
+            started = time.perf_counter()
+            loaded = skipped = 0
+            busy = 0.0
+            with self.bulk_load_pragmas():
+                self.cursor.execute("BEGIN")
+                self._lookup_codes.clear()
+                self._pending_sketches.clear()
+                touched = set()
+                try:
+                    existing = set(self._stored_partitions(table_name))
+                    deferred = set(self._empty_partitions(table_name)) if defer_indexes else set()
+                    self.drop_indexes(table_name, deferred)
+                    next_id = self._next_event_id(table_name)
+                    for chunk, chunk_skipped in batches:
+                        write_started = time.perf_counter()
+                        touched |= self._insert_events(table_name, chunk, next_id,
+                                                       with_indexes=not defer_indexes)
+                        next_id += len(chunk)
+                        self.cursor.executemany(ROLLUP_UPSERT_SQL, rollup_rows(table_name, chunk))
+                        self.cursor.executemany(TIME_HISTOGRAM_UPSERT_SQL,
+                                                time_histogram_rows(table_name, chunk))
+                        busy += time.perf_counter() - write_started
+                        loaded += len(chunk)
+                        skipped += chunk_skipped
+                    if defer_indexes:
+                        # new partitions were created without indexes too
+                        self.create_indexes(table_name, deferred | (touched - existing))
+                    self._save_sketches(table_name)
+                    self._bump_table_version(table_name)
+                except BaseException:
+                    self.conn.rollback()
+                    raise
+                self.conn.commit()
+            self._local_data_version += 1
+            if defer_indexes and touched:
+                self.analyze(table_name, touched)
+            seconds = time.perf_counter() - started
+
+            return {
+                "table": table_name,
+                "rows": loaded,
+                "skipped": skipped,
+                "seconds": seconds,
+                "rows_per_sec": loaded / seconds if seconds > 0 else float("inf"),
+                "writer_busy": busy / seconds if seconds > 0 else 0.0,
+            }
+
+    def load_delta(self, csv_paths, table_name, prune=False, skip_bad_rows=False):
+        """
+        Merge corrected or republished CSVs into an existing table: new events
+        are inserted, changed ones updated in place and identical ones skipped,
+        all in one transaction, so re-running a file never duplicates rows.
+        
+        Only the months present in the files are read
+        back and compared, so the cost follows the size of the delta rather
+        than of the whole table. The rollup and time histogram tables are
+        adjusted by the difference instead of being rebuilt; only the sketches
+        of partitions with updated or deleted rows are recomputed.
+        
+        Args:
+            csv_paths (str or list): CSV file(s) in the table's StormEvents format.
+            table_name (str): Name of the target table ('wind', 'tornado', or 'hail').
+                It is created if it doesn't exist yet.
+            prune (bool): If True, the files are taken as the full contents of
+                every month they cover, and stored rows of those months that
+                match nothing in them are deleted. Defaults to False.
+            skip_bad_rows (bool): Skip and count malformed rows instead of failing.
+            
+        Returns:
+            dict: 'table', 'rows' (read from the files), 'inserted', 'updated',
+                'unchanged', 'deleted', 'skipped' (malformed rows), 'months'
+                and 'seconds'. Also kept on self.last_load_stats.
+            
+        Raises:
+            ValueError: If any file has a malformed row (and skip_bad_rows is False).
+                Nothing from any of the files is kept.
+            
+        Note:
+            A row is the same event as a stored one if every cell is equal, or
+            else if it has the same TABLE_DEFINITIONS "identity" key (e.g. the
+            tornado ABSOLUTE_ROWNUMBER) in the same month and that key is unique
+            on both sides. Hail has no key, so a corrected hail row is inserted
+            as a new event unless prune removes the old one.
+        """
+        csv_paths = _as_path_list(csv_paths)
+        with self._lock:
+            if not self._table_exists(partition_table(table_name, None)):
+                self.create_table(table_name)
+            narratives = TABLE_DEFINITIONS[table_name]["narratives"]
+            date_index = _column_index(table_name, "DATE_NUM")
+            started = time.perf_counter()
+            bad_rows = [] if skip_bad_rows else None
+
+            self.conn.commit()
+            self.cursor.execute("BEGIN")
+            self._lookup_codes.clear()
+            self._pending_sketches.clear()
+            try:
+                incoming = self._staged_rows(table_name, (
+                    row for csv_path in csv_paths
+                    for row in iter_csv_rows(csv_path, table_name, bad_rows)
+                ))
+                months = {}
+                for row in incoming:
+                    months.setdefault(row_month(table_name, row), []).append(row)
+
+                unchanged = 0
+                updates = []
+                inserts = []
+                removed = []
+                for month, rows in months.items():
+                    existing = self._month_rows(table_name, month)
+                    same, changed, new, unmatched = match_delta_rows(table_name, existing, rows)
+                    unchanged += same
+                    updates.extend(changed)
+                    inserts.extend(new)
+                    if prune:
+                        removed.extend(unmatched)
+
+                self._insert_events(table_name, inserts, self._next_event_id(table_name),
+                                    with_indexes=True)
+
+                # An update stays in its month, so in its row's partition.
+                # split_event_rows puts EVENT_ID last in event rows (as the
+                # WHERE parameter needs) and first in narrative rows.
+                event_names = [name for name, _ in stored_columns(table_name) if name != "EVENT_ID"]
+                partition_updates = {}
+                for event_id, old, row in updates:
+                    partition_updates.setdefault(partition_key(old[date_index]), []).append(
+                        split_event_rows(table_name, [row], event_id)[0][0])
+                for key, event_rows in partition_updates.items():
+                    self._encode_lookups(table_name, event_rows)
+                    self.cursor.executemany(
+                        f"UPDATE {partition_table(table_name, key)} SET ({', '.join(event_names)}) = "
+                        f"({', '.join('?' * len(event_names))}) WHERE EVENT_ID = ?",
+                        event_rows
+                    )
+                if narratives:
+                    names = narrative_columns(table_name)
+                    self.cursor.executemany(
+                        f"UPDATE {narratives_table(table_name)} SET ({', '.join(names)}) = "
+                        f"({', '.join('?' * len(names))}) WHERE EVENT_ID = ?",
+                        [narrative_row[1:] + narrative_row[:1]
+                         for event_id, _, row in updates
+                         for narrative_row in split_event_rows(table_name, [row], event_id)[1]]
+                    )
+
+                removed_ids = [(event_id,) for event_id, _ in removed]
+                for event_id, old in removed:
+                    self.cursor.execute(
+                        f"DELETE FROM {partition_table(table_name, partition_key(old[date_index]))} "
+                        f"WHERE EVENT_ID = ?", (event_id,)
+                    )
+                if narratives:
+                    self.cursor.executemany(
+                        f"DELETE FROM {narratives_table(table_name)} WHERE EVENT_ID = ?", removed_ids
+                    )
+
+                added = inserts + [new for _, _, new in updates]
+                taken = [old for _, old, _ in updates] + [old for _, old in removed]
+                for key in {partition_key(old[date_index]) for old in taken}:
+                    self._rebuild_sketches(table_name, key)
+                self._save_sketches(table_name)
+                self.cursor.executemany(
+                    ROLLUP_UPSERT_SQL,
+                    rollup_rows(table_name, added) + negated_deltas(rollup_rows(table_name, taken), 5)
+                )
+                self.cursor.executemany(
+                    TIME_HISTOGRAM_UPSERT_SQL,
+                    time_histogram_rows(table_name, added)
+                    + negated_deltas(time_histogram_rows(table_name, taken), 3)
+                )
+                for aggregate_table in (ROLLUP_TABLE, TIME_HISTOGRAM_TABLE):
+                    self.cursor.execute(
+                        f"DELETE FROM {aggregate_table} WHERE hazard = ? AND event_count = 0",
+                        (table_name,)
+                    )
+                if added or taken:
+                    self._bump_table_version(table_name)
+            except BaseException:
+                self.conn.rollback()
+                raise
+            self.conn.commit()
+            if added or taken:
+                self._local_data_version += 1
+
+            self.last_load_stats = {
+                "table": table_name,
+                "rows": len(incoming),
+                "inserted": len(inserts),
+                "updated": len(updates),
+                "unchanged": unchanged,
+                "deleted": len(removed),
+                "skipped": len(bad_rows or []),
+                "months": len(months),
+                "seconds": time.perf_counter() - started,
+            }
+            return self.last_load_stats
+
+    def _staged_rows(self, table_name, rows):
+        """
+        Pass parsed rows through a TEMP table with the hazard's column types, so
+        they come back with the same type conversions as the stored rows (e.g.
+        '50' in a REAL column as 50.0) and compare equal to them.
+        Runs inside the caller's transaction.
+        
+        Returns:
+            list: The rows as tuples, in input order.
+        """
+        staging = f"temp.{table_name}_delta_staging"
+        columns = table_columns(table_name)
+        self.cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+        self.cursor.execute(
+            f"CREATE TABLE {staging} ({', '.join(f'{name} {col_type}' for name, col_type in columns)})"
+        )
+        insert_sql = f"INSERT INTO {staging} VALUES ({', '.join('?' * len(columns))})"
+        for chunk in iter_chunks(rows, DEFAULT_CHUNK_SIZE):
+            self.cursor.executemany(insert_sql, chunk)
+        staged = self.cursor.execute(f"SELECT * FROM {staging} ORDER BY rowid").fetchall()
+        self.cursor.execute(f"DROP TABLE {staging}")
+        return staged
+
+    def _month_rows(self, table_name, month):
+        """
+        Stored rows of one row_month, as (EVENT_ID, row) pairs with the row in
+        table_columns order. Only the partition holding that month is read.
+        Runs inside the caller's transaction.
+        """
+        events = events_table(table_name)
+        if month is None:
+            key, where, params = None, f"{events}.DATE_NUM IS NULL", ()
+        else:
+            first, following = month_day_range(month)
+            key, where, params = (partition_key(first),
+                                  f"{events}.DATE_NUM >= ? AND {events}.DATE_NUM < ?",
+                                  (first, following))
+        if key not in self._stored_partitions(table_name):
+            return []
+        select, source = logical_source(table_name,
+                                        f"{partition_table(table_name, key)} AS {events}")
+        rows = self.cursor.execute(
+            f"SELECT {events}.EVENT_ID, {select} FROM {source} WHERE {where}", params
+        ).fetchall()
+        return [(row[0], row[1:]) for row in rows]
+
+    def index_statements(self, table_name, keys=None):
+        """
+        Build the CREATE INDEX statements for a table's declared indexes, which
+        every partition has its own copy of.
+        
+        Args:
+            table_name (str): Hazard table ('wind', 'tornado', or 'hail').
+            keys (iterable, optional): Partition keys. Defaults to every partition.
+        
+        Returns:
+            dict: Maps index name (idx_<partition>_<key>) to its CREATE INDEX statement.
+        """
+        if keys is None:
+            keys = self._stored_partitions(table_name)
+        statements = {}
+        for partition in (partition_table(table_name, key) for key in keys):
+            for key, columns in TABLE_DEFINITIONS[table_name]["indexes"].items():
+                index_name = f"idx_{partition}_{key}"
+                statements[index_name] = (
+                    f"CREATE INDEX IF NOT EXISTS {index_name} "
+                    f"ON {partition} ({', '.join(columns)})"
+                )
+        return statements
+
+    def create_indexes(self, table_name, keys=None):
+        """
+        Create any of the table's declared indexes that don't exist yet, on the
+        given partitions (default all). Runs inside the caller's transaction, if
+        there is one.
+        """
+        for statement in self.index_statements(table_name, keys).values():
+            self.cursor.execute(statement)
+
+    def drop_indexes(self, table_name, keys=None):
+        """
+        Drop the table's declared indexes (e.g. before a bulk load) on the given
+        partitions (default all). Runs inside the caller's transaction, if there
+        is one.
+        """
+        for index_name in self.index_statements(table_name, keys):
+            self.cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
+
+    def analyze(self, table_name, keys=None):
+        """
+        Refresh the query planner's statistics for a table's partitions (default
+        all) and their indexes. analysis_limit keeps this cheap on very large
+        tables.
+        """
+        self.cursor.execute("PRAGMA analysis_limit = 1000")
+        for key in self._stored_partitions(table_name) if keys is None else keys:
+            self.cursor.execute(f"ANALYZE {partition_table(table_name, key)}")
+        self.conn.commit()
+
+    def rollup_breakdown(self, table_name, period, county=None, min_magnitude=None):
+        """
+        Event counts per month or year, read from the rollup table.
+        
+        Args:
+            table_name (str): Hazard table ('wind', 'tornado', or 'hail').
+            period (str): 'month' (grouped across all years) or 'year'.
+            county (str, optional): Only count events in this CountyName.
+            min_magnitude (float, optional): Only count events with a numeric
+                magnitude >= this (knots, EF_NUM or inches). A threshold between
+                the rollup's buckets (whole knots, hundredths of an inch) is
+                answered from the events instead (see _events_breakdown).
+            
+        Returns:
+            list: (period, count) tuples with period formatted like strftime
+                ('01'-'12' or '1950'), and None for events with no date.
+        """
+        if period == "month":
+            label = "CASE WHEN month = 0 THEN NULL ELSE printf('%02d', month) END"
+        elif period == "year":
+            label = "CASE WHEN year = 0 THEN NULL ELSE printf('%04d', year) END"
+        else:
+            raise ValueError(f"period must be 'month' or 'year', not {period!r}")
+
+        where = ["hazard = ?"]
+        params = [table_name]
+        if county is not None:
+            where.append("county = ?")
+            params.append(county)
+        if min_magnitude is not None:
+            bucket = bucket_threshold(table_name, min_magnitude)
+            if bucket is None:
+                return self._events_breakdown(table_name, period, county, min_magnitude)
+            where.append("mag_bucket >= ?")
+            params.append(bucket)
+
+        sql = f"""
+        SELECT {label} AS period, SUM(event_count)
+        FROM {ROLLUP_TABLE}
+        WHERE {' AND '.join(where)}
+        GROUP BY {period}
+        ORDER BY {period}
+        """
+        return self.execute_query(sql, tuple(params))
+
+    def _events_breakdown(self, table_name, period, county, min_magnitude):
+        """
+        rollup_breakdown for a min_magnitude that isn't on a bucket boundary,
+        counted from the events (via the magnitude index) rather than the rollup.
+        """
+        spec = TABLE_DEFINITIONS[table_name]["rollup"]
+        columns = table_columns(table_name)
+        magnitude = columns[spec["magnitude"]][0]
+        county_name = columns[spec["county"]][0]
+        events = events_table(table_name)
+        label = (f"substr({events}.DATE, 6, 2)" if period == "month"
+                 else f"substr({events}.DATE, 1, 4)")
+
+        # Text cells compare above every number in SQLite, but have no bucket
+        # in the rollup, so leave them out here too
+        where = [f"{events}.{magnitude} >= ?",
+                 f"typeof({events}.{magnitude}) IN ('integer', 'real')"]
+        params = [min_magnitude]
+        joins = ""
+        if county is not None:
+            # storm_rollup files a NULL county under ''
+            where.append(f"COALESCE({county_name}_lookup.value, '') = ?")
+            params.append(county)
+            joins = lookup_joins(table_name, [county_name])
+
+        sql = f"""
+        SELECT {label} AS period, COUNT(*)
+        FROM {events}{joins}
+        WHERE {' AND '.join(where)}
+        GROUP BY period
+        ORDER BY period
+        """
+        return self.execute_query(sql, tuple(params))
+
+    def _time_prefix_table(self, table_name):
+        """
+        Build (or reuse) the 2-D prefix sums over the table's time histogram.
+        
+        Returns:
+            tuple: (years, cumulative) where years is the sorted list of years and
+                cumulative[i][m] counts events in years[:i] whose minute is < m - 1,
+                so column 0 holds events with no BEGIN_TIME (minute -1) and
+                column MINUTES_PER_DAY + 1 is the total for those years.
+        """
+        version = self.table_version(table_name)
+        cached = self._time_prefix_sums.get(table_name)
+        if cached is not None and cached[0] == version:
+            return cached[1], cached[2]
+
+        rows = self._read(
+            f"SELECT year, minute, event_count FROM {TIME_HISTOGRAM_TABLE} WHERE hazard = ?",
+            (table_name,)
+        )
+        years = sorted({year for year, _, _ in rows})
+        year_index = {year: i for i, year in enumerate(years)}
+        width = MINUTES_PER_DAY + 2  # leading 0, then the -1 (no time) bucket, then 0..1439
+        counts = [[0] * width for _ in years]
+        for year, minute, count in rows:
+            counts[year_index[year]][minute + 2] += count
+
+        cumulative = [[0] * width]
+        for year_counts in counts:
+            running = 0
+            previous = cumulative[-1]
+            row = [0] * width
+            for m in range(1, width):
+                running += year_counts[m]
+                row[m] = previous[m] + running
+            cumulative.append(row)
+
+        self._time_prefix_sums[table_name] = (version, years, cumulative)
+        return years, cumulative
+
+    def time_window_counts(self, table_name, start_minute, end_minute,
+                           start_year=None, end_year=None):
+        """
+        Count events whose BEGIN_MINUTE falls in a time-of-day window, in O(1)
+        from cached prefix sums over the time_histogram table.
+        
+        Args:
+            table_name (str): Hazard table ('wind', 'tornado', or 'hail').
+            start_minute (int): Window start, minutes after midnight (inclusive).
+            end_minute (int): Window end, minutes after midnight (inclusive). If it
+                is before start_minute the window wraps past midnight.
+            start_year (int, optional): Only count events from this year on.
+            end_year (int, optional): Only count events up to this year.
+            
+        Returns:
+            tuple: (events in the window, all events in the year range). Events
+                with no BEGIN_TIME count toward the total only; events with no
+                date count only when no year range is given.
+        """
+        years, cumulative = self._time_prefix_table(table_name)
+        lo = 0 if start_year is None else bisect.bisect_left(years, start_year)
+        hi = len(years) if end_year is None else bisect.bisect_right(years, end_year)
+        if start_year is not None and lo < len(years) and years[lo] == 0:
+            lo += 1  # year 0 = no date, never inside a year range
+        if hi <= lo:
+            return 0, 0
+
+        first, last = cumulative[lo], cumulative[hi]
+
+        def upto(m):
+            # events in the year range with minute < m (excluding the no-time bucket)
+            return (last[m + 1] - first[m + 1]) - (last[1] - first[1])
+
+        if start_minute <= end_minute:
+            in_range = upto(end_minute + 1) - upto(start_minute)
+        else:
+            in_range = (upto(MINUTES_PER_DAY) - upto(start_minute)) + upto(end_minute + 1)
+        total = last[MINUTES_PER_DAY + 1] - first[MINUTES_PER_DAY + 1]
+        return in_range, total
+
+    def percent_in_time_window(self, table_name, start_time, end_time,
+                               start_year=None, end_year=None):
+        """
+        Percentage of a hazard's events that began between two HHMM times.
+        
+        Args:
+            table_name (str): Hazard table ('wind', 'tornado', or 'hail').
+            start_time (str): Start time in HHMM format (inclusive).
+            end_time (str): End time in HHMM format (inclusive). A window like
+                '2200' to '0200' wraps past midnight.
+            start_year (int, optional): Only consider events from this year on.
+            end_year (int, optional): Only consider events up to this year.
+            
+        Returns:
+            float: Percentage of events in the window.
+            
+        Raises:
+            ValueError: If either time isn't a valid HHMM time.
+        """
+        in_range, total = self.time_window_counts(
+            table_name, hhmm_to_minute(start_time), hhmm_to_minute(end_time),
+            start_year, end_year
+        )
+        if total == 0:
+            return 0.0
+        return (in_range / total) * 100
+
+    def threshold_counts(self, table_name, column, thresholds, start_date, end_date):
+        """
+        Count events with column >= each threshold within a date range, in one pass.
+        
+        Each row is assigned to the highest threshold it reaches by a single CASE
+        bucket, rows are counted per bucket with one GROUP BY, and a running SUM
+        window turns the per-bucket counts into ">= threshold" counts.
+        
+        Args:
+            table_name (str): Hazard table ('wind', 'tornado', or 'hail').
+            column (str): Magnitude column, e.g. '[MAGNITUDE (Knots)]'.
+            thresholds (iterable): Minimum values to count.
+            start_date (str): Start date in YYYY-MM-DD format.
+            end_date (str): End date in YYYY-MM-DD format.
+            
+        Returns:
+            dict: Maps each threshold to its count.
+        """
+        levels = sorted(set(thresholds))
+        if not levels:
+            return {}
+
+        cases = " ".join(
+            f"WHEN {column} >= ? THEN {i}" for i in reversed(range(len(levels)))
+        )
+        sql = f"""
+        SELECT bucket, SUM(COUNT(*)) OVER (ORDER BY bucket DESC)
+        FROM (
+            SELECT CASE {cases} END AS bucket
+            FROM {self.events_source(table_name, start_date, end_date)}
+            WHERE {column} >= ?
+              AND DATE_NUM >= ?
+              AND DATE_NUM <= ?
+        )
+        GROUP BY bucket
+        """
+        params = (*reversed(levels), levels[0],
+                  iso_to_day_number(start_date), iso_to_day_number(end_date))
+        cumulative = dict(self.execute_query(sql, params))
+
+        # Buckets with no rows are missing; they inherit the next bucket up.
+        counts = {}
+        running = 0
+        for i in reversed(range(len(levels))):
+            running = cumulative.get(i, running)
+            counts[levels[i]] = running
+        return counts
+
+    def value_counts(self, table_name, column, start_date=None, end_date=None, limit=None):
+        """
+        Number of events per value of a text column, most frequent first.
+        
+        A dictionary-encoded column (e.g. CountyName or WFO) is grouped by its
+        integer codes, and only the grouped codes are looked up.
+        
+        Args:
+            table_name (str): Hazard table ('wind', 'tornado', or 'hail').
+            column (str): Column to group by (see resolve_columns).
+            start_date (str, optional): Only events on or after this YYYY-MM-DD date.
+            end_date (str, optional): Only events on or before this YYYY-MM-DD date.
+            limit (int, optional): Maximum number of values to return.
+            
+        Returns:
+            list: (value, count) tuples, ties in value order.
+            
+        Raises:
+            ValueError: If column isn't one of the table's non-narrative columns.
+        """
+        name, = resolve_columns(table_name, [column])
+        if name in narrative_columns(table_name):
+            raise ValueError(f"Can't group {table_name} events by narrative column {column!r}")
+        events = events_table(table_name)
+        where, params = event_filters(table_name, start_date, end_date)
+        sql = f"""
+        SELECT {column_sql(table_name, name)}, {events}.event_count
+        FROM (
+            SELECT {name}, COUNT(*) AS event_count
+            FROM {self.events_source(table_name, start_date, end_date)}
+            {f"WHERE {' AND '.join(where)}" if where else ""}
+            GROUP BY {name}
+        ) AS {events}{lookup_joins(table_name, [name])}
+        ORDER BY {events}.event_count DESC, 1
+        LIMIT ?
+        """
+        return self.execute_query(sql, (*params, -1 if limit is None else max(limit, 0)))
+
+    def explain_query_plan(self, sql, params=None):
+        """
+        Run EXPLAIN QUERY PLAN for a query.
+        
+        Args:
+            sql (str): SQL query to explain.
+            params (tuple, optional): Parameters to bind to the query. Defaults to None.
+            
+        Returns:
+            list: The 'detail' column of each plan step, e.g.
+                'SEARCH wind_events_1990 USING COVERING INDEX idx_wind_events_1990_magnitude_date (...)'.
+        """
+        rows = self.cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params or ()).fetchall()
+        return [row[3] for row in rows]
+
+    def execute_query(self, sql, params=None, use_cache=True):
+        """
+        Execute a SQL query and return results.
+        
+        SELECT results are served from an LRU result cache keyed on the
+        whitespace-normalized SQL plus parameters. The cache is emptied whenever
+        the data version changes (any load, drop or write statement).
+        
+        Args:
+            sql (str): SQL query to execute.
+            params (tuple, optional): Parameters to bind to the query. Defaults to None.
+            use_cache (bool): Set False to always run the query. Defaults to True.
+            
+        Returns:
+            list: List of tuples containing query results.
+        """
+        if params is None:
+            params = ()
+
+        if not _is_read_query(sql):
+            with self._lock:
+                self.cursor.execute(sql, params)
+                rows = self.cursor.fetchall()
+                self.conn.commit()
+                self._local_data_version += 1
+            return rows
+        if not use_cache:
+            return self._read(sql, params)
+
+        key = (normalize_sql(sql), _params_key(params))
+        version = self.data_version()
+        rows = self.result_cache.get(key, version)
+        if rows is None:
+            rows = self._read(sql, params)
+            self.result_cache.put(key, rows, version)
+        return list(rows)
+
+    def iter_query(self, sql, params=None, batch_size=DEFAULT_FETCH_SIZE, header=False):
+        """
+        Run a SELECT and yield its rows as they are fetched, batch_size at a time
+        with fetchmany, so memory stays flat however many rows match. Results
+        are not cached.
+        
+        Args:
+            sql (str): SELECT (or WITH) query to execute.
+            params (tuple, optional): Parameters to bind to the query. Defaults to None.
+            batch_size (int): Rows per fetchmany call. Defaults to 10,000.
+            header (bool): If True, first yield a tuple of the result's column names.
+            
+        Returns:
+            iterator: Row tuples.
+            
+        Raises:
+            ValueError: If sql isn't a read query.
+            
+        Note:
+            The read connection (a pooled one, or the main connection and its
+            lock when there is no pool) is held until the iterator is exhausted
+            or closed, so close it when stopping early.
+        """
+        if not _is_read_query(sql):
+            raise ValueError("iter_query only runs SELECT/WITH queries; use execute_query for writes")
+        return self._iter_rows(sql, params or (), batch_size, header)
+
+    def _iter_rows(self, sql, params, batch_size, header):
+        with self._read_connection() as conn:
+            cursor = conn.execute(sql, params)
+            try:
+                if header:
+                    yield tuple(column[0] for column in cursor.description)
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        return
+                    yield from rows
+            finally:
+                cursor.close()
+
+    @contextmanager
+    def _read_connection(self):
+        if self.pool is not None:
+            with self.pool.connection() as conn:
+                yield conn
+        else:
+            with self._lock:
+                yield self.conn
+
+    def data_version(self):
+        """
+        Return a value that changes whenever the database contents may have changed,
+        whether through this object or through another connection.
+        
+        With a pool, PRAGMA data_version is read on a pooled connection rather
+        than the writer, so cached reads don't wait for a load holding the lock.
+        """
+        if self.pool is not None:
+            return (self._local_data_version, self.pool.data_version())
+        with self._lock:
+            external = self.cursor.execute("PRAGMA data_version").fetchone()[0]
+        return (self._local_data_version, external)
+
+    def pool_stats(self):
+        """
+        Checkout and wait-time metrics for the read connection pool.
+        
+        Returns:
+            dict: See ReadConnectionPool.stats, or None without a pool.
+        """
+        return self.pool.stats() if self.pool is not None else None
+
+    def cache_stats(self):
+        """
+        Hit/miss/eviction/invalidation statistics for the result cache.
+        
+        Returns:
+            dict: See ResultCache.stats.
+        """
+        return self.result_cache.stats()
 
     def close(self):
         """
-        Close the database connection.
+        Close the database connection (and the read pool, if any).
         Should be called when finished with the database to free resources.
         """
+        if self.pool is not None:
+            self.pool.close()
         self.conn.close()
\ No newline at end of file
@@ -0,0 +1,401 @@
+#############################################
+# synthetic_data.py
+#
+# Writes synthetic StormEvents CSVs with the column layout of a
+# TABLE_DEFINITIONS entry, for benchmarking at national scale (the shipped
+# CSVs cover a handful of South Florida counties). Rows come out one year at
+# a time in date order, like concatenated yearly NCEI files, with more
+# reports in later years, seasonal and afternoon peaks, skewed magnitudes
+# and damage, 3000 counties across the lower 48 and narratives of realistic
+# length from 1996 on. The same seed always gives the same file.
+#
+#   python synthetic_data.py --table wind --rows 1000000 --out wind_1m.csv
+#############################################
+
+import argparse
+import csv
+import os
+
+import numpy as np
+
+from storm_database import TABLE_DEFINITIONS, DEFAULT_CHUNK_SIZE, table_columns
+
+FIRST_YEAR = {"wind": 1955, "tornado": 1950, "hail": 1955}
+LAST_YEAR = 2024
+NARRATIVE_YEAR = 1996  # episodes and narratives start with the 1996 format
+EF_SCALE_YEAR = 2007  # F ratings before, EF ratings from 2007 on
+
+# Relative report counts by month, January first
+MONTH_WEIGHTS = {
+    "wind": [2, 2, 4, 6, 10, 16, 18, 14, 6, 3, 2, 2],
+    "tornado": [3, 4, 9, 15, 17, 14, 7, 5, 5, 4, 4, 3],
+    "hail": [1, 2, 7, 14, 20, 20, 11, 6, 3, 2, 1, 1],
+}
+# Mean and standard deviation of the local begin time, in minutes after midnight
+TIME_OF_DAY = {"wind": (1020, 200), "tornado": (1020, 240), "hail": (990, 150)}
+
+# EFU, EF0 .. EF5
+RATING_WEIGHTS = [0.004, 0.55, 0.30, 0.10, 0.035, 0.01, 0.001]
+HAIL_SIZES = [0.75, 0.88, 1.0, 1.25, 1.5, 1.75, 2.0, 2.5, 2.75, 3.0, 4.0, 4.5]
+HAIL_WEIGHTS = [0.30, 0.15, 0.25, 0.08, 0.05, 0.08, 0.03, 0.02, 0.02, 0.01, 0.005, 0.005]
+
+NUM_COUNTIES = 3000
+PLACES_PER_COUNTY = 12
+NAME_PREFIXES = ["OAK", "PINE", "CEDAR", "MAPLE", "RIVER", "LAKE", "HILL", "RED", "GREEN", "WHITE",
+                 "BLACK", "STONE", "CLAY", "FAIR", "SPRING", "ROCK", "ELM", "ASH", "SAND", "BEAR"]
+NAME_SUFFIXES = ["WOOD", "FIELD", "LAND", "TON", "VILLE", "DALE", "FORD", "MONT", "BURG", "VIEW",
+                 "PORT", "BROOK", "HAVEN", "RIDGE", "CREEK"]
+COUNTY_QUALIFIERS = ["", "NORTH ", "SOUTH ", "EAST ", "WEST ", "UPPER ", "LOWER ", "NEW ", "OLD ",
+                     "FORT "]
+PLACE_QUALIFIERS = ["", " SPGS", " BEACH", " CITY", " JCT", " HTS", " PARK", " CENTER"]
+AZIMUTHS = ["N", "NNE", "NE", "ENE", "E", "ESE", "SE", "SSE", "S", "SSW", "SW", "WSW", "W",
+            "WNW", "NW", "NNW"]
+SOURCES = ["Trained Spotter", "Public", "Law Enforcement", "Emergency Manager", "NWS Employee",
+           "Broadcast Media", "Mesonet", "ASOS", "Social Media", "NWS Storm Survey"]
+SOURCE_WEIGHTS = [0.25, 0.2, 0.12, 0.1, 0.08, 0.08, 0.05, 0.04, 0.05, 0.03]
+
+NARRATIVE_SENTENCES = [
+    "Thunderstorm winds blew down several trees and power lines near {place}.",
+    "A mobile home lost part of its roof and a carport was destroyed.",
+    "Emergency management reported roof damage to a few homes in {place}.",
+    "Hail up to {size} inches in diameter fell across {place}, denting cars.",
+    "A tornado touched down briefly in an open field before lifting.",
+    "The tornado tracked {miles} miles, snapping trees and damaging outbuildings.",
+    "A squall line ahead of a cold front produced damaging winds across the area.",
+    "A measured gust of {knots} knots was recorded at the {place} airport.",
+    "Several large tree limbs fell onto vehicles and a fence was blown over.",
+    "Scattered thunderstorms developed along the sea breeze during the afternoon.",
+    "A strong upper level trough and abundant moisture supported severe storms.",
+    "Power outages affected about {customers} customers.",
+    "Shingles were peeled from roofs and a billboard was toppled near {place}.",
+    "Trained spotters reported quarter size hail and very heavy rain.",
+    "A supercell moved northeast across the county during the evening.",
+    "Damage was consistent with an EF{ef} rating according to the NWS storm survey.",
+    "Windows were blown out of a business and a metal barn collapsed.",
+    "A warm front lifting north provided enough shear for rotating storms.",
+]
+
+
+def csv_columns(table_name):
+    """
+    table_columns names of the columns in a hazard's CSV, in file order.
+    """
+    return [name for name, _ in table_columns(table_name)][:TABLE_DEFINITIONS[table_name]["num_columns"]]
+
+
+def csv_header(table_name):
+    """
+    Header row of a hazard's StormEvents CSV, with the columns named as in the
+    files (e.g. 'County Name', 'MAGNITUDE (Knots)').
+    """
+    return ["County Name" if name == "CountyName" else name.strip("[]")
+            for name in csv_columns(table_name)]
+
+
+class SyntheticWorld:
+    """
+    The fixed parts of the synthetic archive, shared by every hazard built
+    from the same seed: counties with a location, WFO, time zone and places,
+    and a corpus the narratives are cut from.
+    """
+
+    def __init__(self, seed=0):
+        rng = np.random.default_rng(seed)
+        self.county_names = np.array([
+            f"{qualifier}{prefix}{suffix} CO."
+            for qualifier in COUNTY_QUALIFIERS for prefix in NAME_PREFIXES for suffix in NAME_SUFFIXES
+        ])
+        rng.shuffle(self.county_names)
+        popularity = 1 / np.arange(1, NUM_COUNTIES + 1) ** 0.7
+        rng.shuffle(popularity)
+        self.county_p = popularity / popularity.sum()
+        self.county_lat = rng.uniform(25.0, 49.0, NUM_COUNTIES)
+        self.county_lon = rng.uniform(-124.0, -67.0, NUM_COUNTIES)
+        self.county_fips = (rng.integers(0, 100, NUM_COUNTIES) * 2 + 1).astype(str)
+        self.county_tz = np.select(
+            [self.county_lon > -85.5, self.county_lon > -100.0, self.county_lon > -112.0],
+            ["EST-5", "CST-6", "MST-7"], "PST-8")
+        # one office per cell of an 8 x 16 lat/lon grid
+        cell = (np.minimum((self.county_lat - 25.0) / 24.0 * 8, 7).astype(int) * 16
+                + np.minimum((self.county_lon + 124.0) / 57.0 * 16, 15).astype(int))
+        letters = np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+        offices = np.array(["".join(code) for code in rng.choice(letters, size=(128, 3))])
+        self.county_wfo = offices[cell]
+
+        place_names = np.array([f"{prefix}{suffix}{qualifier}" for prefix in NAME_PREFIXES
+                                for suffix in NAME_SUFFIXES for qualifier in PLACE_QUALIFIERS])
+        self.places = rng.choice(place_names, size=(NUM_COUNTIES, PLACES_PER_COUNTY))
+
+        sentences = []
+        for template in rng.choice(NARRATIVE_SENTENCES, size=20_000):
+            sentences.append(template.format(
+                place=rng.choice(place_names), size=rng.choice(HAIL_SIZES),
+                miles=round(float(rng.lognormal(1, 1)), 1), knots=int(rng.integers(50, 90)),
+                customers=int(rng.integers(2, 200)) * 100, ef=int(rng.integers(0, 4))))
+        self.corpus = " ".join(sentences)
+        self.sentence_starts = np.cumsum([0] + [len(sentence) + 1 for sentence in sentences[:-1]])
+
+    def narratives(self, starts, lengths):
+        """
+        Corpus text from sentence number starts[i], cut at a word boundary
+        after about lengths[i] characters.
+        """
+        offsets = self.sentence_starts[starts % len(self.sentence_starts)]
+        texts = []
+        for offset, length in zip(offsets.tolist(), lengths.tolist()):
+            text = self.corpus[offset:offset + length]
+            texts.append(text if len(text) < length else text.rsplit(" ", 1)[0])
+        return texts
+
+
+def _ints(values):
+    return np.asarray(values).astype(np.int64).astype(str)
+
+
+def _rounded(values, places):
+    return np.round(np.asarray(values, dtype=float), places).astype(str)
+
+
+def _dollars(values):
+    """
+    Damage figures rounded to the 1-2 significant digits reports use.
+    """
+    values = np.asarray(values, dtype=float)
+    scale = 10 ** np.floor(np.log10(np.maximum(values, 1.0)))
+    return _ints(np.round(values / scale * 2) / 2 * scale)
+
+
+def _hhmm(minutes):
+    minutes = np.asarray(minutes)
+    return np.char.zfill(_ints(minutes // 60 * 100 + minutes % 60), 4)
+
+
+class SyntheticChunk:
+    """
+    The random draws shared by the columns of n consecutive rows of one year.
+    Each column of a CSV is built from them by its COLUMN_GENERATORS entry.
+    """
+
+    def __init__(self, world, table_name, rng, year, month, day, first_row, first_episode):
+        n = len(month)
+        self.world = world
+        self.table_name = table_name
+        self.rng = rng
+        self.n = n
+        self.year = year
+        self.month = month
+        self.day = day
+        self.first_row = first_row
+        self.narrated = year >= NARRATIVE_YEAR
+
+        self.county = rng.choice(NUM_COUNTIES, size=n, p=world.county_p)
+        self.place = rng.integers(0, PLACES_PER_COUNTY, n)
+        self.lat = world.county_lat[self.county] + rng.normal(0.0, 0.15, n)
+        self.lon = world.county_lon[self.county] + rng.normal(0.0, 0.15, n)
+        mean, spread = TIME_OF_DAY[table_name]
+        self.minute = np.round(rng.normal(mean, spread, n)).astype(int) % 1440
+        # events close together in time share an episode
+        new_episode = rng.random(n) < 0.3
+        new_episode[0] = True
+        self.episode = first_episode + np.cumsum(new_episode)
+
+        if table_name == "tornado":
+            self.rating = rng.choice(len(RATING_WEIGHTS), size=n, p=RATING_WEIGHTS) - 1
+            scale = np.maximum(self.rating, 0)
+            self.length = np.round(rng.lognormal(np.log([0.5, 2, 6, 12, 20, 30])[scale], 0.9), 2)
+            self.width = np.round(rng.lognormal(np.log([30, 75, 150, 300, 500, 800])[scale], 0.7))
+            bearing = np.radians(rng.normal(60.0, 30.0, n))
+            km = self.length * 1.609344
+            self.end_lat = self.lat + km * np.cos(bearing) / 111.0
+            self.end_lon = self.lon + km * np.sin(bearing) / (111.0 * np.cos(np.radians(self.lat)))
+            self.duration = np.round(self.length / 40.0 * 60).astype(int)
+            damaged = rng.random(n) < 0.35 + 0.1 * scale
+            self.damage = np.where(damaged, rng.lognormal(np.log(5000.0) + 1.4 * scale, 1.5), 0.0)
+            self.deaths = rng.poisson(0.0005 * 5.0 ** scale)
+            self.injuries = rng.poisson(0.01 * 3.5 ** scale)
+        else:
+            self.end_lat, self.end_lon = self.lat, self.lon
+            self.duration = np.minimum(rng.exponential(10.0, n).astype(int), 90)
+            damaged = rng.random(n) < (0.4 if table_name == "wind" else 0.1)
+            self.damage = np.where(damaged, rng.lognormal(np.log(5000.0), 1.6), 0.0)
+            self.deaths = rng.poisson(0.002 if table_name == "wind" else 0.0, n)
+            self.injuries = rng.poisson(0.02 if table_name == "wind" else 0.002, n)
+        if table_name == "wind":
+            self.knots = np.minimum(50 + np.round(rng.exponential(7.0, n)), 150)
+
+    def blank(self, values, fraction):
+        """
+        values with about fraction of them replaced by '' (a blank cell).
+        """
+        return np.where(self.rng.random(self.n) < fraction, "", values)
+
+    def dates(self):
+        return np.char.add(np.char.add(np.char.add(_ints(self.month), "/"),
+                                       np.char.add(_ints(self.day), "/")), str(self.year))
+
+    def locations(self, places):
+        return self.blank(self.world.places[self.county, places], 0.08)
+
+    def azimuths(self):
+        return self.blank(self.rng.choice(AZIMUTHS, size=self.n), 0.1)
+
+    def ranges(self):
+        return self.blank(_ints(self.rng.geometric(0.3, self.n) - 1), 0.1)
+
+    def coordinates(self, values, fraction):
+        return self.blank(_rounded(values, 2), fraction)
+
+    def magnitude(self):
+        if self.table_name == "wind":
+            return self.blank(_ints(self.knots), 0.03)
+        return np.round(self.rng.choice(HAIL_SIZES, size=self.n, p=HAIL_WEIGHTS), 2).astype(str)
+
+    def f_scale(self):
+        prefix = "EF" if self.year >= EF_SCALE_YEAR else "F"
+        ratings = np.where(self.rating < 0, "U", _ints(self.rating))
+        return np.char.add(prefix, ratings)
+
+    def unused(self):
+        """
+        A column other hazards' files share with this one but leave blank or 0
+        (e.g. TOR_LENGTH in the wind and hail files).
+        """
+        return np.where(self.rng.random(self.n) < 0.5, "", "0")
+
+    def event_narratives(self):
+        if not self.narrated:
+            return np.full(self.n, "")
+        lengths = np.round(self.rng.lognormal(np.log(160.0), 0.7, self.n)).astype(int)
+        starts = self.rng.integers(0, len(self.world.sentence_starts), self.n)
+        return self.blank(self.world.narratives(starts, lengths), 0.1)
+
+    def episode_narratives(self):
+        if not self.narrated:
+            return np.full(self.n, "")
+        # every event of an episode gets the same text
+        return np.array(self.world.narratives(self.episode * 7919, 150 + self.episode * 104729 % 600))
+
+
+# CSV column (table_columns name) -> function building it for a chunk. A
+# TABLE_DEFINITIONS column missing here fails write_synthetic_csv, so new
+# columns can't silently be left out of the benchmark data.
+COLUMN_GENERATORS = {
+    "DATE": SyntheticChunk.dates,
+    "END_DATE": SyntheticChunk.dates,
+    "CountyName": lambda c: c.world.county_names[c.county],
+    "[MAGNITUDE (Knots)]": SyntheticChunk.magnitude,
+    "[Converted to MPH]": lambda c: _rounded(c.knots * 1.15078, 5),
+    "[HAIL SIZE (INCHES)]": SyntheticChunk.magnitude,
+    "TOR_F_SCALE": SyntheticChunk.f_scale,
+    "BEGIN_LOCATION": lambda c: c.locations(c.place),
+    "END_LOCATION": lambda c: c.locations(np.where(c.rng.random(c.n) < 0.8, c.place,
+                                                   (c.place + 1) % PLACES_PER_COUNTY)),
+    "BEGIN_TIME": lambda c: c.blank(_hhmm(c.minute), 0.01),
+    "END_TIME": lambda c: _hhmm(np.minimum(c.minute + c.duration, 1439)),
+    "DEATHS_DIRECT": lambda c: _ints(c.deaths),
+    "INJURIES_DIRECT": lambda c: _ints(c.injuries),
+    "DEATHS_INDIRECT": lambda c: np.full(c.n, "0"),
+    "INJURIES_INDIRECT": lambda c: np.full(c.n, "0"),
+    "DAMAGE_PROPERTY_NUM": lambda c: _dollars(c.damage),
+    "DAMAGE_CROPS_NUM": lambda c: _dollars(np.where(c.rng.random(c.n) < 0.05,
+                                                    c.rng.lognormal(np.log(2000.0), 1.5, c.n), 0.0)),
+    "CZ_TIMEZONE": lambda c: c.world.county_tz[c.county],
+    "MAGNITUDE_TYPE": lambda c: (c.rng.choice(["EG", "MG", "ES", "MS", ""], size=c.n,
+                                              p=[0.55, 0.2, 0.12, 0.05, 0.08])
+                                 if c.table_name == "wind" else np.full(c.n, "")),
+    "EPISODE_ID": lambda c: _ints(c.episode) if c.narrated else np.full(c.n, ""),
+    "CZ_TYPE": lambda c: np.full(c.n, "C"),
+    "CZ_FIPS": lambda c: c.world.county_fips[c.county],
+    "WFO": lambda c: c.world.county_wfo[c.county],
+    "SOURCE": lambda c: c.blank(c.rng.choice(SOURCES, size=c.n, p=SOURCE_WEIGHTS), 0.2),
+    "FLOOD_CAUSE": lambda c: np.full(c.n, ""),
+    "TOR_LENGTH": lambda c: _rounded(c.length, 2) if c.table_name == "tornado" else c.unused(),
+    "TOR_WIDTH": lambda c: _ints(c.width) if c.table_name == "tornado" else c.unused(),
+    "BEGIN_RANGE": SyntheticChunk.ranges,
+    "END_RANGE": SyntheticChunk.ranges,
+    "BEGIN_AZIMUTH": SyntheticChunk.azimuths,
+    "END_AZIMUTH": SyntheticChunk.azimuths,
+    "BEGIN_LAT": lambda c: c.coordinates(c.lat, 0.02),
+    "BEGIN_LON": lambda c: c.coordinates(c.lon, 0.02),
+    "END_LAT": lambda c: c.coordinates(c.end_lat, 0.02 if c.table_name == "tornado" else 0.3),
+    "END_LON": lambda c: c.coordinates(c.end_lon, 0.02 if c.table_name == "tornado" else 0.3),
+    "EVENT_NARRATIVE": SyntheticChunk.event_narratives,
+    "EPISODE_NARRATIVE": SyntheticChunk.episode_narratives,
+    "ABSOLUTE_ROWNUMBER": lambda c: _ints(np.arange(c.first_row, c.first_row + c.n) + 1),
+}
+
+
+def rows_per_year(table_name, rows, rng):
+    """
+    Split rows over FIRST_YEAR..LAST_YEAR. Severe wind and hail reports grew
+    steeply with spotter networks and radar; tornado counts much less so.
+    """
+    years = np.arange(FIRST_YEAR[table_name], LAST_YEAR + 1)
+    elapsed = years - years[0]
+    weights = 1 + elapsed / 20 if table_name == "tornado" else (1 + elapsed / 8) ** 2
+    return years, rng.multinomial(rows, weights / weights.sum())
+
+
+def write_synthetic_csv(table_name, path, rows, seed=0, chunk_size=DEFAULT_CHUNK_SIZE, world=None):
+    """
+    Write a synthetic StormEvents CSV for a hazard.
+
+    Args:
+        table_name (str): Hazard whose TABLE_DEFINITIONS layout to follow
+            ('wind', 'tornado', or 'hail').
+        path (str): CSV file to write.
+        rows (int): Number of events.
+        seed (int): Random seed; the same seed always gives the same file.
+        chunk_size (int): Rows generated and written at a time.
+        world (SyntheticWorld, optional): Counties and narrative corpus to use.
+            Defaults to SyntheticWorld(seed).
+
+    Returns:
+        int: Size of the file in bytes.
+
+    Raises:
+        KeyError: If the layout has a column COLUMN_GENERATORS can't build.
+    """
+    world = world or SyntheticWorld(seed)
+    names = csv_columns(table_name)
+    missing = [name for name in names if name not in COLUMN_GENERATORS]
+    if missing:
+        raise KeyError(f"No synthetic generator for {table_name} column(s) {missing}")
+    rng = np.random.default_rng([seed, list(TABLE_DEFINITIONS).index(table_name)])
+    month_p = np.array(MONTH_WEIGHTS[table_name]) / sum(MONTH_WEIGHTS[table_name])
+
+    written = episode = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(csv_header(table_name))
+        for year, count in zip(*rows_per_year(table_name, rows, rng)):
+            year = int(year)
+            month = rng.choice(12, size=count, p=month_p) + 1
+            month_days = np.array([31, 29 if year % 4 == 0 and (year % 100 or year % 400 == 0) else 28,
+                                   31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+            day = (rng.random(count) * month_days[month - 1]).astype(int) + 1
+            order = np.lexsort((day, month))
+            month, day = month[order], day[order]
+            for start in range(0, count, chunk_size):
+                chunk = SyntheticChunk(world, table_name, rng, year, month[start:start + chunk_size],
+                                       day[start:start + chunk_size], written, episode)
+                writer.writerows(zip(*(COLUMN_GENERATORS[name](chunk) for name in names)))
+                written += chunk.n
+                episode = int(chunk.episode[-1])
+    return os.path.getsize(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic StormEvents CSV.")
+    parser.add_argument("--table", choices=sorted(TABLE_DEFINITIONS), default="wind")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+
+    size = write_synthetic_csv(args.table, args.out, args.rows, args.seed)
+    print(f"wrote {args.rows:,} {args.table} rows to {args.out} ({size / 1e6:,.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
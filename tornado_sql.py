@@ -1,4 +1,8 @@
-from storm_database import StormDatabase
+from storm_database import (StormDatabase, iso_to_day_number, parse_ef_rating, events_table,
+                            resolve_columns, event_filters, column_sql, lookup_joins)
+from spatial import event_distance_km, expand_box, radius_box, valid_point
+from track_geometry import (path_half_width_km, path_intersects_polygon, points_in_paths,
+                            polygon_box, track_end, validate_polygon)
 
 class TornadoSQL:
     def __init__(self, db):
@@ -11,33 +15,8 @@ class TornadoSQL:
         self.db = db
         self.table = "tornado"
 
-    def _scale_case_expression(self):
-        """
-        Generate SQL CASE expression for standardizing tornado scales.
-        
-        Returns:
-            str: SQL CASE expression that converts EF/F scales to numeric values:
-                EFU/FU -> -1
-                EF0/F0 -> 0
-                ...
-                EF5/F5 -> 5
-                Invalid -> -999
-        """
-        return """
-          CASE
-            WHEN UPPER(TOR_F_SCALE) IN ('EFU','FU') THEN -1
-            WHEN UPPER(TOR_F_SCALE) IN ('EF0','F0') THEN 0
-            WHEN UPPER(TOR_F_SCALE) IN ('EF1','F1') THEN 1
-            WHEN UPPER(TOR_F_SCALE) IN ('EF2','F2') THEN 2
-            WHEN UPPER(TOR_F_SCALE) IN ('EF3','F3') THEN 3
-            WHEN UPPER(TOR_F_SCALE) IN ('EF4','F4') THEN 4
-            WHEN UPPER(TOR_F_SCALE) IN ('EF5','F5') THEN 5
-            ELSE -999
-          END
-        """
-
     # ---------- EXACT EF/F TORNADOES ----------
-    def count_ef_tornadoes_exact(self, rating_str, start_date, end_date):
+    def count_ef_tornadoes_exact(self, rating_str, start_date, end_date, approximate=False):
         """
         Count tornadoes matching exact EF/F scale rating in date range.
         
@@ -45,40 +24,38 @@ class TornadoSQL:
             rating_str (str): Target rating ('EF0'-'EF5', 'F0'-'F5', 'EFU', 'FU').
             start_date (str): Start date in YYYY-MM-DD format.
             end_date (str): End date in YYYY-MM-DD format.
+            approximate (bool): If True, estimate the count from the samples kept
+                at ingest (see StormDatabase.approximate_count). Defaults to False.
             
         Returns:
-            int: Number of tornadoes matching exact rating.
-        """
-        # Convert rating_str e.g. 'EF3' or 'F3' to numeric scale
-        # We'll do an equality comparison in SQL
-        # But let's handle it purely in the CASE expression in SQL
-        scale_case = self._scale_case_expression()
-
-        # figure out the numeric target from the string
-        numeric_target = -999
-        rating_str = rating_str.strip().upper()
-        if rating_str in ("EFU","FU"):
-            numeric_target = -1
-        elif rating_str.endswith("0") or rating_str.endswith("1") or rating_str.endswith("2") \
-             or rating_str.endswith("3") or rating_str.endswith("4") or rating_str.endswith("5"):
-            # last char is digit
-            try:
-                numeric_target = int(rating_str[-1])
-            except ValueError:
-                numeric_target = -999
+            int: Number of tornadoes matching exact rating, or an Estimate
+                (value, low, high) if approximate.
+            
+        Raises:
+            ValueError: If rating_str isn't a recognised rating.
+        """
+        # EF_NUM is the rating normalized at ingest (EFU/FU -> -1, EF0/F0 -> 0, ...),
+        # so this is a range lookup on the (EF_NUM, DATE_NUM) index.
+        numeric_target = parse_ef_rating(rating_str)
+        if approximate:
+            return self.db.approximate_count(self.table, start_date, end_date,
+                                             predicate=lambda row: row["EF_NUM"] == numeric_target)
 
         sql = f"""
         SELECT COUNT(*)
-        FROM {self.table}
-        WHERE ({scale_case}) = ?
-          AND DATE >= ?
-          AND DATE <= ?
+        FROM {self.db.events_source(self.table, start_date, end_date)}
+        WHERE EF_NUM = ?
+          AND DATE_NUM >= ?
+          AND DATE_NUM <= ?
         """
-        rows = self.db.execute_query(sql, (numeric_target, start_date, end_date))
+        rows = self.db.execute_query(
+            sql, (numeric_target, iso_to_day_number(start_date), iso_to_day_number(end_date))
+        )
         return rows[0][0] if rows else 0
     
     # ---------- AT LEAST EF/F TORNADOES ----------
-    def count_ef_tornadoes_at_least(self, min_rating_str, start_date, end_date):
+    def count_ef_tornadoes_at_least(self, min_rating_str, start_date, end_date,
+                                    approximate=False):
         """
         Count tornadoes with EF/F scale >= specified rating in date range.
         
@@ -86,91 +63,304 @@ class TornadoSQL:
             min_rating_str (str): Minimum rating ('EF0'-'EF5', 'F0'-'F5', 'EFU', 'FU').
             start_date (str): Start date in YYYY-MM-DD format.
             end_date (str): End date in YYYY-MM-DD format.
+            approximate (bool): If True, estimate the count from the samples kept
+                at ingest. Defaults to False.
             
         Returns:
-            int: Number of tornadoes at or above specified rating.
+            int: Number of tornadoes at or above specified rating, or an Estimate
+                (value, low, high) if approximate.
+            
+        Raises:
+            ValueError: If min_rating_str isn't a recognised rating.
         """
-        scale_case = self._scale_case_expression()
-
-        numeric_min = -999
-        min_rating_str = min_rating_str.strip().upper()
-        if min_rating_str in ("EFU","FU"):
-            numeric_min = -1
-        elif len(min_rating_str) >= 2 and min_rating_str[-1].isdigit():
-            numeric_min = int(min_rating_str[-1])
+        numeric_min = parse_ef_rating(min_rating_str)
+        if approximate:
+            return self.db.approximate_count(self.table, start_date, end_date, numeric_min)
 
         sql = f"""
         SELECT COUNT(*)
-        FROM {self.table}
-        WHERE ({scale_case}) >= ?
-          AND DATE >= ?
-          AND DATE <= ?
+        FROM {self.db.events_source(self.table, start_date, end_date)}
+        WHERE EF_NUM >= ?
+          AND DATE_NUM >= ?
+          AND DATE_NUM <= ?
         """
-        rows = self.db.execute_query(sql, (numeric_min, start_date, end_date))
+        rows = self.db.execute_query(
+            sql, (numeric_min, iso_to_day_number(start_date), iso_to_day_number(end_date))
+        )
         return rows[0][0] if rows else 0
 
-    # ---------- MONTHLY BREAKDOWN ----------
-    def monthly_breakdown(self):
+    # ---------- AT LEAST EF/F TORNADOES, MANY RATINGS ----------
+    def count_ef_tornadoes_at_least_multi(self, min_rating_strs, start_date, end_date):
         """
-        strftime('%m', DATE) => '01'..'12'
+        Count tornadoes >= each of several ratings in one table pass.
+        
+        Args:
+            min_rating_strs (iterable): Minimum ratings, e.g. ['EF0', 'EF1', ..., 'EF5'].
+            start_date (str): Start date in YYYY-MM-DD format.
+            end_date (str): End date in YYYY-MM-DD format.
+            
+        Returns:
+            dict: Maps each rating string to the count count_ef_tornadoes_at_least
+                would return.
+            
+        Raises:
+            ValueError: If any rating isn't recognised.
         """
-        sql = f"""
-        SELECT strftime('%m', DATE) AS Month, COUNT(*)
-        FROM {self.table}
-        GROUP BY Month
-        ORDER BY Month
+        numeric = {rating: parse_ef_rating(rating) for rating in min_rating_strs}
+        counts = self.db.threshold_counts(self.table, "EF_NUM", numeric.values(),
+                                          start_date, end_date)
+        return {rating: counts[value] for rating, value in numeric.items()}
+
+    # ---------- MONTHLY BREAKDOWN ----------
+    def monthly_breakdown(self, county=None, min_rating_str=None):
         """
-        return self.db.execute_query(sql)
+        strftime('%m', DATE) => '01'..'12', read from the storm_rollup table.
+        Optionally restricted to one CountyName and/or ratings >= min_rating_str.
+        """
+        min_rating = None if min_rating_str is None else parse_ef_rating(min_rating_str)
+        return self.db.rollup_breakdown(self.table, "month", county, min_rating)
 
     # ---------- YEARLY BREAKDOWN ----------
-    def yearly_breakdown(self):
-        """
-        strftime('%Y', DATE) => e.g. '1952','1953','2024'
+    def yearly_breakdown(self, county=None, min_rating_str=None):
         """
-        sql = f"""
-        SELECT strftime('%Y', DATE) AS Year, COUNT(*)
-        FROM {self.table}
-        GROUP BY Year
-        ORDER BY Year
+        strftime('%Y', DATE) => e.g. '1952','1953','2024', read from the storm_rollup table.
+        Optionally restricted to one CountyName and/or ratings >= min_rating_str.
         """
-        return self.db.execute_query(sql)
+        min_rating = None if min_rating_str is None else parse_ef_rating(min_rating_str)
+        return self.db.rollup_breakdown(self.table, "year", county, min_rating)
 
     # ---------- TOP PROPERTY DAMAGE ----------
-    def top_property_damage(self, start_date, end_date, limit=5):
-        sql = f"""
-        SELECT *
-        FROM {self.table}
-        WHERE DATE >= ?
-          AND DATE <= ?
-        ORDER BY DAMAGE_PROPERTY_NUM DESC
-        LIMIT ?
+    def top_property_damage(self, start_date, end_date, limit=5, columns=None,
+                            include_narratives=False):
+        """
+        Only the requested columns are read (default: all but the narratives);
+        include_narratives fetches the narratives for just the returned rows.
         """
-        rows = self.db.execute_query(sql, (start_date, end_date, limit))
-        return rows
+        names = resolve_columns(self.table, columns, include_narratives)
+        rows = self.db.top_rows(self.table, names, "DAMAGE_PROPERTY_NUM", limit,
+                                start_date, end_date)
+        return self.db.attach_narratives(self.table, names, rows)
 
     # ---------- TOP TORNADO LENGTH ----------
-    def top_tornado_length(self, limit=5):
+    def top_tornado_length(self, limit=5, columns=None, include_narratives=False):
+        """
+        Same column selection as top_property_damage.
+        """
+        names = resolve_columns(self.table, columns, include_narratives)
+        rows = self.db.top_rows(self.table, names, "TOR_LENGTH", limit)
+        return self.db.attach_narratives(self.table, names, rows)
+
+    # ---------- NARRATIVE SEARCH ----------
+    def search_narratives(self, query, start_date=None, end_date=None, min_rating_str=None,
+                          columns=None, limit=20):
+        """
+        BM25-ranked FTS5 search over the event and episode narratives, e.g.
+        'mobile home' or '"waterspout moved onshore"'. Optionally restricted to
+        a date range and/or ratings >= min_rating_str. Each hit is the columns
+        (default: all but the narratives) followed by the score and a snippet.
+        """
+        min_rating = None if min_rating_str is None else parse_ef_rating(min_rating_str)
+        return self.db.search_narratives(self.table, query, start_date, end_date,
+                                         min_rating, columns, limit)
+
+    # ---------- LOCATION ----------
+    def events_in_bbox(self, min_lat, min_lon, max_lat, max_lon, start_date=None,
+                       end_date=None, min_rating_str=None, columns=None):
+        """
+        Tornadoes whose BEGIN -> END track box overlaps a lat/lon box, found via
+        the R*Tree index. Optionally restricted to a date range and/or ratings
+        >= min_rating_str.
+        """
+        min_rating = None if min_rating_str is None else parse_ef_rating(min_rating_str)
+        return self.db.events_in_bbox(self.table, min_lat, min_lon, max_lat, max_lon,
+                                      start_date, end_date, min_rating, columns)
+
+    def events_within_km(self, lat, lon, radius_km, start_date=None, end_date=None,
+                         min_rating_str=None, columns=None):
+        """
+        Tornadoes whose track passes within radius_km of a point, nearest first.
+        Each row is the columns followed by the haversine distance (km) from the
+        point to the nearest point of the track (the begin point if no end).
+        """
+        min_rating = None if min_rating_str is None else parse_ef_rating(min_rating_str)
+        return self.db.events_within_km(self.table, lat, lon, radius_km,
+                                        start_date, end_date, min_rating, columns)
+
+    def count_within_km(self, lat, lon, radius_km, start_date=None, end_date=None,
+                        min_rating_str=None):
+        """
+        Number of tornadoes events_within_km would return.
+        """
+        min_rating = None if min_rating_str is None else parse_ef_rating(min_rating_str)
+        return self.db.count_within_km(self.table, lat, lon, radius_km,
+                                       start_date, end_date, min_rating)
+
+    # ---------- TRACK GEOMETRY ----------
+    def _track_candidates(self, box, margin_km, min_rating_str, start_date, end_date, names):
+        """
+        Tornadoes whose path could reach a lat/lon box: R*Tree track boxes that
+        overlap the box grown by margin_km plus the widest path's half-width.
+        Rows are (BEGIN_LAT, BEGIN_LON, END_LAT, END_LON, TOR_WIDTH, *names).
+        """
+        events = events_table(self.table)
+        # Numbers sort before text in SQLite, so "< ''" skips malformed text
+        # widths and lets MAX read the end of the TOR_WIDTH index.
+        widest = self.db.execute_query(
+            f"SELECT MAX(TOR_WIDTH) FROM {events} WHERE TOR_WIDTH < ''"
+        )[0][0]
+        min_lat, max_lat, min_lon, max_lon = expand_box(*box, margin_km + path_half_width_km(widest))
+
+        min_rating = None if min_rating_str is None else parse_ef_rating(min_rating_str)
+        where, params = event_filters(self.table, start_date, end_date, min_rating)
+        where = ["tornado_rtree.max_lat >= ?", "tornado_rtree.min_lat <= ?",
+                 "tornado_rtree.max_lon >= ?", "tornado_rtree.min_lon <= ?"] + where
+        params = [min_lat, max_lat, min_lon, max_lon] + params
+        columns = ["BEGIN_LAT", "BEGIN_LON", "END_LAT", "END_LON", "TOR_WIDTH"] + list(names)
+        joins = lookup_joins(self.table, names)
         sql = f"""
-        SELECT *
-        FROM {self.table}
-        ORDER BY TOR_LENGTH DESC
-        LIMIT ?
+        SELECT {', '.join(column_sql(self.table, name) for name in columns)}, {events}.EVENT_ID
+        FROM tornado_rtree
+        CROSS JOIN {{events_source}} ON {events}.EVENT_ID = tornado_rtree.EVENT_ID{joins}
+        WHERE {' AND '.join(where)}
         """
-        rows = self.db.execute_query(sql, (limit,))
-        return rows
+        union, params = self.db.partition_union(self.table, sql, params, start_date, end_date)
+        rows = self.db.execute_query(f"{union}\nORDER BY {len(columns) + 1}", params)
+        return [row[:-1] for row in rows]
 
-    # ---------- PERCENT OF TORNADOES BETWEEN TIMES ----------
-    def percent_of_tornadoes_between_times(self, start_time, end_time):
-        total_sql = f"SELECT COUNT(*) FROM {self.table}"
-        total_count = self.db.execute_query(total_sql)[0][0]
-        if total_count == 0:
-            return 0.0
+    def tracks_intersecting_polygon(self, polygon, start_date=None, end_date=None,
+                                    min_rating_str=None, columns=None):
+        """
+        Tornadoes whose swept path (the BEGIN -> END track buffered by half of
+        TOR_WIDTH) overlaps a polygon, e.g. a county or service area.
+        polygon is a list of (lat, lon) vertices. Raises ValueError for a
+        polygon with fewer than 3 vertices or an unknown column.
+        """
+        vertices = validate_polygon(polygon)
+        names = resolve_columns(self.table, columns)
+        return [
+            tuple(row[5:])
+            for row in self._track_candidates(polygon_box(vertices), 0.0, min_rating_str,
+                                              start_date, end_date, names)
+            if path_intersects_polygon(*row[:5], vertices)
+        ]
 
-        time_sql = f"""
-        SELECT COUNT(*)
-        FROM {self.table}
-        WHERE BEGIN_TIME >= ?
-          AND BEGIN_TIME <= ?
+    def tracks_through_point(self, lat, lon, buffer_km=0.0, start_date=None, end_date=None,
+                             min_rating_str=None, columns=None):
+        """
+        Tornadoes whose swept path covers a point, or comes within buffer_km of
+        it (an asset buffer). Each row is the columns followed by the distance
+        (km) from the point to the track's centreline, nearest first.
+        """
+        names = resolve_columns(self.table, columns)
+        hits = []
+        for row in self._track_candidates(radius_box(lat, lon, 0.0), buffer_km,
+                                          min_rating_str, start_date, end_date, names):
+            distance = event_distance_km(lat, lon, *row[:4])
+            if distance is not None and distance <= path_half_width_km(row[4]) + buffer_km:
+                hits.append(tuple(row[5:]) + (distance,))
+        return sorted(hits, key=lambda hit: hit[-1])
+
+    def tracks_through_points(self, points, buffer_km=0.0, start_date=None, end_date=None,
+                              min_rating_str=None, columns=None):
+        """
+        tracks_through_point for many (lat, lon) points at once, e.g. thousands
+        of assets: one R*Tree query for their combined box, then a vectorized
+        distance test. Returns one list of rows (the columns, in EVENT_ID order)
+        per point, in input order.
+        """
+        points = [tuple(point) for point in points]
+        results = [[] for _ in points]
+        if not points:
+            return results
+        names = resolve_columns(self.table, columns)
+        lats = [lat for lat, _ in points]
+        lons = [lon for _, lon in points]
+        rows = self._track_candidates((min(lats), max(lats), min(lons), max(lons)), buffer_km,
+                                      min_rating_str, start_date, end_date, names)
+        tracks = []
+        for row in rows:
+            if valid_point(row[0], row[1]):
+                tracks.append((row[0], row[1]) + track_end(*row[:4])
+                              + (path_half_width_km(row[4]) + buffer_km, tuple(row[5:])))
+        if not tracks:
+            return results
+        begin_lats, begin_lons, end_lats, end_lons, reach, values = zip(*tracks)
+        point_index, track_index = points_in_paths(lats, lons, begin_lats, begin_lons,
+                                                   end_lats, end_lons, reach)
+        for point, track in sorted(zip(point_index.tolist(), track_index.tolist())):
+            results[point].append(values[track])
+        return results
+
+    # ---------- STREAMED EXPORT ----------
+    def iter_events(self, start_date, end_date, header=True):
+        """
+        Stream every tornado event in a date range, in date order, for exports.
+        
+        Args:
+            start_date (str): Start date in YYYY-MM-DD format.
+            end_date (str): End date in YYYY-MM-DD format.
+            header (bool): If True, the first item is a tuple of column names.
+            
+        Returns:
+            iterator: Event rows (the tornado table's columns, narratives included),
+                fetched in batches rather than all at once.
+        """
+        return self.db.iter_events(self.table, start_date, end_date, header)
+
+    # ---------- PERCENTILE RANK OF TORNADO LENGTH ----------
+    def get_length_percentile_rank(self, length_miles, approximate=False):
+        """
+        Percentage of tornadoes with TOR_LENGTH less than length_miles
+        (an Estimate if approximate, see get_length_percentile_ranks).
+        """
+        return self.get_length_percentile_ranks([length_miles], approximate)[0]
+
+    def get_length_percentile_ranks(self, length_values, approximate=False):
+        """
+        Percentile rank of each path length (miles), in input order.
+        Binary searches an in-memory sorted copy of TOR_LENGTH, or with
+        approximate, returns Estimates from the TOR_LENGTH sketches kept at ingest.
+        """
+        if approximate:
+            return self.db.approximate_percentile_ranks(self.table, "TOR_LENGTH", length_values)
+        return self.db.percentile_ranks(self.table, "TOR_LENGTH", length_values)
+
+    # ---------- PERCENTILES OF LENGTH AND DAMAGE ----------
+    def length_percentiles(self, percents, approximate=False):
+        """
+        Path length (miles) at each percentile (0-100) of all tornadoes, in input
+        order; None if there are no lengths. Estimates from the sketches if approximate.
+        """
+        if approximate:
+            return self.db.approximate_percentiles(self.table, "TOR_LENGTH", percents)
+        return self.db.column_percentiles(self.table, "TOR_LENGTH", percents)
+
+    def damage_percentiles(self, percents, approximate=False):
+        """
+        Property damage at each percentile (0-100) of all tornadoes, in input
+        order; None if there are no damage figures. Estimates from the sketches
+        if approximate.
+        """
+        if approximate:
+            return self.db.approximate_percentiles(self.table, "DAMAGE_PROPERTY_NUM", percents)
+        return self.db.column_percentiles(self.table, "DAMAGE_PROPERTY_NUM", percents)
+
+    # ---------- DISTINCT COUNTIES ----------
+    def distinct_counties(self, approximate=False):
+        """
+        Number of distinct counties with tornadoes, or an Estimate from the
+        HyperLogLog sketches kept at ingest if approximate.
+        """
+        if approximate:
+            return self.db.approximate_distinct_count(self.table, "CountyName")
+        return self.db.distinct_count(self.table, "CountyName")
+
+    # ---------- PERCENT OF TORNADOES BETWEEN TIMES ----------
+    def percent_of_tornadoes_between_times(self, start_time, end_time,
+                                           start_year=None, end_year=None):
+        """
+        HHMM window (wraps past midnight if end_time < start_time), optionally
+        limited to start_year..end_year. Answered from time_histogram prefix sums.
         """
-        in_range = self.db.execute_query(time_sql, (start_time, end_time))[0][0]
-        return (in_range / total_count) * 100
\ No newline at end of file
+        return self.db.percent_in_time_window(self.table, start_time, end_time,
+                                              start_year, end_year)
\ No newline at end of file
@@ -0,0 +1,181 @@
+#############################################
+# track_geometry.py
+#
+# Tornado paths as swept segments: the straight BEGIN -> END track buffered
+# by half of TOR_WIDTH on each side (a capsule). TornadoSQL uses these to
+# answer polygon-intersection and point-in-path queries after prefiltering
+# candidates with the tornado R*Tree, and points_in_paths tests thousands of
+# asset points against many paths at once with NumPy.
+#############################################
+
+import numpy as np
+
+from spatial import (
+    EARTH_RADIUS_KM, KM_PER_DEGREE_LAT, valid_point, project_km, point_in_polygon,
+    point_segment_distance, segment_distance,
+)
+
+KM_PER_YARD = 0.0009144  # TOR_WIDTH is recorded in yards
+
+
+def path_half_width_km(width_yards):
+    """
+    Half a tornado's path width in km; 0 when TOR_WIDTH is missing or not a number.
+    """
+    if isinstance(width_yards, (int, float)) and width_yards > 0:
+        return width_yards * KM_PER_YARD / 2
+    return 0.0
+
+
+def track_end(begin_lat, begin_lon, end_lat, end_lon):
+    """
+    A track's end point, or its begin point when the end isn't a valid location.
+    """
+    if valid_point(end_lat, end_lon):
+        return end_lat, end_lon
+    return begin_lat, begin_lon
+
+
+def validate_polygon(polygon):
+    """
+    Check a polygon given as (lat, lon) vertices and drop a repeated closing vertex.
+
+    Raises:
+        ValueError: If it has fewer than 3 distinct vertices or an invalid one.
+    """
+    vertices = [tuple(vertex) for vertex in polygon]
+    if len(vertices) > 1 and vertices[0] == vertices[-1]:
+        vertices.pop()
+    if len(vertices) < 3:
+        raise ValueError("A polygon needs at least 3 vertices")
+    for lat, lon in vertices:
+        if not valid_point(lat, lon):
+            raise ValueError(f"Invalid polygon vertex ({lat!r}, {lon!r})")
+    return vertices
+
+
+def polygon_box(vertices):
+    """
+    (min_lat, max_lat, min_lon, max_lon) of validated polygon vertices.
+    """
+    lats = [lat for lat, _ in vertices]
+    lons = [lon for _, lon in vertices]
+    return min(lats), max(lats), min(lons), max(lons)
+
+
+def path_intersects_polygon(begin_lat, begin_lon, end_lat, end_lon, width_yards, vertices):
+    """
+    Exact test of a tornado's swept path against a polygon.
+
+    The path touches the polygon if a track end lies inside it, or if the track
+    comes within half the path width of one of its edges (which also covers
+    a polygon lying wholly inside the path). Computed in an equirectangular
+    projection centred on the polygon.
+
+    Args:
+        begin_lat, begin_lon, end_lat, end_lon (float): The track (end may be invalid).
+        width_yards (float): TOR_WIDTH.
+        vertices (list): Polygon from validate_polygon.
+
+    Returns:
+        bool: True if the path and polygon overlap.
+    """
+    if not valid_point(begin_lat, begin_lon):
+        return False
+    end_lat, end_lon = track_end(begin_lat, begin_lon, end_lat, end_lon)
+    lat0 = sum(lat for lat, _ in vertices) / len(vertices)
+    lon0 = sum(lon for _, lon in vertices) / len(vertices)
+    ring = [project_km(lat, lon, lat0, lon0) for lat, lon in vertices]
+    a = project_km(begin_lat, begin_lon, lat0, lon0)
+    b = project_km(end_lat, end_lon, lat0, lon0)
+    if point_in_polygon(*a, ring) or point_in_polygon(*b, ring):
+        return True
+    half_width = path_half_width_km(width_yards)
+    for c, d in zip(ring, ring[1:] + ring[:1]):
+        if a == b:
+            distance = point_segment_distance(a, c, d)
+        else:
+            distance = segment_distance(a, b, c, d)
+        if distance <= half_width:
+            return True
+    return False
+
+
+def points_in_paths(point_lats, point_lons, begin_lats, begin_lons, end_lats, end_lons,
+                    reach_km, chunk_size=256):
+    """
+    Vectorized point-in-path test of many points against many tracks.
+
+    Each point is tested against the tracks whose bounding box, grown by their
+    reach, covers the point's chunk, so the work stays proportional to nearby
+    pairs rather than points x tracks. Distances use the same closest-point and
+    haversine method as spatial.distance_to_segment_km.
+
+    Args:
+        point_lats, point_lons (array-like): The points, in degrees.
+        begin_lats, begin_lons, end_lats, end_lons (array-like): Valid track
+            coordinates (use track_end for tracks without an end point).
+        reach_km (array-like): Per track, how close a point must be to its
+            centreline to count (half the path width plus any asset buffer).
+        chunk_size (int): Points tested per NumPy batch.
+
+    Returns:
+        tuple: (point indexes, track indexes) of every hit, as int arrays.
+    """
+    point_lats = np.asarray(point_lats, dtype=np.float64)
+    point_lons = np.asarray(point_lons, dtype=np.float64)
+    lat1 = np.asarray(begin_lats, dtype=np.float64)
+    lon1 = np.asarray(begin_lons, dtype=np.float64)
+    lat2 = np.asarray(end_lats, dtype=np.float64)
+    lon2 = np.asarray(end_lons, dtype=np.float64)
+    reach = np.asarray(reach_km, dtype=np.float64)
+
+    # Track boxes grown by their reach (in degrees, sized at the box's poleward edge)
+    margin_lat = reach / KM_PER_DEGREE_LAT
+    box_min_lat = np.minimum(lat1, lat2) - margin_lat
+    box_max_lat = np.maximum(lat1, lat2) + margin_lat
+    cos_edge = np.cos(np.radians(np.minimum(89.9, np.maximum(np.abs(box_min_lat), np.abs(box_max_lat)))))
+    margin_lon = margin_lat / cos_edge
+    box_min_lon = np.minimum(lon1, lon2) - margin_lon
+    box_max_lon = np.maximum(lon1, lon2) + margin_lon
+
+    # Neighbouring points share candidate tracks, so chunk them in lat/lon order
+    order = np.lexsort((point_lons, point_lats))
+    hit_points, hit_tracks = [], []
+    for start in range(0, len(order), chunk_size):
+        chunk = order[start:start + chunk_size]
+        plat = point_lats[chunk]
+        plon = point_lons[chunk]
+        candidates = np.flatnonzero(
+            (box_max_lat >= plat.min()) & (box_min_lat <= plat.max())
+            & (box_max_lon >= plon.min()) & (box_min_lon <= plon.max())
+        )
+        if not len(candidates):
+            continue
+
+        # Closest point on each segment in a projection centred on each point
+        scale = np.cos(np.radians(plat))[:, None]
+        x1 = (lon1[candidates][None, :] - plon[:, None]) * scale
+        y1 = lat1[candidates][None, :] - plat[:, None]
+        dx = (lon2[candidates] - lon1[candidates])[None, :] * scale
+        dy = np.broadcast_to((lat2[candidates] - lat1[candidates])[None, :], dx.shape)
+        length2 = dx * dx + dy * dy
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = np.where(length2 > 0, np.clip(-(x1 * dx + y1 * dy) / length2, 0.0, 1.0), 0.0)
+        near_lat = lat1[candidates][None, :] + t * (lat2[candidates] - lat1[candidates])[None, :]
+        near_lon = lon1[candidates][None, :] + t * (lon2[candidates] - lon1[candidates])[None, :]
+
+        # Haversine from each point to its closest point on each segment
+        phi1 = np.radians(plat)[:, None]
+        phi2 = np.radians(near_lat)
+        a = (np.sin((phi2 - phi1) / 2) ** 2
+             + np.cos(phi1) * np.cos(phi2) * np.sin(np.radians(near_lon - plon[:, None]) / 2) ** 2)
+        distance = 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+        rows, columns = np.nonzero(distance <= reach[candidates][None, :])
+        hit_points.append(chunk[rows])
+        hit_tracks.append(candidates[columns])
+
+    if not hit_points:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(hit_points), np.concatenate(hit_tracks)
@@ -1,5 +1,10 @@
 # ui_helper_sql.py
 
+import csv
+import io
+import itertools
+import tempfile
+
 import streamlit as st
 import pandas as pd
 
@@ -10,6 +15,9 @@ class UIHelperSQL:
     checkboxes to show/download.
     """
 
+    # Streamed CSV exports stay in memory up to this size, then go to a temp file
+    CSV_SPOOL_BYTES = 16 * 1024 * 1024
+
     @staticmethod
     def clear_dataset_keys(prefix: str):
         """
@@ -57,4 +65,82 @@ class UIHelperSQL:
                 file_name=f"{label}.csv",
                 mime="text/csv",
                 key=f"btn_{key}"
-            )
\ No newline at end of file
+            )
+
+    @staticmethod
+    def iter_csv_chunks(rows, rows_per_chunk=10_000):
+        """
+        Yield CSV text for an iterable of row tuples, rows_per_chunk rows at a
+        time, so the whole CSV never has to exist as one string.
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for count, row in enumerate(rows, start=1):
+            writer.writerow(row)
+            if count % rows_per_chunk == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    @staticmethod
+    def set_streamed_results(make_rows, key: str):
+        """
+        Store a query to be streamed rather than its rows. make_rows is called
+        with no arguments each time the rows are needed and must return a fresh
+        iterator whose first item is the header (e.g. WindSQL.iter_events).
+        """
+        st.session_state[key] = make_rows
+
+    @staticmethod
+    def show_and_stream_results(key: str, label: str, preview_rows: int = 100):
+        """
+        Like show_and_download_results, for a query stored with
+        set_streamed_results. Only the first preview_rows rows are shown. The
+        full CSV is only built once the download checkbox is ticked, chunk by
+        chunk from the cursor into a temporary file that moves to disk past
+        CSV_SPOOL_BYTES, with no DataFrame of the full result; it is kept for
+        later reruns until the next query. Streamlit reads the file into memory
+        to serve the download, so one copy of the CSV bytes is still held there.
+        """
+        if key not in st.session_state:
+            return
+        make_rows = st.session_state[key]
+
+        rows = make_rows()
+        try:
+            header = next(rows, None)
+            preview = list(itertools.islice(rows, preview_rows))
+        finally:
+            rows.close()  # releases the read connection
+        if not preview:
+            st.write(f"No rows found for {label}.")
+            return
+
+        # 1) Checkbox to show the first rows
+        show_table = st.checkbox(f"Show {label} in a table? (first {preview_rows} rows)",
+                                 key=f"show_{key}")
+        if show_table:
+            st.dataframe(pd.DataFrame(preview, columns=header))
+
+        # 2) Checkbox to download the full result as CSV
+        download_csv = st.checkbox(f"Download {label} as CSV?", key=f"download_{key}")
+        if download_csv:
+            # Under the key prefix, so clear_dataset_keys drops it with the query
+            file_key = f"{key}_csv_file"
+            if file_key not in st.session_state:
+                csv_file = tempfile.SpooledTemporaryFile(max_size=UIHelperSQL.CSV_SPOOL_BYTES)
+                for chunk in UIHelperSQL.iter_csv_chunks(make_rows()):
+                    csv_file.write(chunk.encode("utf-8"))
+                st.session_state[file_key] = csv_file
+            csv_file = st.session_state[file_key]
+            csv_file.seek(0)
+
+            st.download_button(
+                label=f"Download {label} CSV",
+                data=csv_file,
+                file_name=f"{label}.csv",
+                mime="text/csv",
+                key=f"btn_{key}"
+            )
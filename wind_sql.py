@@ -1,4 +1,4 @@
-from storm_database import StormDatabase
+from storm_database import StormDatabase, iso_to_day_number, resolve_columns
 
 class WindSQL:
     def __init__(self, db):
@@ -11,7 +11,7 @@ class WindSQL:
         self.db = db
         self.table = "wind"
     
-    def count_wind_gusts(self, min_knots, start_date, end_date):
+    def count_wind_gusts(self, min_knots, start_date, end_date, approximate=False):
         """
         Count wind events with magnitude >= specified knots within date range.
         
@@ -19,21 +19,44 @@ class WindSQL:
             min_knots (float): Minimum wind speed in knots.
             start_date (str): Start date in YYYY-MM-DD format.
             end_date (str): End date in YYYY-MM-DD format.
+            approximate (bool): If True, estimate the count from the samples kept
+                at ingest (see StormDatabase.approximate_count). Defaults to False.
             
         Returns:
-            int: Number of matching wind events.
+            int: Number of matching wind events, or an Estimate (value, low, high)
+                if approximate.
         """
+        if approximate:
+            return self.db.approximate_count(self.table, start_date, end_date, min_knots)
         sql = f"""
         SELECT COUNT(*)
-        FROM {self.table}
+        FROM {self.db.events_source(self.table, start_date, end_date)}
         WHERE [MAGNITUDE (Knots)] >= ?
-          AND DATE >= ?
-          AND DATE <= ?
+          AND DATE_NUM >= ?
+          AND DATE_NUM <= ?
         """
-        row = self.db.execute_query(sql, (min_knots, start_date, end_date))
+        row = self.db.execute_query(
+            sql, (min_knots, iso_to_day_number(start_date), iso_to_day_number(end_date))
+        )
         return row[0][0]
     
-    def get_top_property_damage(self, start_date, end_date, limit=5):
+    def count_wind_gusts_multi(self, thresholds, start_date, end_date):
+        """
+        Count wind events >= each of several knot thresholds in one table pass.
+        
+        Args:
+            thresholds (iterable): Minimum wind speeds in knots, e.g. [50, 58, 65].
+            start_date (str): Start date in YYYY-MM-DD format.
+            end_date (str): End date in YYYY-MM-DD format.
+            
+        Returns:
+            dict: Maps each threshold to the count count_wind_gusts would return.
+        """
+        return self.db.threshold_counts(self.table, "[MAGNITUDE (Knots)]", thresholds,
+                                        start_date, end_date)
+    
+    def get_top_property_damage(self, start_date, end_date, limit=5, columns=None,
+                                include_narratives=False):
         """
         Get wind events with highest property damage within date range.
         
@@ -41,92 +64,262 @@ class WindSQL:
             start_date (str): Start date in YYYY-MM-DD format.
             end_date (str): End date in YYYY-MM-DD format.
             limit (int): Maximum number of results to return. Defaults to 5.
-            
+            columns (list, optional): Columns to return, e.g. ['DATE', 'CountyName'].
+                Defaults to every column except the narratives.
+            include_narratives (bool): Also return the event and episode narratives,
+                read from the narratives table for just these rows. Defaults to False.
+        
         Returns:
             list: List of wind event records sorted by damage amount.
+        
+        Raises:
+            ValueError: If columns names a column the wind table doesn't have.
         """
-        sql = f"""
-        SELECT *
-        FROM {self.table}
-        WHERE DATE >= ?
-          AND DATE <= ?
-        ORDER BY DAMAGE_PROPERTY_NUM DESC
-        LIMIT ?
+        names = resolve_columns(self.table, columns, include_narratives)
+        rows = self.db.top_rows(self.table, names, "DAMAGE_PROPERTY_NUM", limit,
+                                start_date, end_date)
+        return self.db.attach_narratives(self.table, names, rows)
+    
+    def search_narratives(self, query, start_date=None, end_date=None, min_knots=None,
+                          columns=None, limit=20):
+        """
+        Full-text search over wind event and episode narratives.
+        
+        Args:
+            query (str): FTS5 query, e.g. 'roof damage' (both words) or
+                '"roof blown off"' (exact phrase).
+            start_date (str, optional): Only events on or after this YYYY-MM-DD date.
+            end_date (str, optional): Only events on or before this YYYY-MM-DD date.
+            min_knots (float, optional): Only events with magnitude >= this many knots.
+            columns (list, optional): Columns to return. Defaults to every column
+                except the narratives.
+            limit (int): Maximum number of hits. Defaults to 20.
+            
+        Returns:
+            list: Hits ranked by BM25, as tuples of the columns followed by the
+                score and a snippet of the matching narrative.
+                
+        Raises:
+            ValueError: If query isn't valid FTS5 syntax or a column is unknown.
+        """
+        return self.db.search_narratives(self.table, query, start_date, end_date,
+                                         min_knots, columns, limit)
+    
+    def iter_events(self, start_date, end_date, header=True):
+        """
+        Stream every wind event in a date range, in date order, for exports.
+        
+        Args:
+            start_date (str): Start date in YYYY-MM-DD format.
+            end_date (str): End date in YYYY-MM-DD format.
+            header (bool): If True, the first item is a tuple of column names.
+            
+        Returns:
+            iterator: Event rows (the wind table's columns, narratives included),
+                fetched in batches rather than all at once.
+        """
+        return self.db.iter_events(self.table, start_date, end_date, header)
+    
+    def events_in_bbox(self, min_lat, min_lon, max_lat, max_lon, start_date=None,
+                       end_date=None, min_knots=None, columns=None):
+        """
+        Get wind events located inside a lat/lon box, via the R*Tree index.
+        
+        Args:
+            min_lat, min_lon, max_lat, max_lon (float): The box, in degrees.
+            start_date (str, optional): Only events on or after this YYYY-MM-DD date.
+            end_date (str, optional): Only events on or before this YYYY-MM-DD date.
+            min_knots (float, optional): Only events with magnitude >= this many knots.
+            columns (list, optional): Columns to return. Defaults to every column
+                except the narratives.
+        
+        Returns:
+            list: Tuples of the requested columns.
+        """
+        return self.db.events_in_bbox(self.table, min_lat, min_lon, max_lat, max_lon,
+                                      start_date, end_date, min_knots, columns)
+    
+    def events_within_km(self, lat, lon, radius_km, start_date=None, end_date=None,
+                         min_knots=None, columns=None):
+        """
+        Get wind events within radius_km of a point, nearest first.
+        
+        Args:
+            lat, lon (float): The point, in degrees.
+            radius_km (float): Search radius in kilometres.
+            start_date (str, optional): Only events on or after this YYYY-MM-DD date.
+            end_date (str, optional): Only events on or before this YYYY-MM-DD date.
+            min_knots (float, optional): Only events with magnitude >= this many knots.
+            columns (list, optional): Columns to return. Defaults to every column
+                except the narratives.
+        
+        Returns:
+            list: Tuples of the requested columns followed by the distance in km.
+        
+        Note:
+            Candidates come from the R*Tree box around the circle; only those are
+            checked with the exact haversine distance.
         """
-        return self.db.execute_query(sql, (start_date, end_date, limit))
+        return self.db.events_within_km(self.table, lat, lon, radius_km,
+                                        start_date, end_date, min_knots, columns)
     
-    def get_percentile_rank(self, gust_knots):
+    def count_within_km(self, lat, lon, radius_km, start_date=None, end_date=None, min_knots=None):
+        """
+        Count wind events within radius_km of a point (see events_within_km).
+        
+        Returns:
+            int: Number of matching wind events.
+        """
+        return self.db.count_within_km(self.table, lat, lon, radius_km,
+                                       start_date, end_date, min_knots)
+    
+    def get_percentile_rank(self, gust_knots, approximate=False):
         """
         Calculate percentile rank of a given wind speed.
         
         Args:
             gust_knots (float): Wind speed in knots.
+            approximate (bool): If True, estimate it (see get_percentile_ranks).
             
         Returns:
-            float: Percentage of wind events with magnitude less than gust_knots.
+            float: Percentage of wind events with magnitude less than gust_knots,
+                or an Estimate (value, low, high) if approximate.
         """
-        sql_count_less = f"SELECT COUNT(*) FROM {self.table} WHERE [MAGNITUDE (Knots)] < ?"
-        count_less = self.db.execute_query(sql_count_less, (gust_knots,))[0][0]
-
-        sql_count_total = f"SELECT COUNT(*) FROM {self.table}"
-        count_total = self.db.execute_query(sql_count_total)[0][0]
-
-        if count_total == 0:
-            return 0.0
-        return (count_less / count_total) * 100
+        return self.get_percentile_ranks([gust_knots], approximate)[0]
     
-    def monthly_breakdown(self):
+    def get_percentile_ranks(self, gust_values, approximate=False):
+        """
+        Calculate percentile ranks for many wind speeds at once.
+        
+        Args:
+            gust_values (iterable): Wind speeds in knots.
+            approximate (bool): If True, estimate the ranks from the magnitude
+                sketches kept at ingest instead. Defaults to False.
+            
+        Returns:
+            list: Percentile rank of each value (an Estimate if approximate),
+                in input order.
+            
+        Note:
+            Ranks against an in-memory sorted copy of the magnitudes that is
+            rebuilt only when the wind table changes.
+        """
+        if approximate:
+            return self.db.approximate_percentile_ranks(self.table, "[MAGNITUDE (Knots)]",
+                                                        gust_values)
+        return self.db.percentile_ranks(self.table, "[MAGNITUDE (Knots)]", gust_values)
+    
+    def magnitude_percentiles(self, percents, approximate=False):
+        """
+        Wind speeds at the given percentiles of all wind events.
+        
+        Args:
+            percents (iterable): Percentiles, each 0-100, e.g. [50, 90, 99].
+            approximate (bool): If True, estimate them from the magnitude
+                sketches kept at ingest. Defaults to False.
+            
+        Returns:
+            list: Knots at each percentile (an Estimate if approximate; None if
+                there are no magnitudes), in input order.
+        """
+        if approximate:
+            return self.db.approximate_percentiles(self.table, "[MAGNITUDE (Knots)]", percents)
+        return self.db.column_percentiles(self.table, "[MAGNITUDE (Knots)]", percents)
+    
+    def damage_percentiles(self, percents, approximate=False):
+        """
+        Property damage at the given percentiles of all wind events.
+        
+        Args:
+            percents (iterable): Percentiles, each 0-100, e.g. [50, 90, 99].
+            approximate (bool): If True, estimate them from the damage sketches
+                kept at ingest. Defaults to False.
+            
+        Returns:
+            list: Damage in dollars at each percentile (an Estimate if
+                approximate; None if there are no damage figures), in input order.
+        """
+        if approximate:
+            return self.db.approximate_percentiles(self.table, "DAMAGE_PROPERTY_NUM", percents)
+        return self.db.column_percentiles(self.table, "DAMAGE_PROPERTY_NUM", percents)
+    
+    def distinct_counties(self, approximate=False):
+        """
+        Count the distinct counties with wind events.
+        
+        Args:
+            approximate (bool): If True, estimate it from the HyperLogLog
+                sketches kept at ingest. Defaults to False.
+            
+        Returns:
+            int: Number of distinct CountyName values, or an Estimate
+                (value, low, high) if approximate.
+        """
+        if approximate:
+            return self.db.approximate_distinct_count(self.table, "CountyName")
+        return self.db.distinct_count(self.table, "CountyName")
+    
+    def distinct_episodes(self, approximate=False):
+        """
+        Count the distinct storm episodes (EPISODE_ID) with wind events.
+        
+        Args:
+            approximate (bool): If True, estimate it from the HyperLogLog
+                sketches kept at ingest. Defaults to False.
+            
+        Returns:
+            int: Number of distinct EPISODE_ID values, or an Estimate
+                (value, low, high) if approximate.
+        """
+        if approximate:
+            return self.db.approximate_distinct_count(self.table, "EPISODE_ID")
+        return self.db.distinct_count(self.table, "EPISODE_ID")
+    
+    def monthly_breakdown(self, county=None, min_knots=None):
         """
         Group wind events by month across all years.
         
+        Args:
+            county (str, optional): Only count events in this CountyName.
+            min_knots (float, optional): Only count events with magnitude >= this many knots.
+        
         Returns:
             list: List of (month, count) tuples, where month is '01'-'12'.
+            
+        Note:
+            Reads the storm_rollup table maintained at ingest, not the wind table.
         """
-        sql = f"""
-        SELECT strftime('%m', DATE) AS Month, COUNT(*)
-        FROM {self.table}
-        GROUP BY Month
-        ORDER BY Month
-        """
-        return self.db.execute_query(sql)
+        return self.db.rollup_breakdown(self.table, "month", county, min_knots)
     
-    def yearly_breakdown(self):
+    def yearly_breakdown(self, county=None, min_knots=None):
         """
         Group wind events by year across entire dataset.
         
+        Args:
+            county (str, optional): Only count events in this CountyName.
+            min_knots (float, optional): Only count events with magnitude >= this many knots.
+        
         Returns:
             list: List of (year, count) tuples, where year is like '1950'.
         """
-        sql = f"""
-        SELECT strftime('%Y', DATE) AS Year, COUNT(*)
-        FROM {self.table}
-        GROUP BY Year
-        ORDER BY Year
-        """
-        return self.db.execute_query(sql)
+        return self.db.rollup_breakdown(self.table, "year", county, min_knots)
     
-    def percent_of_events_in_time_range(self, start_time, end_time):
+    def percent_of_events_in_time_range(self, start_time, end_time, start_year=None, end_year=None):
         """
         Calculate percentage of wind events occurring between specified times.
         
         Args:
             start_time (str): Start time in HHMM format (e.g., '1400').
-            end_time (str): End time in HHMM format (e.g., '1600').
+            end_time (str): End time in HHMM format (e.g., '1600'). If earlier than
+                start_time, the window wraps past midnight (e.g., '2200' to '0200').
+            start_year (int, optional): Only consider events from this year on.
+            end_year (int, optional): Only consider events up to this year.
             
         Returns:
             float: Percentage of events occurring in time range.
+            
+        Note:
+            Answered from prefix sums over the time_histogram table, not a scan.
         """
-        total_sql = f"SELECT COUNT(*) FROM {self.table}"
-        total = self.db.execute_query(total_sql)[0][0]
-        if total == 0:
-            return 0.0
-
-        sql = f"""
-        SELECT COUNT(*)
-        FROM {self.table}
-        WHERE BEGIN_TIME >= ?
-          AND BEGIN_TIME <= ?
-        """
-        in_range = self.db.execute_query(sql, (start_time, end_time))[0][0]
-
-        return (in_range / total) * 100
\ No newline at end of file
+        return self.db.percent_in_time_window(self.table, start_time, end_time,
+                                              start_year, end_year)
\ No newline at end of file